@@ -4,3 +4,14 @@ from django.apps import AppConfig
 class ActivityConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'activity'
+
+    def ready(self):
+        from django.db.models.signals import post_save
+        from habits.models import Routine
+        from habits.signals import routine_status_changed
+        from .reminders import routine_saved, routine_status_changed as reschedule_routines
+
+        # Routines change status in their views, the admin and bulk updates
+        # such as auto-completion, so the reminder index listens for all of them
+        post_save.connect(routine_saved, sender=Routine, dispatch_uid="reminders_routine_saved")
+        routine_status_changed.connect(reschedule_routines, dispatch_uid="reminders_routine_status_changed")
@@ -0,0 +1,93 @@
+from collections import Counter
+from django.db.models import Count, F, Value
+from django.db.models.functions import Greatest
+from django.utils import timezone
+from config.cache_versions import bump_versions
+from .models import Notification, UnreadNotificationCounter
+from .realtime import publish_notifications, publish_unread_counts
+
+RECONCILE_CHUNK_SIZE = 2000
+
+
+def adjust_unread_count(recipient_id, delta):
+    if not delta:
+        return
+
+    bump_versions([recipient_id])
+
+    updated = UnreadNotificationCounter.objects.filter(
+        recipient_id=recipient_id
+    ).update(
+        unread_count=Greatest(F("unread_count") + delta, Value(0)),
+        updated_at=timezone.now()
+    )
+
+    # A missing counter is seeded from the table, which already includes this change
+    if not updated:
+        refresh_unread_counts([recipient_id])
+    else:
+        publish_unread_counts([recipient_id])
+
+
+def notifications_created(notifications):
+    publish_notifications(notifications)
+
+    unread = Counter(
+        notification.recipient_id
+        for notification in notifications
+        if not notification.read_status
+    )
+
+    for recipient_id, count in unread.items():
+        adjust_unread_count(recipient_id, count)
+
+
+def notification_read_changed(notification, was_read):
+    if notification.read_status != was_read:
+        adjust_unread_count(notification.recipient_id, -1 if notification.read_status else 1)
+
+
+def notification_deleted(notification):
+    if not notification.read_status:
+        adjust_unread_count(notification.recipient_id, -1)
+
+
+def get_unread_count(recipient_id):
+    count = UnreadNotificationCounter.objects.filter(
+        recipient_id=recipient_id
+    ).values_list("unread_count", flat=True).first()
+
+    if count is None:
+        count = refresh_unread_counts([recipient_id], publish=False)[recipient_id]
+
+    return count
+
+
+def refresh_unread_counts(recipient_ids, publish=True):
+    counts = dict.fromkeys(recipient_ids, 0)
+
+    counts.update(
+        Notification.objects.delivered().filter(
+            recipient_id__in=recipient_ids,
+            read_status=False
+        ).order_by().values("recipient_id").annotate(
+            unread=Count("pk")
+        ).values_list("recipient_id", "unread")
+    )
+
+    UnreadNotificationCounter.objects.bulk_create(
+        [
+            UnreadNotificationCounter(recipient_id=recipient_id, unread_count=count)
+            for recipient_id, count in counts.items()
+        ],
+        update_conflicts=True,
+        unique_fields=["recipient"],
+        update_fields=["unread_count", "updated_at"]
+    )
+
+    # Seeding a missing counter changes nothing a reader has seen
+    if publish:
+        bump_versions(counts)
+        publish_unread_counts(counts)
+
+    return counts
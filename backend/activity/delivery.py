@@ -0,0 +1,119 @@
+from datetime import datetime, timedelta, timezone as dt_timezone
+from functools import lru_cache
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+from django.db import transaction
+from django.utils import timezone
+from profiles.models import Preferences
+from .models import Notification, HeldNotification
+from .counters import refresh_unread_counts
+from .realtime import publish_notifications
+
+RELEASE_BATCH_SIZE = 1000
+
+DEFAULT_WINDOW = (
+    "UTC",
+    Preferences._meta.get_field("notification_window_start").default,
+    Preferences._meta.get_field("notification_window_end").default,
+)
+
+
+@lru_cache(maxsize=1024)
+def get_zone(name):
+    try:
+        return ZoneInfo(name)
+    except (ZoneInfoNotFoundError, ValueError):
+        return dt_timezone.utc
+
+
+def window_release_at(now, zone_name, start, end):
+    # Equal bounds mean the recipient never asked for quiet hours
+    if start == end:
+        return None
+
+    zone = get_zone(zone_name)
+    local = now.astimezone(zone)
+    current = local.time()
+
+    if start < end:
+        inside = start <= current < end
+    else:
+        inside = current >= start or current < end
+
+    if inside:
+        return None
+
+    day = local.date() if current < start else local.date() + timedelta(days=1)
+
+    return datetime.combine(day, start, tzinfo=zone).astimezone(dt_timezone.utc)
+
+
+def recipient_windows(recipient_ids):
+    windows = dict.fromkeys(recipient_ids, DEFAULT_WINDOW)
+
+    windows.update(
+        (user_id, (zone_name, start, end))
+        for user_id, zone_name, start, end in Preferences.objects.filter(
+            user_profile__user_id__in=recipient_ids
+        ).values_list(
+            "user_profile__user_id", "timezone", "notification_window_start", "notification_window_end"
+        )
+    )
+
+    return windows
+
+
+def hold_outside_window(notifications, now, batch_size=RELEASE_BATCH_SIZE):
+    windows = recipient_windows({notification.recipient_id for notification in notifications})
+    # Recipients mostly share a handful of windows, so each is resolved once per call
+    release_times = {}
+    held = []
+    holds = []
+
+    for notification in notifications:
+        window = windows[notification.recipient_id]
+
+        if window not in release_times:
+            release_times[window] = window_release_at(now, *window)
+
+        if release_times[window] is not None:
+            held.append(notification)
+            holds.append(HeldNotification(notification_id=notification.pk, release_at=release_times[window]))
+
+    HeldNotification.objects.bulk_create(holds, batch_size=batch_size, ignore_conflicts=True)
+
+    return held
+
+
+def release_held_notifications(now=None, batch_size=RELEASE_BATCH_SIZE):
+    now = now or timezone.now()
+    released = 0
+
+    while True:
+        with transaction.atomic():
+            due = list(
+                HeldNotification.objects.filter(
+                    release_at__lte=now
+                ).select_for_update(skip_locked=True).order_by("release_at", "pk").values_list(
+                    "pk", "notification_id"
+                )[:batch_size]
+            )
+
+            if not due:
+                break
+
+            HeldNotification.objects.filter(pk__in=[pk for pk, _ in due]).delete()
+
+            notifications = list(Notification.objects.filter(pk__in=[notification_id for _, notification_id in due]))
+            publish_notifications(notifications)
+            refresh_unread_counts({notification.recipient_id for notification in notifications})
+
+        released += len(due)
+
+        if len(due) < batch_size:
+            break
+
+    return released
+
+
+def next_release_at():
+    return HeldNotification.objects.order_by("release_at").values_list("release_at", flat=True).first()
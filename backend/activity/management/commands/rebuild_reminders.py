@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+from activity import reminders
+
+
+class Command(BaseCommand):
+    help = "Recompute the next reminder time of every action in an active routine"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=reminders.REBUILD_CHUNK_SIZE
+        )
+
+    def handle(self, *args, **options):
+        scheduled = reminders.rebuild_reminders(chunk_size=options["chunk_size"])
+
+        self.stdout.write(self.style.SUCCESS(f"Scheduled reminders for {scheduled} actions"))
@@ -0,0 +1,26 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from activity.counters import refresh_unread_counts, RECONCILE_CHUNK_SIZE
+
+
+class Command(BaseCommand):
+    help = "Recount unread notifications per recipient and repair the unread counters"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=RECONCILE_CHUNK_SIZE
+        )
+
+    def handle(self, *args, **options):
+        users = User.objects.order_by("pk").values_list("pk", flat=True)
+        last_pk = 0
+        repaired = 0
+
+        while chunk := list(users.filter(pk__gt=last_pk)[:options["chunk_size"]]):
+            refresh_unread_counts(chunk)
+            repaired += len(chunk)
+            last_pk = chunk[-1]
+
+        self.stdout.write(self.style.SUCCESS(f"Reconciled unread counts for {repaired} users"))
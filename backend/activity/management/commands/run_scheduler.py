@@ -0,0 +1,40 @@
+import time
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from activity.scheduler import Scheduler
+from activity.missed_habits import BATCH_SIZE
+from activity.delivery import RELEASE_BATCH_SIZE
+from activity.reminders import DISPATCH_BATCH_SIZE
+
+
+class Command(BaseCommand):
+    help = "Run missed habit sweeps at each timezone's local midnight, send due reminders and release held notifications"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--once", action="store_true", help="Run the due jobs once and exit")
+        parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+        parser.add_argument("--release-batch-size", type=int, default=RELEASE_BATCH_SIZE)
+        parser.add_argument("--reminder-batch-size", type=int, default=DISPATCH_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        scheduler = Scheduler(
+            batch_size=options["batch_size"],
+            release_batch_size=options["release_batch_size"],
+            reminder_batch_size=options["reminder_batch_size"]
+        )
+
+        while True:
+            totals = scheduler.run_pending()
+
+            if any(totals.values()):
+                self.stdout.write(
+                    f"Swept {totals['buckets']} offsets ({totals['actions']} missed actions, "
+                    f"{totals['notifications']} notifications), sent {totals['reminders']} reminders, "
+                    f"released {totals['released']} held notifications"
+                )
+
+            if options["once"]:
+                break
+
+            # Sleep until the next local midnight, reminder or window opening instead of polling
+            time.sleep(max(0, (scheduler.next_run_at() - timezone.now()).total_seconds()))
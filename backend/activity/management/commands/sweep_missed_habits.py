@@ -0,0 +1,39 @@
+from datetime import datetime
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from activity.missed_habits import sweep_missed_habits, BATCH_SIZE
+
+
+class Command(BaseCommand):
+    help = "Reset streaks and notify owners and partners about habits missed yesterday in each user's timezone"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--now",
+            help="ISO timestamp to evaluate 'yesterday' against (defaults to the current time)"
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=BATCH_SIZE
+        )
+
+    def handle(self, *args, **options):
+        now = None
+
+        if options["now"]:
+            try:
+                now = datetime.fromisoformat(options["now"])
+            except ValueError:
+                raise CommandError("--now must be an ISO 8601 timestamp")
+
+            if timezone.is_naive(now):
+                now = timezone.make_aware(now)
+
+        totals = sweep_missed_habits(now=now, batch_size=options["batch_size"])
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Swept {totals['actions']} missed actions, "
+            f"reset {totals['streaks_reset']} streaks, "
+            f"queued {totals['notifications']} notifications"
+        ))
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:22
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('activity', '0001_initial'),
+        ('habits', '0002_action_last_completed_on'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='notification',
+            name='event_date',
+            field=models.DateField(blank=True, help_text='Local day the triggering event refers to', null=True, verbose_name='Event Date'),
+        ),
+        migrations.AddConstraint(
+            model_name='notification',
+            constraint=models.UniqueConstraint(condition=models.Q(('event_date__isnull', False)), fields=('recipient', 'category', 'trigger_action', 'event_date'), name='one_notification_per_event'),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:28
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('activity', '0003_notification_recipient_idx'),
+        ('habits', '0005_routine_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(condition=models.Q(('read_status', False)), fields=['recipient', '-created_at'], name='notification_unread_idx'),
+        ),
+    ]
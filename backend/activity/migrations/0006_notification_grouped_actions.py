@@ -0,0 +1,119 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:38
+
+from itertools import groupby
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+
+GROUPED_CATEGORIES = ["user_missed_habit", "partner_missed_habit"]
+BATCH_SIZE = 2000
+
+
+def group_message(category, size, event_date):
+    if category == "user_missed_habit":
+        return f"You missed {size} habits on {event_date:%d %b}"
+
+    return f"Your partners missed {size} habits on {event_date:%d %b}"
+
+
+def collapse_missed_habit_notifications(apps, schema_editor):
+    # The sweeper wrote one row per missed action until now, each recipient
+    # keeps its oldest row per category and day with every action linked
+    Notification = apps.get_model("activity", "Notification")
+    UnreadNotificationCounter = apps.get_model("activity", "UnreadNotificationCounter")
+    Link = Notification.grouped_actions.through
+
+    rows = Notification.objects.filter(
+        category__in=GROUPED_CATEGORIES,
+        event_date__isnull=False
+    ).order_by("recipient_id", "category", "event_date", "pk").values_list(
+        "pk", "recipient_id", "category", "event_date", "trigger_action_id", "read_status"
+    )
+
+    links = []
+    duplicates = []
+    keepers = []
+    recipients = set()
+
+    for (recipient_id, category, event_date), group in groupby(
+        rows.iterator(chunk_size=BATCH_SIZE),
+        key=lambda row: row[1:4]
+    ):
+        group = list(group)
+        keeper_id = group[0][0]
+        action_ids = {row[4] for row in group}
+
+        links.extend(Link(notification_id=keeper_id, action_id=action_id) for action_id in action_ids)
+
+        if len(group) > 1:
+            duplicates.extend(row[0] for row in group[1:])
+            recipients.add(recipient_id)
+            keepers.append(Notification(
+                pk=keeper_id,
+                # Unread while any of the collapsed rows was
+                read_status=all(row[5] for row in group),
+                message=group_message(category, len(action_ids), event_date)
+            ))
+
+    Link.objects.bulk_create(links, batch_size=BATCH_SIZE, ignore_conflicts=True)
+    Notification.objects.bulk_update(keepers, ["read_status", "message"], batch_size=BATCH_SIZE)
+
+    for start in range(0, len(duplicates), BATCH_SIZE):
+        Notification.objects.filter(pk__in=duplicates[start:start + BATCH_SIZE]).delete()
+
+    recipients = list(recipients)
+
+    for start in range(0, len(recipients), BATCH_SIZE):
+        chunk = recipients[start:start + BATCH_SIZE]
+        counts = dict.fromkeys(chunk, 0)
+        counts.update(
+            Notification.objects.filter(recipient_id__in=chunk, read_status=False).order_by().values(
+                "recipient_id"
+            ).annotate(unread=Count("pk")).values_list("recipient_id", "unread")
+        )
+
+        UnreadNotificationCounter.objects.bulk_create(
+            [
+                UnreadNotificationCounter(recipient_id=recipient_id, unread_count=count)
+                for recipient_id, count in counts.items()
+            ],
+            update_conflicts=True,
+            unique_fields=["recipient"],
+            update_fields=["unread_count", "updated_at"]
+        )
+
+    # PostgreSQL refuses to index a table with deferred foreign key checks
+    # pending, so they run now rather than at commit
+    if schema_editor.connection.vendor == "postgresql":
+        schema_editor.execute("SET CONSTRAINTS ALL IMMEDIATE")
+        schema_editor.execute("SET CONSTRAINTS ALL DEFERRED")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('activity', '0005_unreadnotificationcounter'),
+        ('habits', '0005_routine_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name='notification',
+            name='one_notification_per_event',
+        ),
+        migrations.AddField(
+            model_name='notification',
+            name='grouped_actions',
+            field=models.ManyToManyField(blank=True, related_name='grouped_notifications', to='habits.action', verbose_name='Grouped Actions'),
+        ),
+        migrations.RunPython(collapse_missed_habit_notifications, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='notification',
+            constraint=models.UniqueConstraint(condition=models.Q(('event_date__isnull', False), models.Q(('category__in', ['user_missed_habit', 'partner_missed_habit']), _negated=True)), fields=('recipient', 'category', 'trigger_action', 'event_date'), name='one_notification_per_event'),
+        ),
+        migrations.AddConstraint(
+            model_name='notification',
+            constraint=models.UniqueConstraint(condition=models.Q(('event_date__isnull', False), ('category__in', ['user_missed_habit', 'partner_missed_habit'])), fields=('recipient', 'category', 'event_date'), name='one_grouped_notification_per_day'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:41
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('activity', '0006_notification_grouped_actions'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HeldNotification',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('release_at', models.DateTimeField(help_text="When the recipient's notification window next opens", verbose_name='Release At')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Created At')),
+                ('notification', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='hold', to='activity.notification')),
+            ],
+            options={
+                'verbose_name': 'Held Notification',
+                'verbose_name_plural': 'Held Notifications',
+                'indexes': [models.Index(fields=['release_at', 'id'], name='held_notification_release_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:43
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('activity', '0007_heldnotification'),
+        ('habits', '0005_routine_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ActionReminder',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fire_at', models.DateTimeField(help_text="Next reminder before the action's deadline in the owner's timezone", verbose_name='Fire At')),
+            ],
+            options={
+                'verbose_name': 'Action Reminder',
+                'verbose_name_plural': 'Action Reminders',
+            },
+        ),
+        migrations.RemoveConstraint(
+            model_name='notification',
+            name='habit_trigger_is_action_and_action_exists',
+        ),
+        migrations.AlterField(
+            model_name='notification',
+            name='category',
+            field=models.CharField(choices=[('user_missed_habit', 'User Missed Habit'), ('partner_missed_habit', 'Partner Missed Habit'), ('streak_milestone', 'Streak Milestone'), ('habit_reminder', 'Habit Reminder'), ('routine_completed', 'Routine Completed'), ('partnership_request', 'Partnership Request'), ('partnership_request_accepted', 'Partnership Request Accepted'), ('partnership_request_rejected', 'Partnership Request Rejected')], max_length=50, verbose_name='Category'),
+        ),
+        migrations.AddConstraint(
+            model_name='notification',
+            constraint=models.CheckConstraint(condition=models.Q(models.Q(('category__in', ['user_missed_habit', 'partner_missed_habit', 'streak_milestone', 'habit_reminder']), _negated=True), ('trigger_action__isnull', False), _connector='OR'), name='habit_trigger_is_action_and_action_exists'),
+        ),
+        migrations.AddField(
+            model_name='actionreminder',
+            name='action',
+            field=models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='reminder', to='habits.action'),
+        ),
+        migrations.AddIndex(
+            model_name='actionreminder',
+            index=models.Index(fields=['fire_at', 'id'], name='reminder_fire_idx'),
+        ),
+    ]
@@ -0,0 +1,221 @@
+from collections import defaultdict
+from datetime import datetime, time, timedelta, timezone as dt_timezone
+from django.db import transaction
+from django.db.models import Count, Exists, OuterRef, Q
+from django.utils import timezone
+from habits.models import Routine, Action, HabitCompletion
+from habits.leaderboard import refresh_standings
+from config.cache_versions import bump_versions
+from profiles.models import Preferences, AccountabilityPartnership
+from .models import Notification
+from .counters import refresh_unread_counts
+from .realtime import publish_notifications
+from .delivery import get_zone, hold_outside_window
+
+BATCH_SIZE = 2000
+
+USER_MISSED_HABIT = Notification.NotificationCategoryChoice.USER_MISSED_HABIT
+PARTNER_MISSED_HABIT = Notification.NotificationCategoryChoice.PARTNER_MISSED_HABIT
+GROUPED_CATEGORIES = [USER_MISSED_HABIT, PARTNER_MISSED_HABIT]
+
+
+def sweep_missed_habits(now=None, batch_size=BATCH_SIZE, zone_names=None):
+    now = now or timezone.now()
+    totals = {"actions": 0, "streaks_reset": 0, "notifications": 0}
+
+    for (yesterday, day_start), zone_names in _zone_buckets(now, zone_names).items():
+        owners = Q(routine__owner__profile__preferences__timezone__in=zone_names)
+
+        if "UTC" in zone_names:
+            owners |= Q(routine__owner__profile__preferences__isnull=True)
+
+        missed = Action.objects.filter(
+            owners,
+            routine__status=Routine.RoutineStatusChoice.ACTIVE,
+            routine__start_date__lte=yesterday,
+            created_at__lt=day_start
+        ).exclude(
+            Exists(HabitCompletion.objects.filter(
+                action=OuterRef("pk"),
+                completion_date=yesterday
+            ))
+        )
+
+        # Only streaks that are still running past the missed day are reset,
+        # so a rerun never wipes a streak restarted after the sweep
+        totals["streaks_reset"] += missed.filter(
+            current_streak__gt=0,
+            last_completed_on__lt=yesterday
+        ).update(current_streak=0)
+
+        rows = missed.order_by("pk").values_list(
+            "pk", "name", "routine__owner_id", "routine__owner__username"
+        )
+
+        batch = []
+
+        for row in rows.iterator(chunk_size=batch_size):
+            batch.append(row)
+
+            if len(batch) >= batch_size:
+                totals["notifications"] += _notify(batch, yesterday, now, batch_size)
+                totals["actions"] += len(batch)
+                # Reset streaks can only lower the standings of this batch's owners
+                refresh_standings({owner_id for _, _, owner_id, _ in batch})
+                bump_versions({owner_id for _, _, owner_id, _ in batch})
+                batch = []
+
+        if batch:
+            totals["notifications"] += _notify(batch, yesterday, now, batch_size)
+            totals["actions"] += len(batch)
+            refresh_standings({owner_id for _, _, owner_id, _ in batch})
+            bump_versions({owner_id for _, _, owner_id, _ in batch})
+
+    return totals
+
+
+def _zone_buckets(now, zone_names=None):
+    if zone_names is None:
+        zone_names = set(Preferences.objects.values_list("timezone", flat=True).distinct())
+        zone_names.add("UTC")
+
+    buckets = defaultdict(list)
+
+    for name in zone_names:
+        zone = get_zone(name)
+        today = now.astimezone(zone).date()
+        day_start = datetime.combine(today, time.min, tzinfo=zone)
+
+        # Zones sharing the same local day and midnight are swept together
+        buckets[(today - timedelta(days=1), day_start.astimezone(dt_timezone.utc))].append(name)
+
+    return buckets
+
+
+def _notify(rows, yesterday, now, batch_size):
+    owner_ids = {owner_id for _, _, owner_id, _ in rows}
+
+    partners = defaultdict(list)
+
+    for user_id, partner_id in AccountabilityPartnership.objects.filter(
+        user_id__in=owner_ids,
+        partner__isnull=False,
+        status=AccountabilityPartnership.AccountabilityStatus.ACCEPTED
+    ).values_list("user_id", "partner_id"):
+        partners[user_id].append(partner_id)
+
+    action_names = {}
+    owners = {}
+    groups = defaultdict(list)
+
+    for action_id, action_name, owner_id, username in rows:
+        action_names[action_id] = action_name
+        owners[action_id] = (owner_id, username)
+        groups[(owner_id, USER_MISSED_HABIT)].append(action_id)
+
+        for partner_id in partners[owner_id]:
+            groups[(partner_id, PARTNER_MISSED_HABIT)].append(action_id)
+
+    Link = Notification.grouped_actions.through
+    grouped = Notification.objects.filter(
+        recipient_id__in={recipient_id for recipient_id, _ in groups},
+        category__in=GROUPED_CATEGORIES,
+        event_date=yesterday
+    )
+
+    with transaction.atomic():
+        existing = set(grouped.values_list("recipient_id", "category"))
+
+        # One notification per recipient, category and day. Groups already
+        # written by an earlier batch or run conflict and are extended below
+        Notification.objects.bulk_create(
+            [
+                Notification(
+                    recipient_id=recipient_id,
+                    created_by_id=owners[action_ids[0]][0] if category == PARTNER_MISSED_HABIT else None,
+                    category=category,
+                    message=_group_message(category, len(action_ids), action_ids[0], action_names, owners, yesterday),
+                    trigger_action_id=action_ids[0],
+                    event_date=yesterday
+                )
+                for (recipient_id, category), action_ids in groups.items()
+            ],
+            batch_size=batch_size,
+            ignore_conflicts=True
+        )
+
+        notifications = {
+            (notification.recipient_id, notification.category): notification
+            for notification in grouped.only("pk", "recipient_id", "category", "trigger_action_id", "created_at")
+        }
+        notifications = {key: notifications[key] for key in groups}
+
+        previous_sizes = _group_sizes([notifications[key].pk for key in notifications if key in existing])
+
+        Link.objects.bulk_create(
+            [
+                Link(notification_id=notifications[key].pk, action_id=action_id)
+                for key, action_ids in groups.items()
+                for action_id in action_ids
+            ],
+            batch_size=batch_size,
+            ignore_conflicts=True
+        )
+
+        sizes = _group_sizes([notification.pk for notification in notifications.values()])
+
+        # A group that gained actions after it was read is news again, the
+        # recount below moves the counters with it
+        Notification.objects.filter(
+            pk__in=[
+                notification.pk for key, notification in notifications.items()
+                if key in existing and sizes[notification.pk] > previous_sizes.get(notification.pk, 0)
+            ],
+            read_status=True
+        ).update(read_status=False)
+
+        for notification in notifications.values():
+            notification.message = _group_message(
+                notification.category,
+                sizes[notification.pk],
+                notification.trigger_action_id,
+                action_names,
+                owners,
+                yesterday
+            )
+
+        Notification.objects.bulk_update(notifications.values(), ["message"], batch_size=batch_size)
+
+        # Only new groups are held, a group delivered earlier stays visible while it grows
+        created = [notification for key, notification in notifications.items() if key not in existing]
+        held = {notification.pk for notification in hold_outside_window(created, now, batch_size)}
+
+        # Held groups reach open streams when they are released
+        publish_notifications([notification for notification in created if notification.pk not in held])
+
+        # Reruns leave the groups unchanged, so the counters are recounted
+        # rather than incremented by the attempted rows
+        refresh_unread_counts({recipient_id for recipient_id, _ in groups})
+
+    return len(groups)
+
+
+def _group_sizes(notification_ids):
+    return dict(
+        Notification.grouped_actions.through.objects.filter(
+            notification_id__in=notification_ids
+        ).values("notification_id").annotate(size=Count("pk")).values_list("notification_id", "size")
+    )
+
+
+def _group_message(category, size, trigger_action_id, action_names, owners, yesterday):
+    if category == USER_MISSED_HABIT:
+        if size == 1 and trigger_action_id in action_names:
+            return f"You missed {action_names[trigger_action_id]} on {yesterday:%d %b}"
+
+        return f"You missed {size} habits on {yesterday:%d %b}"
+
+    if size == 1 and trigger_action_id in action_names:
+        return f"{owners[trigger_action_id][1]} missed {action_names[trigger_action_id]} on {yesterday:%d %b}"
+
+    return f"Your partners missed {size} habits on {yesterday:%d %b}"
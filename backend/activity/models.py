@@ -1,12 +1,19 @@
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models
 from django.contrib.auth.models import User
 from habits.models import Action
 
+class NotificationQuerySet(models.QuerySet):
+    def delivered(self):
+        return self.filter(hold__isnull=True)
+
+
 class Notification(models.Model):
     class NotificationCategoryChoice(models.TextChoices):
         USER_MISSED_HABIT = "user_missed_habit", "User Missed Habit"
         PARTNER_MISSED_HABIT = "partner_missed_habit", "Partner Missed Habit"
         STREAK_MILESTONE = "streak_milestone", "Streak Milestone"
+        HABIT_REMINDER = "habit_reminder", "Habit Reminder"
         ROUTINE_COMPLETED = "routine_completed", "Routine Completed"
         PARTNERSHIP_REQUEST = "partnership_request", "Partnership Request"
         PARTNERSHIP_REQUEST_ACCEPTED = "partnership_request_accepted", "Partnership Request Accepted"
@@ -55,16 +62,44 @@ class Notification(models.Model):
         blank=True
     )
 
+    event_date = models.DateField(
+        verbose_name="Event Date",
+        help_text="Local day the triggering event refers to",
+        null=True,
+        blank=True
+    )
+
+    grouped_actions = models.ManyToManyField(
+        Action,
+        verbose_name="Grouped Actions",
+        related_name="grouped_notifications",
+        blank=True
+    )
+
+    objects = NotificationQuerySet.as_manager()
+
     class Meta:
         verbose_name = "Notification"
         verbose_name_plural = "Notifications"
         ordering = ["-created_at"]
 
+        indexes = [
+            models.Index(
+                fields=["recipient", "-created_at", "-id"],
+                name="notification_recipient_idx"
+            ),
+            models.Index(
+                fields=["recipient", "-created_at"],
+                condition=models.Q(read_status=False),
+                name="notification_unread_idx"
+            )
+        ]
+
         constraints = [
             models.CheckConstraint(
                 name="habit_trigger_is_action_and_action_exists",
                 check=
-                    ~models.Q(category__in=["user_missed_habit", "partner_missed_habit", "streak_milestone"]) |
+                    ~models.Q(category__in=["user_missed_habit", "partner_missed_habit", "streak_milestone", "habit_reminder"]) |
                     models.Q(trigger_action__isnull=False)
             ),
             models.CheckConstraint(
@@ -78,8 +113,138 @@ class Notification(models.Model):
                 check=
                     ~models.Q(category="partnership") |
                     models.Q(created_by__isnull=False)
+            ),
+            models.UniqueConstraint(
+                fields=["recipient", "category", "trigger_action", "event_date"],
+                condition=
+                    models.Q(event_date__isnull=False) &
+                    ~models.Q(category__in=["user_missed_habit", "partner_missed_habit"]),
+                name="one_notification_per_event"
+            ),
+            models.UniqueConstraint(
+                fields=["recipient", "category", "event_date"],
+                condition=
+                    models.Q(event_date__isnull=False) &
+                    models.Q(category__in=["user_missed_habit", "partner_missed_habit"]),
+                name="one_grouped_notification_per_day"
             )
         ]
     
     def __str__(self):
         return f"{self.category} for {self.recipient.username} at {self.created_at}"
+
+
+class UnreadNotificationCounter(models.Model):
+    recipient = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        related_name="unread_notification_counter"
+    )
+
+    unread_count = models.PositiveIntegerField(
+        verbose_name="Unread Count",
+        default=0
+    )
+
+    updated_at = models.DateTimeField(
+        verbose_name="Updated At",
+        auto_now=True
+    )
+
+    class Meta:
+        verbose_name = "Unread Notification Counter"
+        verbose_name_plural = "Unread Notification Counters"
+
+    def __str__(self):
+        return f"{self.unread_count} unread for {self.recipient.username}"
+
+
+class HeldNotification(models.Model):
+    notification = models.OneToOneField(
+        Notification,
+        on_delete=models.CASCADE,
+        related_name="hold"
+    )
+
+    release_at = models.DateTimeField(
+        verbose_name="Release At",
+        help_text="When the recipient's notification window next opens"
+    )
+
+    created_at = models.DateTimeField(
+        verbose_name="Created At",
+        auto_now_add=True
+    )
+
+    class Meta:
+        verbose_name = "Held Notification"
+        verbose_name_plural = "Held Notifications"
+
+        indexes = [
+            models.Index(
+                fields=["release_at", "id"],
+                name="held_notification_release_idx"
+            )
+        ]
+
+    def __str__(self):
+        return f"Notification {self.notification_id} held until {self.release_at}"
+
+
+class ActionReminder(models.Model):
+    action = models.OneToOneField(
+        Action,
+        on_delete=models.CASCADE,
+        related_name="reminder"
+    )
+
+    fire_at = models.DateTimeField(
+        verbose_name="Fire At",
+        help_text="Next reminder before the action's deadline in the owner's timezone"
+    )
+
+    class Meta:
+        verbose_name = "Action Reminder"
+        verbose_name_plural = "Action Reminders"
+
+        indexes = [
+            models.Index(
+                fields=["fire_at", "id"],
+                name="reminder_fire_idx"
+            )
+        ]
+
+    def __str__(self):
+        return f"Reminder for action {self.action_id} at {self.fire_at}"
+
+
+class StreamEvent(models.Model):
+    recipient = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name="stream_events"
+    )
+
+    payload = models.JSONField(
+        verbose_name="Payload",
+        encoder=DjangoJSONEncoder
+    )
+
+    created_at = models.DateTimeField(
+        verbose_name="Created At",
+        auto_now_add=True
+    )
+
+    class Meta:
+        verbose_name = "Stream Event"
+        verbose_name_plural = "Stream Events"
+
+        indexes = [
+            models.Index(
+                fields=["created_at"],
+                name="stream_event_created_idx"
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.payload['type']} event for {self.recipient_id}"
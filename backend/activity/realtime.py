@@ -0,0 +1,210 @@
+import asyncio
+import json
+import threading
+import time
+from collections import defaultdict
+from datetime import timedelta
+from functools import lru_cache
+from django.conf import settings
+from django.db import DatabaseError, close_old_connections, connection, transaction
+from django.db.models import Max
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from .models import StreamEvent, UnreadNotificationCounter
+
+HEARTBEAT_SECONDS = 20
+MAX_PENDING_EVENTS = 100
+
+POLL_SECONDS = 2
+EVENT_RETENTION = timedelta(minutes=5)
+
+
+class Subscription:
+    def __init__(self, user_id, loop, max_pending=MAX_PENDING_EVENTS):
+        self.user_id = user_id
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize=max_pending)
+
+    def deliver(self, event):
+        # Slow consumers lose their oldest events rather than growing without bound
+        if self.queue.full():
+            self.queue.get_nowait()
+        self.queue.put_nowait(event)
+
+    async def get(self, timeout=None):
+        return await asyncio.wait_for(self.queue.get(), timeout)
+
+
+class InProcessBroker:
+    """
+    Fans events out to the streams connected to this worker. Events
+    published by any other process, such as run_scheduler, never reach them.
+    """
+
+    def __init__(self):
+        self.subscriptions = defaultdict(set)
+        self.lock = threading.Lock()
+
+    def subscribe(self, user_id):
+        subscription = Subscription(user_id, asyncio.get_running_loop())
+
+        with self.lock:
+            self.subscriptions[user_id].add(subscription)
+
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self.lock:
+            subscriptions = self.subscriptions.get(subscription.user_id)
+
+            if subscriptions is not None:
+                subscriptions.discard(subscription)
+
+                if not subscriptions:
+                    del self.subscriptions[subscription.user_id]
+
+    def has_subscribers(self, user_id):
+        return user_id in self.subscriptions
+
+    def publish(self, user_id, event):
+        with self.lock:
+            subscriptions = list(self.subscriptions.get(user_id, ()))
+
+        for subscription in subscriptions:
+            subscription.loop.call_soon_threadsafe(subscription.deliver, event)
+
+    def publish_all(self, events):
+        for user_id, event in events:
+            self.publish(user_id, event)
+
+
+class DatabaseBroker(InProcessBroker):
+    """
+    Carries events between processes through the StreamEvent table, so
+    notifications written by run_scheduler reach streams held by the ASGI
+    workers. Each worker polls for rows past the last one it has seen and
+    fans them out locally, events arrive up to POLL_SECONDS late.
+
+    A stand-in for a shared broker: every event is written whether or not
+    anyone listens, and rows are kept for EVENT_RETENTION only.
+    """
+
+    poll_seconds = POLL_SECONDS
+    retention = EVENT_RETENTION
+
+    def __init__(self):
+        super().__init__()
+        self.high_water = None
+        self.poller = None
+
+    def subscribe(self, user_id):
+        subscription = super().subscribe(user_id)
+        self.start()
+
+        return subscription
+
+    def start(self):
+        with self.lock:
+            if self.poller is None:
+                self.poller = threading.Thread(target=self.run, name="notification-broker", daemon=True)
+                self.poller.start()
+
+    def has_subscribers(self, user_id):
+        # Streams can be open in any process
+        return True
+
+    def publish(self, user_id, event):
+        self.publish_all([(user_id, event)])
+
+    def publish_all(self, events):
+        StreamEvent.objects.bulk_create([
+            StreamEvent(recipient_id=user_id, payload=event)
+            for user_id, event in events
+        ])
+
+    def run(self):
+        while True:
+            try:
+                self.poll()
+            except DatabaseError:
+                # Reconnect on the next poll rather than stop delivering
+                connection.close()
+            finally:
+                close_old_connections()
+
+            time.sleep(self.poll_seconds)
+
+    def poll(self):
+        latest = StreamEvent.objects.aggregate(latest=Max("pk"))["latest"] or 0
+
+        # Streams only get what was published after this worker started listening
+        if self.high_water is None:
+            self.high_water = latest
+            return
+
+        with self.lock:
+            user_ids = list(self.subscriptions)
+
+        events = StreamEvent.objects.filter(
+            pk__gt=self.high_water,
+            pk__lte=latest,
+            recipient_id__in=user_ids
+        ).order_by("pk").values_list("recipient_id", "payload")
+
+        for user_id, event in events:
+            super().publish(user_id, event)
+
+        self.high_water = latest
+
+        StreamEvent.objects.filter(created_at__lt=timezone.now() - self.retention).delete()
+
+
+@lru_cache(maxsize=1)
+def get_broker():
+    broker_class = getattr(settings, "NOTIFICATION_BROKER", "activity.realtime.InProcessBroker")
+    return import_string(broker_class)()
+
+
+def format_event(event):
+    return f"event: {event['type']}\ndata: {json.dumps(event['data'], default=str)}\n\n"
+
+
+def publish_notifications(notifications):
+    broker = get_broker()
+    events = [
+        (notification.recipient_id, {
+            "type": "notification",
+            "data": {
+                "id": notification.pk,
+                "category": notification.category,
+                "message": notification.message,
+                "trigger_action": notification.trigger_action_id,
+                "created_at": notification.created_at,
+            }
+        })
+        for notification in notifications
+        if broker.has_subscribers(notification.recipient_id)
+    ]
+
+    def send():
+        broker.publish_all(events)
+
+    if events:
+        transaction.on_commit(send)
+
+
+def publish_unread_counts(recipient_ids):
+    broker = get_broker()
+    listening = [recipient_id for recipient_id in recipient_ids if broker.has_subscribers(recipient_id)]
+
+    def send():
+        broker.publish_all([
+            (recipient_id, {"type": "unread_count", "data": {"unread_count": count}})
+            for recipient_id, count in UnreadNotificationCounter.objects.filter(
+                recipient_id__in=listening
+            ).values_list("recipient_id", "unread_count")
+        ])
+
+    # Counts are only read back for recipients with an open stream
+    if listening:
+        transaction.on_commit(send)
@@ -0,0 +1,183 @@
+from datetime import datetime, timedelta, timezone as dt_timezone
+from django.db import transaction
+from django.utils import timezone
+from habits.models import Routine, Action, HabitCompletion, DEADLINE_MINUTES, add_minutes
+from config.cache_versions import bump_versions
+from .models import Notification, ActionReminder
+from .counters import refresh_unread_counts
+from .delivery import get_zone, recipient_windows, window_release_at
+from .realtime import publish_notifications
+
+LEAD_MINUTES = 15
+DISPATCH_BATCH_SIZE = 1000
+REBUILD_CHUNK_SIZE = 2000
+
+
+def next_fire_at(start_time, zone_name, after):
+    zone = get_zone(zone_name)
+    local = after.astimezone(zone)
+    fire_time = add_minutes(start_time, DEADLINE_MINUTES - LEAD_MINUTES)
+
+    fire_at = datetime.combine(local.date(), fire_time, tzinfo=zone)
+
+    if fire_at <= local:
+        fire_at = datetime.combine(local.date() + timedelta(days=1), fire_time, tzinfo=zone)
+
+    return fire_at.astimezone(dt_timezone.utc)
+
+
+def schedule_actions(action_ids, now=None):
+    now = now or timezone.now()
+    action_ids = list(action_ids)
+
+    reminders = [
+        ActionReminder(action_id=action_id, fire_at=next_fire_at(start_time, zone_name or "UTC", now))
+        for action_id, start_time, zone_name in Action.objects.filter(
+            pk__in=action_ids,
+            routine__status=Routine.RoutineStatusChoice.ACTIVE
+        ).values_list("pk", "start_time", "routine__owner__profile__preferences__timezone")
+    ]
+
+    with transaction.atomic():
+        ActionReminder.objects.bulk_create(
+            reminders,
+            update_conflicts=True,
+            unique_fields=["action"],
+            update_fields=["fire_at"]
+        )
+
+        # Actions of routines that are no longer active drop out of the index
+        ActionReminder.objects.filter(action_id__in=action_ids).exclude(
+            action_id__in=[reminder.action_id for reminder in reminders]
+        ).delete()
+
+    return len(reminders)
+
+
+def schedule_routines(routine_ids, now=None):
+    return schedule_actions(Action.objects.filter(routine_id__in=routine_ids).values_list("pk", flat=True), now)
+
+
+def routine_saved(sender, instance, created=False, update_fields=None, **kwargs):
+    # A new routine has no actions yet, any other save may change the status,
+    # which adds or removes every action of the routine from the index
+    if not created and (update_fields is None or "status" in update_fields):
+        schedule_routines([instance.pk])
+        bump_versions([instance.owner_id])
+
+
+def routine_status_changed(sender, routine_ids, owner_ids, **kwargs):
+    schedule_routines(routine_ids)
+    bump_versions(owner_ids)
+
+
+def schedule_owner(user_id, now=None):
+    return schedule_actions(Action.objects.filter(routine__owner_id=user_id).values_list("pk", flat=True), now)
+
+
+def rebuild_reminders(chunk_size=REBUILD_CHUNK_SIZE, now=None):
+    now = now or timezone.now()
+    scheduled = 0
+    chunk = []
+
+    for action_id in Action.objects.order_by("pk").values_list("pk", flat=True).iterator(chunk_size=chunk_size):
+        chunk.append(action_id)
+
+        if len(chunk) >= chunk_size:
+            scheduled += schedule_actions(chunk, now)
+            chunk = []
+
+    if chunk:
+        scheduled += schedule_actions(chunk, now)
+
+    ActionReminder.objects.exclude(
+        action__routine__status=Routine.RoutineStatusChoice.ACTIVE
+    ).delete()
+
+    return scheduled
+
+
+def dispatch_due_reminders(now=None, batch_size=DISPATCH_BATCH_SIZE):
+    now = now or timezone.now()
+    sent = 0
+
+    while True:
+        with transaction.atomic():
+            due = list(
+                ActionReminder.objects.filter(
+                    fire_at__lte=now
+                ).select_for_update(skip_locked=True, of=("self",)).order_by("fire_at", "pk").values_list(
+                    "pk", "action_id", "fire_at", "action__name", "action__start_time",
+                    "action__routine__owner_id", "action__routine__status", "action__routine__start_date"
+                )[:batch_size]
+            )
+
+            if not due:
+                break
+
+            sent += _send(due, now)
+
+        if len(due) < batch_size:
+            break
+
+    return sent
+
+
+def _send(due, now):
+    windows = recipient_windows({row[5] for row in due})
+    pending = {}
+    advanced = []
+
+    for pk, action_id, fire_at, name, start_time, owner_id, status, start_date in due:
+        window = windows[owner_id]
+        local_day = fire_at.astimezone(get_zone(window[0])).date()
+
+        # Reminders past their deadline, e.g. after downtime, or outside the window are skipped
+        if (
+            status == Routine.RoutineStatusChoice.ACTIVE
+            and start_date <= local_day
+            and now - fire_at < timedelta(minutes=LEAD_MINUTES)
+            and window_release_at(fire_at, *window) is None
+        ):
+            pending[(action_id, local_day)] = Notification(
+                recipient_id=owner_id,
+                category=Notification.NotificationCategoryChoice.HABIT_REMINDER,
+                message=f"{name} is due by {add_minutes(start_time, DEADLINE_MINUTES):%H:%M}",
+                trigger_action_id=action_id,
+                event_date=local_day
+            )
+
+        advanced.append(ActionReminder(pk=pk, fire_at=next_fire_at(start_time, window[0], now)))
+
+    completed = set(HabitCompletion.objects.filter(
+        action_id__in={action_id for action_id, _ in pending},
+        completion_date__in={local_day for _, local_day in pending}
+    ).values_list("action_id", "completion_date")) if pending else set()
+
+    notifications = [notification for key, notification in pending.items() if key not in completed]
+
+    ActionReminder.objects.bulk_update(advanced, ["fire_at"])
+
+    if notifications:
+        # one_notification_per_event turns a second dispatch of the same day into a no-op
+        Notification.objects.bulk_create(notifications, ignore_conflicts=True)
+
+        keys = {(notification.trigger_action_id, notification.event_date) for notification in notifications}
+        created = [
+            notification
+            for notification in Notification.objects.filter(
+                category=Notification.NotificationCategoryChoice.HABIT_REMINDER,
+                trigger_action_id__in={action_id for action_id, _ in keys},
+                event_date__in={local_day for _, local_day in keys}
+            )
+            if (notification.trigger_action_id, notification.event_date) in keys
+        ]
+
+        publish_notifications(created)
+        refresh_unread_counts({notification.recipient_id for notification in notifications})
+
+    return len(notifications)
+
+
+def next_reminder_at():
+    return ActionReminder.objects.order_by("fire_at").values_list("fire_at", flat=True).first()
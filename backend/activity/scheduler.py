@@ -0,0 +1,83 @@
+from collections import defaultdict
+from datetime import datetime, time, timedelta, timezone as dt_timezone
+from django.utils import timezone
+from profiles.models import Preferences
+from .delivery import get_zone, release_held_notifications, next_release_at, RELEASE_BATCH_SIZE
+from .missed_habits import sweep_missed_habits, BATCH_SIZE
+from .reminders import dispatch_due_reminders, next_reminder_at, DISPATCH_BATCH_SIZE
+
+MAX_SLEEP_SECONDS = 300
+
+
+def offset_buckets(now):
+    zone_names = set(Preferences.objects.values_list("timezone", flat=True).distinct())
+    zone_names.add("UTC")
+
+    buckets = defaultdict(list)
+
+    # Conversions go through the cached zones, so the cost is per distinct
+    # zone rather than per user
+    for name in zone_names:
+        buckets[now.astimezone(get_zone(name)).utcoffset()].append(name)
+
+    return buckets
+
+
+class Scheduler:
+    """
+    Runs the missed habit sweep once per local day for every UTC offset in
+    use, sends due reminders and releases held notifications as their
+    windows open.
+    """
+
+    def __init__(
+        self,
+        batch_size=BATCH_SIZE,
+        release_batch_size=RELEASE_BATCH_SIZE,
+        reminder_batch_size=DISPATCH_BATCH_SIZE
+    ):
+        self.batch_size = batch_size
+        self.release_batch_size = release_batch_size
+        self.reminder_batch_size = reminder_batch_size
+        self.swept = {}
+
+    def run_pending(self, now=None):
+        now = now or timezone.now()
+        totals = {"buckets": 0, "actions": 0, "notifications": 0, "reminders": 0, "released": 0}
+
+        for offset, zone_names in offset_buckets(now).items():
+            local_day = (now + offset).date()
+
+            # The sweep is idempotent, so a restarted scheduler safely repeats the current day
+            if self.swept.get(offset) == local_day:
+                continue
+
+            swept = sweep_missed_habits(now=now, batch_size=self.batch_size, zone_names=zone_names)
+            self.swept[offset] = local_day
+
+            totals["buckets"] += 1
+            totals["actions"] += swept["actions"]
+            totals["notifications"] += swept["notifications"]
+
+        totals["reminders"] = dispatch_due_reminders(now=now, batch_size=self.reminder_batch_size)
+        totals["released"] = release_held_notifications(now=now, batch_size=self.release_batch_size)
+
+        return totals
+
+    def next_run_at(self, now=None):
+        now = now or timezone.now()
+        candidates = [now + timedelta(seconds=MAX_SLEEP_SECONDS)]
+
+        for offset in offset_buckets(now):
+            local_day = (now + offset).date()
+            candidates.append(
+                datetime.combine(local_day + timedelta(days=1), time.min, tzinfo=dt_timezone.utc) - offset
+            )
+
+        candidates += [
+            due_at
+            for due_at in (next_release_at(), next_reminder_at())
+            if due_at is not None
+        ]
+
+        return max(now, min(candidates))
@@ -21,15 +21,28 @@ class TriggerActionSerializer(serializers.ModelSerializer):
 class NotificationSerializer(serializers.ModelSerializer):
     recipient = UserAsNotifierSerializer(read_only=True)
     created_by = UserAsNotifierSerializer(read_only=True)
-    trigger_action = TriggerActionSerializer(read_only=True, many=True)
+    trigger_action = TriggerActionSerializer(read_only=True)
+    grouped_actions = TriggerActionSerializer(many=True, read_only=True)
     class Meta:
         model=Notification
         fields = [
             "id", "recipient", "created_by",
             "category", "message", "read_status",
-            "created_at", "updated_at"
+            "trigger_action", "grouped_actions", "created_at"
         ]
         read_only_fields = [
             "id", "recipient", "created_by",
-            "category", "message", "created_at", "updated_at"
-        ]
\ No newline at end of file
+            "category", "message", "trigger_action", "grouped_actions", "created_at"
+        ]
+
+class NotificationBulkFilterSerializer(serializers.Serializer):
+    category = serializers.ChoiceField(
+        choices=Notification.NotificationCategoryChoice.choices,
+        required=False
+    )
+    trigger_action = serializers.IntegerField(required=False)
+    before = serializers.DateTimeField(required=False)
+    up_to = serializers.IntegerField(
+        required=False,
+        help_text="Notification id, applies to it and everything older"
+    )
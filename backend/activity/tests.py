@@ -1,3 +1,528 @@
-from django.test import TestCase
+from datetime import date, datetime, time, timedelta, timezone as dt_timezone
+from io import StringIO
+from unittest import mock
+from zoneinfo import ZoneInfo
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from asgiref.sync import sync_to_async
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from rest_framework_simplejwt.tokens import AccessToken
+from rest_framework.test import APIClient
+from config.testing import QueryBudgetMixin
+from habits.models import Routine, Action, HabitCompletion
+from profiles.models import UserProfile, Preferences, AccountabilityPartnership
+from .models import Notification, UnreadNotificationCounter, HeldNotification, ActionReminder, StreamEvent
+from .counters import notifications_created, get_unread_count
+from .delivery import window_release_at, release_held_notifications
+from .scheduler import Scheduler, MAX_SLEEP_SECONDS
+from .reminders import schedule_actions, dispatch_due_reminders, next_reminder_at
+from .realtime import DatabaseBroker, get_broker
+from .serializers import NotificationSerializer
+from .views import NotificationViewSet, notification_events
+from .missed_habits import sweep_missed_habits
+from .urls import router
 
-# Create your tests here.
+
+def make_user(username, timezone_name=None):
+    user = User.objects.create_user(username=username, email=f"{username}@example.com", password="pw")
+
+    if timezone_name:
+        profile = UserProfile.objects.create(user=user)
+        Preferences.objects.create(user_profile=profile, timezone=timezone_name)
+
+    return user
+
+
+def make_action(owner, name="Meditate", status=Routine.RoutineStatusChoice.ACTIVE, **kwargs):
+    routine = Routine.objects.create(
+        name=f"{name} routine",
+        reason="Because",
+        owner=owner,
+        status=status,
+        start_date=date(2025, 1, 1)
+    )
+    action = Action.objects.create(name=name, routine=routine, start_time=time(7, 0), **kwargs)
+    Action.objects.filter(pk=action.pk).update(created_at=datetime(2025, 1, 1, tzinfo=dt_timezone.utc))
+    return action
+
+
+class MissedHabitSweepTests(TestCase):
+    def setUp(self):
+        self.owner = make_user("owner", "Europe/London")
+        self.partner = make_user("partner")
+        AccountabilityPartnership.objects.create(
+            user=self.owner,
+            partner=self.partner,
+            status=AccountabilityPartnership.AccountabilityStatus.ACCEPTED
+        )
+        self.now = datetime(2025, 3, 10, 9, 0, tzinfo=dt_timezone.utc)
+
+    def test_missed_action_notifies_owner_and_partner_and_resets_streak(self):
+        action = make_action(self.owner, current_streak=4, last_completed_on=date(2025, 3, 8))
+
+        sweep_missed_habits(now=self.now)
+
+        action.refresh_from_db()
+        self.assertEqual(action.current_streak, 0)
+
+        categories = dict(Notification.objects.values_list("recipient__username", "category"))
+        self.assertEqual(categories, {
+            "owner": Notification.NotificationCategoryChoice.USER_MISSED_HABIT,
+            "partner": Notification.NotificationCategoryChoice.PARTNER_MISSED_HABIT,
+        })
+        self.assertEqual(Notification.objects.filter(event_date=date(2025, 3, 9)).count(), 2)
+
+    def test_completed_and_inactive_actions_are_skipped(self):
+        done = make_action(self.owner, name="Read")
+        HabitCompletion.objects.create(action=done, user=self.owner, completion_date=date(2025, 3, 9))
+        make_action(self.owner, name="Paused", status=Routine.RoutineStatusChoice.PAUSED)
+
+        sweep_missed_habits(now=self.now)
+
+        self.assertFalse(Notification.objects.exists())
+
+    def test_rerun_does_not_duplicate(self):
+        make_action(self.owner)
+
+        sweep_missed_habits(now=self.now)
+        sweep_missed_habits(now=self.now)
+
+        self.assertEqual(Notification.objects.count(), 2)
+
+    def test_yesterday_follows_user_timezone(self):
+        far_east = make_user("tokyo", "Asia/Tokyo")
+        make_action(far_east)
+
+        # 16:00 UTC on the 9th is already 01:00 on the 10th in Tokyo
+        sweep_missed_habits(now=datetime(2025, 3, 9, 16, 0, tzinfo=dt_timezone.utc))
+
+        self.assertEqual(
+            list(Notification.objects.values_list("recipient__username", "event_date")),
+            [("tokyo", date(2025, 3, 9))]
+        )
+
+    def test_misses_are_grouped_per_recipient_and_day(self):
+        second_owner = make_user("second")
+        AccountabilityPartnership.objects.create(
+            user=second_owner,
+            partner=self.partner,
+            status=AccountabilityPartnership.AccountabilityStatus.ACCEPTED
+        )
+        own = [make_action(self.owner, name=name) for name in ("Meditate", "Read", "Run")]
+        other = make_action(second_owner, name="Stretch")
+
+        # A tiny batch size splits the groups across batches, which must extend them
+        sweep_missed_habits(now=self.now, batch_size=2)
+        sweep_missed_habits(now=self.now, batch_size=2)
+
+        self.assertEqual(Notification.objects.count(), 3)
+
+        owner_group = Notification.objects.get(recipient=self.owner)
+        self.assertEqual(set(owner_group.grouped_actions.all()), set(own))
+        self.assertEqual(owner_group.message, "You missed 3 habits on 09 Mar")
+
+        partner_group = Notification.objects.get(recipient=self.partner)
+        self.assertEqual(set(partner_group.grouped_actions.all()), {*own, other})
+        self.assertEqual(partner_group.message, "Your partners missed 4 habits on 09 Mar")
+
+        self.assertEqual(Notification.objects.get(recipient=second_owner).message, "You missed Stretch on 09 Mar")
+        self.assertEqual(UnreadNotificationCounter.objects.get(recipient=self.partner).unread_count, 1)
+
+    def test_group_gaining_actions_after_read_is_unread_again(self):
+        make_action(self.owner, name="Meditate")
+        sweep_missed_habits(now=self.now)
+
+        group = Notification.objects.get(recipient=self.owner)
+        client = APIClient()
+        client.force_authenticate(self.owner)
+        client.patch(f"/api/activity/notifications/{group.id}/", {"read_status": True})
+        self.assertEqual(get_unread_count(self.owner.id), 0)
+
+        # An unchanged rerun leaves it read
+        sweep_missed_habits(now=self.now)
+        self.assertEqual(get_unread_count(self.owner.id), 0)
+
+        make_action(self.owner, name="Read")
+        sweep_missed_habits(now=self.now)
+
+        group.refresh_from_db()
+        self.assertFalse(group.read_status)
+        self.assertEqual(group.message, "You missed 2 habits on 09 Mar")
+        self.assertEqual(get_unread_count(self.owner.id), 1)
+
+
+class NotificationWindowTests(TestCase):
+    def setUp(self):
+        self.owner = make_user("owner", "America/New_York")
+        self.action = make_action(self.owner)
+        self.client = APIClient()
+        self.client.force_authenticate(self.owner)
+        # 05:00 UTC on the 10th is midnight in New York, before the default 08:00 window
+        self.midnight = datetime(2025, 3, 10, 5, 0, tzinfo=dt_timezone.utc)
+
+    def visible(self):
+        return self.client.get("/api/activity/notifications/").data["results"]
+
+    def test_window_release_time(self):
+        afternoon = datetime(2025, 3, 10, 14, 0, tzinfo=dt_timezone.utc)
+        self.assertIsNone(window_release_at(afternoon, "America/New_York", time(8), time(22)))
+        self.assertEqual(
+            window_release_at(self.midnight, "America/New_York", time(8), time(22)),
+            datetime(2025, 3, 10, 12, 0, tzinfo=dt_timezone.utc)
+        )
+        # Overnight windows wrap around midnight
+        self.assertIsNone(window_release_at(self.midnight, "America/New_York", time(22), time(6)))
+        self.assertEqual(
+            window_release_at(datetime(2025, 3, 10, 7, 0, tzinfo=dt_timezone.utc), "Nowhere/Invalid", time(22), time(6)),
+            datetime(2025, 3, 10, 22, 0, tzinfo=dt_timezone.utc)
+        )
+
+    def test_outside_window_is_held_until_release(self):
+        sweep_missed_habits(now=self.midnight)
+
+        self.assertEqual(HeldNotification.objects.get().release_at, datetime(2025, 3, 10, 12, 0, tzinfo=dt_timezone.utc))
+        self.assertEqual(self.visible(), [])
+        self.assertEqual(get_unread_count(self.owner.id), 0)
+
+        self.assertEqual(release_held_notifications(now=datetime(2025, 3, 10, 11, 59, tzinfo=dt_timezone.utc)), 0)
+        self.assertEqual(release_held_notifications(now=datetime(2025, 3, 10, 12, 0, tzinfo=dt_timezone.utc), batch_size=1), 1)
+
+        self.assertEqual(len(self.visible()), 1)
+        self.assertEqual(get_unread_count(self.owner.id), 1)
+
+    def test_only_delivered_groups_are_published(self):
+        night_owl = make_user("night_owl", "America/New_York")
+        Preferences.objects.filter(user_profile__user=night_owl).update(
+            notification_window_start=time(0, 0),
+            notification_window_end=time(23, 59)
+        )
+        make_action(night_owl)
+
+        with mock.patch("activity.missed_habits.publish_notifications") as publish:
+            sweep_missed_habits(now=self.midnight)
+
+        self.assertEqual(
+            [notification.recipient_id for notification in publish.call_args.args[0]],
+            [night_owl.id]
+        )
+        self.assertEqual(HeldNotification.objects.get().notification.recipient, self.owner)
+
+    def test_scheduler_sweeps_each_offset_once_per_local_day(self):
+        scheduler = Scheduler()
+
+        first = scheduler.run_pending(now=self.midnight)
+        second = scheduler.run_pending(now=self.midnight + timedelta(hours=1))
+
+        self.assertEqual(first["notifications"], 1)
+        self.assertEqual(second["buckets"], 0)
+        self.assertEqual(
+            scheduler.next_run_at(now=self.midnight + timedelta(hours=1)),
+            self.midnight + timedelta(hours=1, seconds=MAX_SLEEP_SECONDS)
+        )
+
+        released = scheduler.run_pending(now=datetime(2025, 3, 10, 12, 0, tzinfo=dt_timezone.utc))
+        self.assertEqual(released["released"], 1)
+
+
+class ReminderDispatchTests(TestCase):
+    def setUp(self):
+        self.owner = make_user("owner", "America/New_York")
+        Preferences.objects.filter(user_profile__user=self.owner).update(notification_window_start=time(6, 0))
+        self.action = make_action(self.owner)
+        self.client = APIClient()
+        self.client.force_authenticate(self.owner)
+        # 07:15 in New York, fifteen minutes before the 07:30 deadline
+        self.fire_at = datetime(2025, 3, 5, 12, 15, tzinfo=dt_timezone.utc)
+        schedule_actions([self.action.pk], now=datetime(2025, 3, 5, 0, 0, tzinfo=dt_timezone.utc))
+
+    def reminders(self):
+        return Notification.objects.filter(category=Notification.NotificationCategoryChoice.HABIT_REMINDER)
+
+    def test_deadline_wraps_past_midnight(self):
+        self.assertEqual(Action(start_time=time(23, 45)).deadline, time(0, 15))
+
+    def test_index_follows_action_and_routine_edits(self):
+        self.assertEqual(ActionReminder.objects.get().fire_at, self.fire_at)
+
+        self.client.patch(f"/api/habits/actions/{self.action.id}/", {"start_time": "09:00"})
+        fire_time = ActionReminder.objects.get().fire_at.astimezone(ZoneInfo("America/New_York")).time()
+        self.assertEqual(fire_time, time(9, 15))
+
+        self.client.patch(
+            f"/api/habits/routines/{self.action.routine_id}/",
+            {"status": Routine.RoutineStatusChoice.PAUSED}
+        )
+        self.assertFalse(ActionReminder.objects.exists())
+
+    def test_index_follows_status_changes_outside_the_views(self):
+        routine = self.action.routine
+
+        # Auto-completion on the check-in that reaches the target
+        Routine.objects.filter(pk=routine.pk).update(target_completions=1)
+        self.client.post("/api/habits/completions/", {"action": self.action.id, "completion_date": "2025-03-05"})
+        self.assertFalse(ActionReminder.objects.exists())
+
+        # Saves from anywhere else, e.g. the admin
+        routine.refresh_from_db()
+        routine.status = Routine.RoutineStatusChoice.ACTIVE
+        routine.save()
+        self.assertTrue(ActionReminder.objects.exists())
+
+        self.assertTrue(routine.mark_complete())
+        self.assertFalse(ActionReminder.objects.exists())
+
+        other = make_action(self.owner, name="Read")
+        schedule_actions([other.pk])
+        HabitCompletion.objects.create(action=other, user=self.owner, completion_date=date(2025, 3, 5))
+        Routine.objects.filter(pk=other.routine_id).update(target_completions=1)
+
+        call_command("reconcile_routines", stdout=StringIO())
+        self.assertFalse(ActionReminder.objects.exists())
+
+    def test_due_reminders_are_sent_once_and_advanced(self):
+        self.assertEqual(dispatch_due_reminders(now=self.fire_at - timedelta(minutes=1)), 0)
+        self.assertEqual(dispatch_due_reminders(now=self.fire_at), 1)
+        self.assertEqual(dispatch_due_reminders(now=self.fire_at), 0)
+
+        self.assertEqual(self.reminders().get().message, "Meditate is due by 07:30")
+        self.assertEqual(ActionReminder.objects.get().fire_at, self.fire_at + timedelta(days=1))
+        self.assertEqual(next_reminder_at(), self.fire_at + timedelta(days=1))
+
+    def test_completed_and_stale_reminders_are_skipped(self):
+        HabitCompletion.objects.create(action=self.action, user=self.owner, completion_date=date(2025, 3, 5))
+        other = make_action(self.owner, name="Read")
+        schedule_actions([other.pk], now=datetime(2025, 3, 5, 0, 0, tzinfo=dt_timezone.utc))
+
+        self.assertEqual(dispatch_due_reminders(now=self.fire_at, batch_size=1), 1)
+        self.assertEqual(self.reminders().get().trigger_action, other)
+
+        # A dispatcher that was down past the deadline does not send late reminders
+        self.assertEqual(dispatch_due_reminders(now=self.fire_at + timedelta(days=1, hours=1)), 0)
+        self.assertEqual(self.reminders().count(), 1)
+
+
+class UnreadCounterTests(TestCase):
+    def setUp(self):
+        self.user = make_user("reader")
+        self.action = make_action(self.user)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def notify(self, count):
+        notifications = Notification.objects.bulk_create([
+            Notification(
+                recipient=self.user,
+                category=Notification.NotificationCategoryChoice.USER_MISSED_HABIT,
+                message="Missed",
+                trigger_action=self.action
+            )
+            for _ in range(count)
+        ])
+        notifications_created(notifications)
+        return notifications
+
+    def unread_count(self):
+        with self.assertNumQueries(1):
+            response = self.client.get("/api/activity/notifications/unread-count/")
+
+        return response.data["unread_count"]
+
+    def test_counter_follows_reads_and_deletes(self):
+        first, second, third = self.notify(3)
+        self.assertEqual(self.unread_count(), 3)
+
+        self.client.patch(f"/api/activity/notifications/{first.id}/", {"read_status": True})
+        self.assertEqual(self.unread_count(), 2)
+
+        self.client.patch(f"/api/activity/notifications/{first.id}/", {"read_status": False})
+        self.client.delete(f"/api/activity/notifications/{second.id}/")
+        self.client.delete(f"/api/activity/notifications/{first.id}/")
+        self.assertEqual(self.unread_count(), 1)
+
+    def test_concurrent_requests_move_the_counter_once(self):
+        first, second, _ = self.notify(3)
+        # Loaded by requests that lose the race to the API calls below
+        stale_first = Notification.objects.get(pk=first.pk)
+        stale_second = Notification.objects.get(pk=second.pk)
+
+        self.client.patch(f"/api/activity/notifications/{first.id}/", {"read_status": True})
+        self.client.delete(f"/api/activity/notifications/{second.id}/")
+
+        serializer = NotificationSerializer(stale_first, data={"read_status": True}, partial=True)
+        serializer.is_valid(raise_exception=True)
+        NotificationViewSet().perform_update(serializer)
+        NotificationViewSet().perform_destroy(stale_second)
+
+        self.assertEqual(self.unread_count(), 1)
+
+    def test_sweeper_recounts_recipients(self):
+        sweep_missed_habits(now=datetime(2025, 3, 10, 9, 0, tzinfo=dt_timezone.utc))
+        sweep_missed_habits(now=datetime(2025, 3, 10, 9, 0, tzinfo=dt_timezone.utc))
+
+        self.assertEqual(self.unread_count(), 1)
+
+    def test_reconcile_repairs_drift(self):
+        self.notify(2)
+        UnreadNotificationCounter.objects.filter(recipient=self.user).update(unread_count=40)
+
+        call_command("reconcile_unread_counts", chunk_size=1, stdout=StringIO())
+
+        self.assertEqual(self.unread_count(), 2)
+
+
+class BulkNotificationActionTests(TestCase):
+    def setUp(self):
+        self.user = make_user("reader")
+        self.other = make_user("other")
+        self.meditate = make_action(self.user)
+        self.read = make_action(self.user, name="Read")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+        self.notifications = [
+            Notification.objects.create(
+                recipient=recipient,
+                category=category,
+                message="Note",
+                trigger_action=trigger_action
+            )
+            for recipient, category, trigger_action in (
+                (self.user, Notification.NotificationCategoryChoice.USER_MISSED_HABIT, self.meditate),
+                (self.user, Notification.NotificationCategoryChoice.STREAK_MILESTONE, self.read),
+                (self.user, Notification.NotificationCategoryChoice.USER_MISSED_HABIT, self.read),
+                (self.other, Notification.NotificationCategoryChoice.USER_MISSED_HABIT, self.meditate),
+            )
+        ]
+        notifications_created(self.notifications)
+
+    def unread(self):
+        return self.client.get("/api/activity/notifications/unread-count/").data["unread_count"]
+
+    def test_mark_read_by_category_and_action(self):
+        response = self.client.post("/api/activity/notifications/mark-read/", {"category": "user_missed_habit"})
+        self.assertEqual(response.data, {"updated": 2})
+
+        response = self.client.post("/api/activity/notifications/mark-read/", {"trigger_action": self.read.id})
+        self.assertEqual(response.data, {"updated": 1})
+
+        self.assertEqual(self.unread(), 0)
+        self.assertFalse(Notification.objects.get(recipient=self.other).read_status)
+
+    def test_mark_read_up_to_cursor(self):
+        response = self.client.post(
+            "/api/activity/notifications/mark-read/",
+            {"up_to": self.notifications[1].id}
+        )
+
+        self.assertEqual(response.data, {"updated": 2})
+        self.assertFalse(Notification.objects.get(pk=self.notifications[2].id).read_status)
+        self.assertEqual(self.unread(), 1)
+
+    def test_bulk_delete_all(self):
+        response = self.client.post("/api/activity/notifications/bulk-delete/")
+
+        self.assertEqual(response.data, {"deleted": 3})
+        self.assertEqual(Notification.objects.count(), 1)
+        self.assertEqual(self.unread(), 0)
+
+    def test_rejects_unknown_category(self):
+        response = self.client.post("/api/activity/notifications/mark-read/", {"category": "nope"})
+
+        self.assertEqual(response.status_code, 400)
+
+
+@override_settings(NOTIFICATION_BROKER="activity.realtime.InProcessBroker")
+class NotificationStreamTests(TransactionTestCase):
+    def setUp(self):
+        get_broker.cache_clear()
+        self.addCleanup(get_broker.cache_clear)
+        self.user = make_user("listener")
+        self.action = make_action(self.user)
+
+    def create_notification(self):
+        notification = Notification.objects.create(
+            recipient=self.user,
+            category=Notification.NotificationCategoryChoice.USER_MISSED_HABIT,
+            message="Missed meditation",
+            trigger_action=self.action
+        )
+        notifications_created([notification])
+
+    async def test_stream_authenticates_with_access_token(self):
+        token = AccessToken.for_user(self.user)
+        response = await self.async_client.get(f"/api/activity/notifications/stream/?token={token}")
+
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        self.assertIn(b'"unread_count": 0', await anext(aiter(response.streaming_content)))
+
+    async def test_events_push_notifications_and_counts(self):
+        events = notification_events(self.user.id)
+
+        self.assertIn('"unread_count": 0', await anext(events))
+        self.assertTrue(get_broker().has_subscribers(self.user.id))
+
+        await sync_to_async(self.create_notification)()
+
+        self.assertIn("event: notification", await anext(events))
+        self.assertIn('"unread_count": 1', await anext(events))
+
+        await events.aclose()
+        self.assertFalse(get_broker().has_subscribers(self.user.id))
+
+    async def test_stream_rejects_invalid_token(self):
+        response = await self.async_client.get("/api/activity/notifications/stream/?token=nope")
+
+        self.assertEqual(response.status_code, 401)
+
+
+
+class DatabaseBrokerTests(TransactionTestCase):
+    def setUp(self):
+        self.listener = make_user("listener")
+        self.other = make_user("other")
+
+    async def test_relays_events_published_by_another_process(self):
+        worker = DatabaseBroker()
+
+        with mock.patch.object(worker, "start"):
+            subscription = worker.subscribe(self.listener.id)
+
+        await sync_to_async(worker.poll)()
+
+        # The scheduler process publishes through its own broker
+        await sync_to_async(DatabaseBroker().publish_all)([
+            (self.listener.id, {"type": "unread_count", "data": {"unread_count": 3}}),
+            (self.other.id, {"type": "unread_count", "data": {"unread_count": 1}}),
+        ])
+        await sync_to_async(worker.poll)()
+
+        self.assertEqual(await subscription.get(timeout=1), {"type": "unread_count", "data": {"unread_count": 3}})
+        self.assertTrue(subscription.queue.empty())
+
+        await StreamEvent.objects.aupdate(created_at=timezone.now() - worker.retention * 2)
+        await sync_to_async(worker.poll)()
+
+        self.assertFalse(await StreamEvent.objects.aexists())
+
+class ActivityQueryBudgetTests(QueryBudgetMixin, TestCase):
+    router = router
+    query_budgets = {
+        "notification": 3,
+    }
+
+    def setUp(self):
+        self.user = make_user("recipient")
+        self.partner = make_user("sender")
+
+    def seed(self, user, count):
+        for _ in range(count):
+            trigger_action = make_action(self.partner)
+            notification = Notification.objects.create(
+                recipient=user,
+                created_by=self.partner,
+                category=Notification.NotificationCategoryChoice.PARTNER_MISSED_HABIT,
+                message="Missed",
+                trigger_action=trigger_action
+            )
+            notification.grouped_actions.add(trigger_action, make_action(self.partner, name="Read"))
@@ -7,5 +7,6 @@ router = DefaultRouter()
 router.register(r'notifications', views.NotificationViewSet, basename='notification')
 
 urlpatterns = [
+    path('notifications/stream/', views.notification_stream, name='notification-stream'),
     path('', include(router.urls))
 ]
\ No newline at end of file
@@ -1,5 +1,14 @@
+import asyncio
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.http import HttpResponse, StreamingHttpResponse
+from django.db.models import Exists, OuterRef, Prefetch, Q
 from rest_framework import viewsets
+from rest_framework.decorators import action
+from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.exceptions import ValidationError
 from rest_framework.mixins import (
     ListModelMixin,
     RetrieveModelMixin,
@@ -7,10 +16,22 @@ from rest_framework.mixins import (
     DestroyModelMixin
 )
 from rest_framework.viewsets import GenericViewSet
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+from rest_framework_simplejwt.tokens import AccessToken
+from config.conditional import ConditionalGetMixin
+from config.pagination import CreatedAtCursorPagination
+from habits.models import Action
 from .models import Notification
-from .serializers import NotificationSerializer
+from .serializers import NotificationSerializer, NotificationBulkFilterSerializer
+from .realtime import get_broker, format_event, HEARTBEAT_SECONDS
+from .counters import (
+    get_unread_count, adjust_unread_count, refresh_unread_counts,
+    notification_read_changed, notification_deleted
+)
 
 class NotificationViewSet(
+    ConditionalGetMixin,
     ListModelMixin,
     RetrieveModelMixin,
     UpdateModelMixin,
@@ -19,10 +40,162 @@ class NotificationViewSet(
 ):
     serializer_class = NotificationSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = CreatedAtCursorPagination
+    # Read state changes move the unread counter, which bumps the cache version
+    last_modified_field = "created_at"
 
     def get_queryset(self):
-        return Notification.objects.filter(
+        return Notification.objects.delivered().filter(
             recipient=self.request.user
+        ).select_related(
+            "recipient", "created_by", "trigger_action"
+        ).prefetch_related(
+            Prefetch("grouped_actions", queryset=Action.objects.only("id", "name"))
         )
 
 
+
+    
+    def perform_update(self, serializer):
+        notification = serializer.instance
+        was_read = notification.read_status
+        notification.read_status = serializer.validated_data.get("read_status", was_read)
+
+        with transaction.atomic():
+            # read_status is the only writable field. The update matches only
+            # while the row still holds the state this request read, so of two
+            # concurrent requests just one moves the counter
+            flipped = Notification.objects.filter(
+                pk=notification.pk,
+                read_status=was_read
+            ).exclude(read_status=notification.read_status).update(read_status=notification.read_status)
+
+            if flipped:
+                notification_read_changed(notification, was_read)
+    
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            # Locked so a concurrent read or delete cannot change the state
+            # the counter is adjusted by
+            read_status = Notification.objects.select_for_update().filter(
+                pk=instance.pk
+            ).values_list("read_status", flat=True).first()
+
+            if read_status is None:
+                return
+
+            Notification.objects.filter(pk=instance.pk).delete()
+            instance.read_status = read_status
+            notification_deleted(instance)
+
+    @action(detail=False, methods=["get"], url_path="unread-count")
+    def unread_count(self, request):
+        return Response({"unread_count": get_unread_count(request.user.id)})
+
+    def bulk_queryset(self, request):
+        filters = NotificationBulkFilterSerializer(data=request.data)
+        filters.is_valid(raise_exception=True)
+        params = filters.validated_data
+
+        query_set = Notification.objects.delivered().filter(recipient=request.user)
+
+        if "category" in params:
+            query_set = query_set.filter(category=params["category"])
+
+        if "trigger_action" in params:
+            query_set = query_set.filter(
+                Q(trigger_action_id=params["trigger_action"]) |
+                Exists(Notification.grouped_actions.through.objects.filter(
+                    notification_id=OuterRef("pk"),
+                    action_id=params["trigger_action"]
+                ))
+            )
+
+        if "before" in params:
+            query_set = query_set.filter(created_at__lte=params["before"])
+
+        if "up_to" in params:
+            cursor = Notification.objects.delivered().filter(
+                recipient=request.user, pk=params["up_to"]
+            ).values_list("created_at", flat=True).first()
+
+            if cursor is None:
+                raise ValidationError({"up_to": ["Notification not found"]})
+
+            query_set = query_set.filter(
+                Q(created_at__lt=cursor) | Q(created_at=cursor, pk__lte=params["up_to"])
+            )
+
+        return query_set
+
+    @action(detail=False, methods=["post"], url_path="mark-read")
+    def mark_read(self, request):
+        with transaction.atomic():
+            updated = self.bulk_queryset(request).filter(read_status=False).update(read_status=True)
+            adjust_unread_count(request.user.id, -updated)
+
+        return Response({"updated": updated})
+
+    @action(detail=False, methods=["post"], url_path="bulk-delete")
+    def bulk_delete(self, request):
+        with transaction.atomic():
+            _, deleted_by_model = self.bulk_queryset(request).delete()
+            deleted = deleted_by_model.get(Notification._meta.label, 0)
+
+            if deleted:
+                refresh_unread_counts([request.user.id])
+
+        return Response({"deleted": deleted})
+
+
+async def stream_user(request):
+    header = request.headers.get("Authorization", "")
+    # EventSource cannot send headers, so browsers pass the access token as a query parameter
+    raw_token = header.removeprefix("Bearer ").strip() if header.startswith("Bearer ") else request.GET.get("token")
+
+    if not raw_token:
+        return None
+
+    try:
+        token = AccessToken(raw_token)
+    except TokenError:
+        return None
+
+    return await User.objects.filter(
+        pk=token.get(jwt_settings.USER_ID_CLAIM),
+        is_active=True
+    ).afirst()
+
+async def notification_events(user_id):
+    broker = get_broker()
+    subscription = broker.subscribe(user_id)
+
+    try:
+        unread_count = await sync_to_async(get_unread_count)(user_id)
+        yield format_event({"type": "unread_count", "data": {"unread_count": unread_count}})
+
+        while True:
+            try:
+                event = await subscription.get(timeout=HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                yield ": keep-alive\n\n"
+                continue
+
+            yield format_event(event)
+    finally:
+        broker.unsubscribe(subscription)
+
+async def notification_stream(request):
+    if request.method != "GET":
+        return HttpResponse(status=405, headers={"Allow": "GET"})
+
+    user = await stream_user(request)
+
+    if user is None:
+        return HttpResponse(status=401)
+
+    response = StreamingHttpResponse(notification_events(user.id), content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"
+
+    return response
@@ -0,0 +1,80 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, transaction
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+# Enough for request.user in every view, anything else loads on first access
+USER_FIELDS = ["id", "username", "email", "first_name", "last_name", "is_active", "is_staff", "is_superuser"]
+
+INVALIDATING_FIELDS = set(USER_FIELDS) | {"password"}
+
+
+def user_key(user_id):
+    return f"auth:user:{user_id}"
+
+
+def invalidate_users(user_ids):
+    cache.delete_many([user_key(user_id) for user_id in user_ids])
+
+
+def user_changed(sender, instance, update_fields=None, **kwargs):
+    # Logins only stamp last_login, which the cache does not hold
+    if update_fields is not None and not INVALIDATING_FIELDS & set(update_fields):
+        return
+
+    # Read now, a delete clears the pk before the commit runs
+    user_id = instance.pk
+
+    # Dropped once the write is visible, otherwise a concurrent request could
+    # cache the row as it was before the change
+    transaction.on_commit(lambda: invalidate_users([user_id]))
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    Trusts the signed user id claim and reads the user from a short-lived
+    cache entry, so a warm request authenticates without a query. Entries
+    are dropped when a user is saved or deleted, and expire after
+    AUTH_USER_CACHE_TIMEOUT seconds to bound queryset.update() writes.
+    """
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken("Token contained no recognizable user identification")
+
+        record = cache.get(user_key(user_id))
+
+        if record is None:
+            record = self.load_record(user_id)
+            cache.set(user_key(user_id), record, settings.AUTH_USER_CACHE_TIMEOUT)
+
+        if api_settings.CHECK_USER_IS_ACTIVE and not record["is_active"]:
+            raise AuthenticationFailed("User is inactive", code="user_inactive")
+
+        if api_settings.CHECK_REVOKE_TOKEN and validated_token.get(
+            api_settings.REVOKE_TOKEN_CLAIM
+        ) != record["password_hash"]:
+            raise AuthenticationFailed("The user's password has been changed.", code="password_changed")
+
+        # from_db takes the loaded values in model field order
+        fields = [field.attname for field in self.user_model._meta.concrete_fields if field.attname in record]
+
+        return self.user_model.from_db(DEFAULT_DB_ALIAS, fields, [record[field] for field in fields])
+
+    def load_record(self, user_id):
+        record = self.user_model.objects.filter(
+            **{api_settings.USER_ID_FIELD: user_id}
+        ).values(*USER_FIELDS, "password").first()
+
+        if record is None:
+            raise AuthenticationFailed("User not found", code="user_not_found")
+
+        # Only a digest of the hash is cached, for the revocation check
+        record["password_hash"] = get_md5_hash_password(record.pop("password"))
+
+        return record
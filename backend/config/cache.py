@@ -0,0 +1,328 @@
+import pickle
+import threading
+from collections import Counter, OrderedDict, defaultdict
+from time import monotonic, sleep
+from django.core.cache import DEFAULT_CACHE_ALIAS, caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+LOCAL_MAX_ENTRIES = 1000
+LOCAL_TIMEOUT = 5
+
+LOCK_TIMEOUT = 30
+SINGLE_FLIGHT_WAIT = 5
+SINGLE_FLIGHT_POLL = 0.05
+
+_MISSING = object()
+
+# Tiers are shared by every thread of the process, one per cache location,
+# the same way LocMemCache keeps its storage
+_tiers = {}
+_tiers_lock = threading.Lock()
+
+# Builds in progress in this process, by key. The lock only guards the dict,
+# nothing waits or computes while holding it
+_flights = {}
+_flights_lock = threading.Lock()
+
+
+def namespace(key):
+    return str(key).split(":", 1)[0]
+
+
+class _LocalTier:
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.metrics = defaultdict(Counter)
+        self.lock = threading.Lock()
+
+    def get(self, key, space):
+        with self.lock:
+            entry = self.entries.get(key)
+
+            if entry is None:
+                return _MISSING
+
+            expires_at, pickled, _ = entry
+
+            if expires_at <= monotonic():
+                del self.entries[key]
+                self.metrics[space]["expirations"] += 1
+                return _MISSING
+
+            self.entries.move_to_end(key)
+
+        return pickle.loads(pickled)
+
+    def set(self, key, value, ttl, space):
+        pickled = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+
+        with self.lock:
+            self.entries[key] = (monotonic() + ttl, pickled, space)
+            self.entries.move_to_end(key)
+
+            while len(self.entries) > self.max_entries:
+                _, (_, _, evicted_space) = self.entries.popitem(last=False)
+                self.metrics[evicted_space]["evictions"] += 1
+
+            self.metrics[space]["sets"] += 1
+
+    def delete(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def record(self, space, name, count=1):
+        with self.lock:
+            self.metrics[space][name] += count
+
+
+class TieredCache(BaseCache):
+    """
+    Bounded in-process LRU in front of a shared cache alias.
+
+    Local copies live for at most LOCAL_TIMEOUT seconds, so another worker's
+    write can be missed for that long. Keys that have to be coherent across
+    workers, such as version tokens and locks, skip the local tier.
+    """
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get("OPTIONS", {})
+
+        self.shared_alias = options.get("SHARED", "shared")
+        self.local_timeout = options.get("LOCAL_TIMEOUT", LOCAL_TIMEOUT)
+        self.local_bypass = set(options.get("LOCAL_BYPASS", ()))
+
+        with _tiers_lock:
+            self.local = _tiers.setdefault(location, _LocalTier(options.get("LOCAL_MAX_ENTRIES", LOCAL_MAX_ENTRIES)))
+
+    @property
+    def shared(self):
+        return caches[self.shared_alias]
+
+    def local_key(self, key, version):
+        return self.make_and_validate_key(key, version=version)
+
+    def cached_locally(self, key):
+        return self.local_timeout > 0 and namespace(key) not in self.local_bypass
+
+    def store_locally(self, key, value, timeout, version):
+        if not self.cached_locally(key):
+            return
+
+        if timeout is DEFAULT_TIMEOUT:
+            timeout = self.default_timeout
+
+        ttl = self.local_timeout if timeout is None else min(timeout, self.local_timeout)
+
+        if ttl > 0:
+            self.local.set(self.local_key(key, version), value, ttl, namespace(key))
+
+    def get(self, key, default=None, version=None):
+        space = namespace(key)
+
+        if self.cached_locally(key):
+            value = self.local.get(self.local_key(key, version), space)
+
+            if value is not _MISSING:
+                self.local.record(space, "local_hits")
+                return value
+
+        value = self.shared.get(key, _MISSING, version=version)
+
+        if value is _MISSING:
+            self.local.record(space, "misses")
+            return default
+
+        self.local.record(space, "shared_hits")
+        self.store_locally(key, value, None, version)
+
+        return value
+
+    def get_many(self, keys, version=None):
+        found = {}
+        remaining = []
+
+        for key in keys:
+            value = _MISSING
+
+            if self.cached_locally(key):
+                value = self.local.get(self.local_key(key, version), namespace(key))
+
+            if value is _MISSING:
+                remaining.append(key)
+            else:
+                self.local.record(namespace(key), "local_hits")
+                found[key] = value
+
+        fetched = self.shared.get_many(remaining, version=version) if remaining else {}
+
+        for key in remaining:
+            if key in fetched:
+                self.local.record(namespace(key), "shared_hits")
+                self.store_locally(key, fetched[key], None, version)
+            else:
+                self.local.record(namespace(key), "misses")
+
+        return found | fetched
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.shared.set(key, value, timeout=self.timeout_for_shared(timeout), version=version)
+        self.store_locally(key, value, timeout, version)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        failed = self.shared.set_many(data, timeout=self.timeout_for_shared(timeout), version=version)
+
+        for key, value in data.items():
+            if key not in failed:
+                self.store_locally(key, value, timeout, version)
+
+        return failed
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        added = self.shared.add(key, value, timeout=self.timeout_for_shared(timeout), version=version)
+
+        if added:
+            self.store_locally(key, value, timeout, version)
+
+        return added
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        self.local.delete(self.local_key(key, version))
+        return self.shared.touch(key, timeout=self.timeout_for_shared(timeout), version=version)
+
+    def delete(self, key, version=None):
+        self.local.delete(self.local_key(key, version))
+        return self.shared.delete(key, version=version)
+
+    def delete_many(self, keys, version=None):
+        for key in keys:
+            self.local.delete(self.local_key(key, version))
+
+        self.shared.delete_many(keys, version=version)
+
+    def has_key(self, key, version=None):
+        if self.cached_locally(key) and self.local.get(self.local_key(key, version), namespace(key)) is not _MISSING:
+            return True
+
+        return self.shared.has_key(key, version=version)
+
+    def incr(self, key, delta=1, version=None):
+        self.local.delete(self.local_key(key, version))
+        return self.shared.incr(key, delta, version=version)
+
+    def clear(self):
+        self.local.clear()
+        self.shared.clear()
+
+    def timeout_for_shared(self, timeout):
+        # This alias's TIMEOUT is the default for both tiers
+        return self.default_timeout if timeout is DEFAULT_TIMEOUT else timeout
+
+    def metrics(self):
+        with self.local.lock:
+            return {space: dict(counts) for space, counts in sorted(self.local.metrics.items())}
+
+    def reset_metrics(self):
+        with self.local.lock:
+            self.local.metrics.clear()
+
+
+def cache_metrics(using=DEFAULT_CACHE_ALIAS):
+    store = caches[using]
+    return store.metrics() if hasattr(store, "metrics") else {}
+
+
+def _record(store, key, name):
+    if isinstance(store, TieredCache):
+        store.local.record(namespace(key), name)
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = _MISSING
+
+
+def single_flight(key, compute, timeout=DEFAULT_TIMEOUT, using=DEFAULT_CACHE_ALIAS, wait=SINGLE_FLIGHT_WAIT):
+    """
+    Returns the cached value for key, computing it at most once at a time.
+    Threads of one worker wait on the build of the same key, and workers
+    race for a lock key on the shared cache, so a cold key is built once
+    per expiry. Builds of different keys never wait on each other.
+    """
+
+    store = caches[using]
+    value = store.get(key, _MISSING)
+
+    if value is not _MISSING:
+        return value
+
+    with _flights_lock:
+        flight = _flights.get(key)
+        leader = flight is None
+
+        if leader:
+            flight = _flights[key] = _Flight()
+
+    if not leader:
+        if flight.done.wait(wait) and flight.value is not _MISSING:
+            _record(store, key, "coalesced")
+            return flight.value
+
+        # The build in this worker is slow or failed, build it here rather
+        # than fail the request
+        _record(store, key, "lock_timeouts")
+        value = compute()
+        store.set(key, value, timeout)
+        return value
+
+    try:
+        flight.value = _build(store, key, compute, timeout, wait)
+        return flight.value
+    finally:
+        with _flights_lock:
+            del _flights[key]
+
+        flight.done.set()
+
+
+def _build(store, key, compute, timeout, wait):
+    value = store.get(key, _MISSING)
+
+    if value is not _MISSING:
+        _record(store, key, "coalesced")
+        return value
+
+    lock_key = f"lock:{key}"
+
+    if not store.add(lock_key, 1, timeout=LOCK_TIMEOUT):
+        deadline = monotonic() + wait
+
+        while monotonic() < deadline:
+            sleep(SINGLE_FLIGHT_POLL)
+            value = store.get(key, _MISSING)
+
+            if value is not _MISSING:
+                _record(store, key, "coalesced")
+                return value
+
+        # The worker holding the lock is slow or gone, build it here
+        # rather than fail the request
+        _record(store, key, "lock_timeouts")
+        value = compute()
+        store.set(key, value, timeout)
+        return value
+
+    try:
+        _record(store, key, "computed")
+        value = compute()
+        store.set(key, value, timeout)
+    finally:
+        store.delete(lock_key)
+
+    return value
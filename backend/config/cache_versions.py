@@ -0,0 +1,66 @@
+from datetime import datetime, timezone
+from secrets import token_hex
+from time import time_ns
+from django.core.cache import cache
+from django.db import transaction
+
+GLOBAL_KEY = "version:global"
+
+
+def user_key(user_id):
+    return f"version:user:{user_id}"
+
+
+def named_key(name):
+    return f"version:{name}"
+
+
+def new_token():
+    # Leads with the bump time so a version also says when it last changed
+    return f"{time_ns():x}-{token_hex(4)}"
+
+
+def version_modified_at(version):
+    nanoseconds = max(int(token.split("-")[0], 16) for token in version.split("."))
+    return datetime.fromtimestamp(nanoseconds / 1e9, tz=timezone.utc)
+
+
+def current_version(user_id):
+    keys = [GLOBAL_KEY, user_key(user_id)]
+    versions = cache.get_many(keys)
+    missing = {key: new_token() for key in keys if key not in versions}
+
+    # Set before anything is read from the database, so data built for this
+    # version can never predate a bump made after it
+    if missing:
+        cache.set_many(missing, timeout=None)
+        versions.update(missing)
+
+    return ".".join(versions[key] for key in keys)
+
+
+def named_version(name):
+    version = cache.get(named_key(name))
+
+    if version is None:
+        cache.add(named_key(name), new_token(), timeout=None)
+        version = cache.get(named_key(name))
+
+    return version
+
+
+def bump_versions(user_ids):
+    keys = [user_key(user_id) for user_id in set(user_ids) if user_id is not None]
+
+    # Bumped once the write is visible, otherwise a concurrent read could
+    # cache the old rows under the new version
+    if keys:
+        transaction.on_commit(lambda: cache.set_many({key: new_token() for key in keys}, timeout=None))
+
+
+def bump_all_versions():
+    transaction.on_commit(lambda: cache.set(GLOBAL_KEY, new_token(), timeout=None))
+
+
+def bump_named_version(name):
+    transaction.on_commit(lambda: cache.set(named_key(name), new_token(), timeout=None))
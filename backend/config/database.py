@@ -0,0 +1,47 @@
+import threading
+from collections import Counter
+from django.db import DEFAULT_DB_ALIAS, connections
+
+_opened = Counter()
+_opened_lock = threading.Lock()
+
+
+def connection_opened(sender, connection, **kwargs):
+    with _opened_lock:
+        _opened[connection.alias] += 1
+
+
+def connection_mode(wrapper):
+    if getattr(wrapper, "pool", None) is not None:
+        return "pool"
+
+    return "none" if wrapper.settings_dict["CONN_MAX_AGE"] == 0 else "persistent"
+
+
+def connection_metrics(using=DEFAULT_DB_ALIAS):
+    """
+    How connections to one database are being reused in this process.
+    "opened" counts connection_created signals, which in pool mode are
+    checkouts from the pool, so the pool's own statistics are included too.
+    """
+
+    wrapper = connections[using]
+    mode = connection_mode(wrapper)
+
+    metrics = {
+        "vendor": wrapper.vendor,
+        "mode": mode,
+        "conn_max_age": wrapper.settings_dict["CONN_MAX_AGE"],
+        "health_checks": wrapper.settings_dict["CONN_HEALTH_CHECKS"],
+        "opened": _opened[using],
+    }
+
+    if mode == "pool":
+        metrics.update(wrapper.pool.get_stats())
+
+    return metrics
+
+
+def reset_connection_metrics():
+    with _opened_lock:
+        _opened.clear()
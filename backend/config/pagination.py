@@ -0,0 +1,109 @@
+from datetime import datetime
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import Cursor, CursorPagination
+
+
+class CreatedAtCursorPagination(CursorPagination):
+    """
+    Keyset pagination over (created_at, id), newest first.
+
+    DRF's cursor keeps only the first ordering field and steps over ties
+    with an offset, and bulk writes give many rows the same created_at. The
+    position here holds both values, so every page is one range condition
+    on the pair and the offset is always 0.
+    """
+
+    page_size = 50
+    page_size_query_param = "page_size"
+    max_page_size = 200
+    ordering = ("-created_at", "-id")
+
+    def get_ordering(self, request, queryset, view):
+        return self.ordering
+
+    def _get_position_from_instance(self, instance, ordering):
+        return f"{instance.created_at.isoformat()}|{instance.pk}"
+
+    def position_filter(self, position, newer):
+        try:
+            created_at, pk = position.split("|")
+            created_at, pk = datetime.fromisoformat(created_at), int(pk)
+        except ValueError:
+            raise NotFound(self.invalid_cursor_message)
+
+        if newer:
+            return Q(created_at__gt=created_at) | Q(created_at=created_at, pk__gt=pk)
+
+        return Q(created_at__lt=created_at) | Q(created_at=created_at, pk__lt=pk)
+
+    def window(self, queryset, request):
+        """
+        The rows one page request reads, page_size + 1 of them so the caller
+        can tell whether another page follows.
+        """
+
+        page_size = self.get_page_size(request)
+        cursor = self.decode_cursor(request)
+
+        reverse = cursor is not None and cursor.reverse
+        position = None if cursor is None else cursor.position
+
+        # A reversed cursor walks back towards newer rows for the previous page
+        if reverse:
+            queryset = queryset.order_by("created_at", "id")
+        else:
+            queryset = queryset.order_by(*self.ordering)
+
+        if position is not None:
+            queryset = queryset.filter(self.position_filter(position, newer=reverse))
+
+        return queryset[:page_size + 1]
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+        self.cursor = self.decode_cursor(request)
+
+        reverse = self.cursor is not None and self.cursor.reverse
+        position = None if self.cursor is None else self.cursor.position
+
+        results = list(self.window(queryset, request))
+        self.page = results[:self.page_size]
+        has_following = len(results) > len(self.page)
+
+        if reverse:
+            self.page.reverse()
+            self.has_next = position is not None
+            self.has_previous = has_following
+        else:
+            self.has_next = has_following
+            self.has_previous = position is not None
+
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+
+        return self.page
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+
+        # Past an empty page there is nothing to anchor on, start over
+        position = self._get_position_from_instance(self.page[-1], self.ordering) if self.page else None
+
+        return self.encode_cursor(Cursor(offset=0, reverse=False, position=position))
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+
+        position = self._get_position_from_instance(self.page[0], self.ordering) if self.page else None
+
+        return self.encode_cursor(Cursor(offset=0, reverse=True, position=position))
@@ -1,6 +1,7 @@
 from pathlib import Path
-from decouple import config
+from decouple import config, Csv
 from datetime import timedelta
+from django.core.exceptions import ImproperlyConfigured
 
 #  *** Core ***
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -53,7 +54,7 @@ MIDDLEWARE = [
 
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'config.authentication.CachedJWTAuthentication',
     ],
     "DEFAULT_PERMISSION_CLASSES": [
         'rest_framework.permissions.IsAuthenticated'
@@ -127,8 +128,64 @@ else:
         }
     }
 
+# Connection reuse: "persistent" keeps a worker's connection open for
+# DB_CONN_MAX_AGE seconds, "pool" checks connections out of a psycopg pool
+# (PostgreSQL with psycopg[pool] installed) and "none" connects per request.
+# SQLite has no pool, so there "pool" falls back to persistent connections.
+DB_CONNECTION_MODE = config('DB_CONNECTION_MODE', default='persistent')
+
+if DB_CONNECTION_MODE not in ('persistent', 'pool', 'none'):
+    raise ImproperlyConfigured(f"Unknown DB_CONNECTION_MODE {DB_CONNECTION_MODE!r}")
+
+# Pings a reused connection before the first query of a request, so a
+# connection the server dropped is replaced instead of failing the request
+DATABASES['default']['CONN_HEALTH_CHECKS'] = config('DB_CONN_HEALTH_CHECKS', default=True, cast=bool)
+
+if DB_CONNECTION_MODE == 'pool' and USE_POSTGRES:
+    from psycopg_pool import ConnectionPool
+
+    DATABASES['default']['OPTIONS'] = {
+        'pool': {
+            'min_size': config('DB_POOL_MIN_SIZE', default=2, cast=int),
+            'max_size': config('DB_POOL_MAX_SIZE', default=10, cast=int),
+            # Seconds an idle connection above min_size is kept open
+            'max_idle': config('DB_POOL_MAX_IDLE', default=300, cast=float),
+            # Seconds a request waits for a free connection before erroring
+            'timeout': config('DB_POOL_TIMEOUT', default=10, cast=float),
+            'check': ConnectionPool.check_connection if DATABASES['default']['CONN_HEALTH_CHECKS'] else None,
+        }
+    }
+elif DB_CONNECTION_MODE != 'none':
+    DATABASES['default']['CONN_MAX_AGE'] = config('DB_CONN_MAX_AGE', default=60, cast=int)
+
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# *** Caching ***
+
+# The default alias keeps a short-lived in-process copy of hot keys in front
+# of the shared alias. Point CACHE_BACKEND at a shared store (e.g. Django's
+# RedisCache) when running several workers, the local memory default only
+# stands in for one.
+CACHES = {
+    'default': {
+        'BACKEND': 'config.cache.TieredCache',
+        'LOCATION': 'tiered',
+        'TIMEOUT': config('CACHE_TIMEOUT', default=300, cast=int),
+        'OPTIONS': {
+            'SHARED': 'shared',
+            'LOCAL_MAX_ENTRIES': config('CACHE_LOCAL_MAX_ENTRIES', default=1000, cast=int),
+            'LOCAL_TIMEOUT': config('CACHE_LOCAL_TIMEOUT', default=5, cast=int),
+            # Version tokens and single-flight locks must be read from the shared store
+            'LOCAL_BYPASS': ['version', 'lock'],
+        },
+    },
+    'shared': {
+        'BACKEND': config('CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': config('CACHE_LOCATION', default='shared'),
+        'TIMEOUT': config('CACHE_TIMEOUT', default=300, cast=int),
+    },
+}
+
 # *** Authentication ***
 
 SIMPLE_JWT = {
@@ -146,6 +203,10 @@ SIMPLE_JWT = {
     'USER_ID_CLAIM': 'user_id',
 }
 
+# Seconds an authenticated user record is served from cache, saves and
+# deletes drop it sooner
+AUTH_USER_CACHE_TIMEOUT = config('AUTH_USER_CACHE_TIMEOUT', default=60, cast=int)
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -161,6 +222,23 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# *** Notifications ***
+
+# Event fan-out for the notification stream. InProcessBroker only reaches
+# streams held by the process that publishes, and run_scheduler is its own
+# process, so missed-habit, reminder and released notifications would never
+# reach a stream with it. DatabaseBroker relays events through the database
+# to every ASGI worker, a few seconds late; swap for a shared broker (Redis
+# pub/sub or similar) when that delay or the extra writes matter
+NOTIFICATION_BROKER = config(
+    'NOTIFICATION_BROKER', default='activity.realtime.DatabaseBroker'
+)
+
+# Streak lengths, in days, that earn a streak milestone notification
+STREAK_MILESTONES = config(
+    'STREAK_MILESTONES', default='7,14,30,60,90', cast=Csv(int)
+)
+
 # *** Internationalisation ***
 LANGUAGE_CODE = 'en-us'
 TIME_ZONE = 'UTC'
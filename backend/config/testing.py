@@ -0,0 +1,51 @@
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+
+class QueryBudgetMixin:
+    """
+    Fails when a router list endpoint runs more queries than its declared
+    budget, or when its query count grows with the number of rows listed.
+
+    Test cases set router, query_budgets and self.user, and define
+    seed(user, count) to add count more rows to every listed endpoint.
+    """
+
+    router = None
+    query_budgets = {}
+    small_size = 1
+    large_size = 20
+
+    def count_list_queries(self, client, basename):
+        # Budgets are for a cold cache, seeding does not bump cache versions
+        cache.clear()
+
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(reverse(f"{basename}-list"))
+
+        self.assertEqual(response.status_code, 200, f"{basename}-list returned {response.status_code}")
+        return len(queries)
+
+    def test_list_endpoints_within_query_budget(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+
+        self.seed(self.user, self.small_size)
+        small = {
+            basename: self.count_list_queries(client, basename)
+            for _, _, basename in self.router.registry
+        }
+
+        self.seed(self.user, self.large_size - self.small_size)
+
+        for _, _, basename in self.router.registry:
+            with self.subTest(endpoint=basename):
+                self.assertIn(basename, self.query_budgets, f"No query budget declared for {basename}-list")
+
+                large = self.count_list_queries(client, basename)
+
+                self.assertLessEqual(large, self.query_budgets[basename])
+                self.assertEqual(small[basename], large, f"{basename}-list query count grows with page size")
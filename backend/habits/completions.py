@@ -0,0 +1,102 @@
+from django.db import transaction
+from .models import HabitCompletion
+from .streaks import lock_actions
+from . import leaderboard, milestones, progress, rollups, streaks
+
+BULK_LIMIT = 100
+
+
+def completion_created(completion, action):
+    # action is the completion's action as read by lock_actions in this
+    # transaction, the hooks keep it current for the next completion
+    previous_streak = action["current_streak"]
+    streaks.apply_completion(completion, action)
+    milestones.emit_streak_milestones(action, previous_streak)
+    rollups.apply_completion(completion)
+    progress.completion_added(completion.action_id)
+    leaderboard.refresh_standings([completion.user_id])
+
+
+def completion_updated(previous, completion, action):
+    rollups.revert_completion(previous)
+    rollups.apply_completion(completion)
+
+    if completion.action_id != previous.action_id:
+        previous_streak = action["current_streak"]
+        streaks.recalculate_action(previous.action_id)
+        action.update(streaks.recalculate_action(completion.action_id))
+        milestones.emit_streak_milestones(action, previous_streak)
+        progress.completion_removed(previous.action_id)
+        progress.completion_added(completion.action_id)
+        leaderboard.refresh_standings([completion.user_id])
+    elif completion.completion_date != previous.completion_date:
+        previous_streak = action["current_streak"]
+        action.update(streaks.recalculate_action(completion.action_id))
+        milestones.emit_streak_milestones(action, previous_streak)
+        leaderboard.refresh_standings([completion.user_id])
+
+
+def completion_deleted(completion):
+    streaks.revert_completion(completion)
+    rollups.revert_completion(completion)
+    progress.completion_removed(completion.action_id)
+    leaderboard.refresh_standings([completion.user_id])
+
+
+def bulk_upsert(user, items):
+    # items are validated, owned by the user and unique per (action, completion_date)
+    if not items:
+        return []
+
+    keys = {(item["action"], item["completion_date"]) for item in items}
+    action_ids = {action_id for action_id, _ in keys}
+
+    completions = [
+        HabitCompletion(
+            user=user,
+            action_id=item["action"],
+            completion_date=item["completion_date"],
+            difficulty=item["difficulty"],
+            confidence=item["confidence"],
+            feeling=item["feeling"]
+        )
+        for item in items
+    ]
+
+    results = []
+
+    with transaction.atomic():
+        actions = lock_actions(action_ids)
+
+        # Read under the locks, so a concurrent request cannot also classify
+        # one of these rows as created and run its hooks a second time
+        existing = {
+            (completion.action_id, completion.completion_date): completion
+            for completion in HabitCompletion.objects.filter(
+                action_id__in=action_ids,
+                completion_date__in={completion_date for _, completion_date in keys}
+            )
+            if (completion.action_id, completion.completion_date) in keys
+        }
+
+        HabitCompletion.objects.bulk_create(
+            completions,
+            update_conflicts=True,
+            unique_fields=["action", "completion_date"],
+            update_fields=["difficulty", "confidence", "feeling", "updated_at"]
+        )
+
+        for completion in completions:
+            previous = existing.get((completion.action_id, completion.completion_date))
+
+            if previous is None:
+                completion_created(completion, actions[completion.action_id])
+            else:
+                completion.pk = previous.pk
+                completion.user_id = previous.user_id
+                completion.created_at = previous.created_at
+                completion_updated(previous, completion, actions[completion.action_id])
+
+            results.append((completion, previous is None))
+
+    return results
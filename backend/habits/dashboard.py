@@ -0,0 +1,61 @@
+from datetime import timedelta
+from django.core.cache import cache
+from django.db.models import Exists, OuterRef, Prefetch
+from django.utils import timezone
+from activity.counters import get_unread_count
+from activity.delivery import get_zone
+from config.cache import single_flight
+from config.cache_versions import current_version
+from profiles.models import Preferences
+from .models import Routine, Action, HabitCompletion
+from .serializers import DashboardSerializer
+
+CACHE_TIMEOUT = int(timedelta(days=1).total_seconds())
+
+
+def dashboard_key(user_id, version):
+    return f"dashboard:{user_id}:{version}"
+
+
+def local_today(zone_name, now=None):
+    return (now or timezone.now()).astimezone(get_zone(zone_name)).date()
+
+
+def get_dashboard(user, now=None):
+    key = dashboard_key(user.id, current_version(user.id))
+    dashboard = single_flight(key, lambda: build_dashboard(user, now), CACHE_TIMEOUT)
+
+    # Nothing is written at local midnight, so the day rolling over has to
+    # invalidate the entry on its own
+    if dashboard["date"] != local_today(dashboard["timezone"], now).isoformat():
+        dashboard = build_dashboard(user, now)
+        cache.set(key, dashboard, CACHE_TIMEOUT)
+
+    return dashboard
+
+
+def build_dashboard(user, now=None):
+    zone_name = Preferences.objects.filter(
+        user_profile__user=user
+    ).values_list("timezone", flat=True).first() or "UTC"
+
+    today = local_today(zone_name, now)
+
+    actions = Action.objects.annotate(
+        completed_today=Exists(HabitCompletion.objects.filter(
+            action=OuterRef("pk"),
+            completion_date=today
+        ))
+    ).order_by("start_time", "pk")
+
+    routines = Routine.objects.filter(
+        owner=user,
+        status=Routine.RoutineStatusChoice.ACTIVE
+    ).with_completion_percentage().prefetch_related(Prefetch("actions", queryset=actions))
+
+    return DashboardSerializer({
+        "date": today,
+        "timezone": zone_name,
+        "unread_count": get_unread_count(user.id),
+        "routines": routines,
+    }).data
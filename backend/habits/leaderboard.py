@@ -0,0 +1,184 @@
+from collections import Counter
+from django.contrib.auth.models import User
+from django.db import transaction
+from config.cache_versions import bump_named_version, current_version, named_version
+from django.db.models import Case, Count, F, Max, Q, Sum, Value, When
+from profiles.models import AccountabilityPartnership
+from .models import Action, LeaderboardEntry, LeaderboardBucket
+
+REBUILD_CHUNK_SIZE = 5000
+DEFAULT_LIMIT = 10
+MAX_LIMIT = 100
+
+VERSION_NAME = "leaderboard"
+
+
+def refresh_standings(user_ids):
+    user_ids = set(user_ids)
+
+    if not user_ids:
+        return
+
+    with transaction.atomic():
+        # Refreshes of one user queue here, so each computes its score after
+        # the previous one committed and sees the entry it wrote
+        list(User.objects.select_for_update().filter(pk__in=user_ids).order_by("pk").values_list("pk", flat=True))
+
+        scores = dict.fromkeys(user_ids, 0)
+        scores.update(
+            Action.objects.filter(
+                routine__owner_id__in=user_ids
+            ).values("routine__owner_id").annotate(
+                best=Max("current_streak")
+            ).values_list("routine__owner_id", "best")
+        )
+
+        previous = dict(
+            LeaderboardEntry.objects.filter(
+                user_id__in=user_ids
+            ).values_list("user_id", "score")
+        )
+
+        shifts = Counter()
+        entries = []
+        dropped = []
+
+        for user_id, score in scores.items():
+            if previous.get(user_id, 0) == score:
+                continue
+
+            if user_id in previous:
+                shifts[previous[user_id]] -= 1
+
+            # Users without a running streak are not ranked
+            if score:
+                shifts[score] += 1
+                entries.append(LeaderboardEntry(user_id=user_id, score=score))
+            else:
+                dropped.append(user_id)
+
+        LeaderboardEntry.objects.bulk_create(
+            entries,
+            update_conflicts=True,
+            unique_fields=["user"],
+            update_fields=["score", "updated_at"]
+        )
+
+        if dropped:
+            LeaderboardEntry.objects.filter(user_id__in=dropped).delete()
+
+        _shift_buckets(shifts)
+
+        # Cached standings of every scope are rebuilt on the next read
+        if entries or dropped:
+            bump_named_version(VERSION_NAME)
+
+
+def _shift_buckets(shifts):
+    shifts = {score: delta for score, delta in shifts.items() if delta}
+
+    if not shifts:
+        return
+
+    LeaderboardBucket.objects.bulk_create(
+        [LeaderboardBucket(score=score) for score in shifts],
+        ignore_conflicts=True
+    )
+
+    LeaderboardBucket.objects.filter(score__in=shifts).update(
+        members=F("members") + Case(
+            *[When(score=score, then=Value(delta)) for score, delta in shifts.items()],
+            default=Value(0)
+        )
+    )
+
+
+def rebuild_leaderboard(chunk_size=REBUILD_CHUNK_SIZE):
+    best_streaks = Action.objects.order_by().values("routine__owner_id").annotate(
+        best=Max("current_streak")
+    ).filter(best__gt=0).values_list("routine__owner_id", "best")
+
+    with transaction.atomic():
+        LeaderboardEntry.objects.all().delete()
+
+        entries = []
+        ranked = 0
+
+        for user_id, score in best_streaks.iterator(chunk_size=chunk_size):
+            entries.append(LeaderboardEntry(user_id=user_id, score=score))
+
+            if len(entries) >= chunk_size:
+                LeaderboardEntry.objects.bulk_create(entries)
+                ranked += len(entries)
+                entries = []
+
+        LeaderboardEntry.objects.bulk_create(entries)
+        ranked += len(entries)
+
+        LeaderboardBucket.objects.all().delete()
+        LeaderboardBucket.objects.bulk_create(
+            LeaderboardBucket(score=score, members=members)
+            for score, members in LeaderboardEntry.objects.order_by().values("score").annotate(
+                members=Count("pk")
+            ).values_list("score", "members")
+        )
+
+        bump_named_version(VERSION_NAME)
+
+    return ranked
+
+
+def standings_key(user, partners, limit):
+    key = f"leaderboard:{named_version(VERSION_NAME)}:{limit}"
+
+    # Partner standings also move with the user's own partnerships
+    if partners:
+        return f"{key}:partners:{user.id}:{current_version(user.id)}"
+
+    return f"{key}:global"
+
+
+def partner_ids(user):
+    # Resolved up front from the partnership indexes, so the entries are
+    # then read by primary key instead of probing partnerships per row
+    ids = {user.id}
+
+    for user_id, partner_id in AccountabilityPartnership.objects.filter(
+        Q(user=user) | Q(partner=user),
+        status=AccountabilityPartnership.AccountabilityStatus.ACCEPTED
+    ).values_list("user_id", "partner_id"):
+        ids.update((user_id, partner_id))
+
+    ids.discard(None)
+
+    return ids
+
+
+def partner_scope(user):
+    return Q(user_id__in=partner_ids(user))
+
+
+def with_ranks(entries):
+    # Competition ranking, ties share a rank and the next rank skips ahead
+    rank = 0
+    previous = None
+
+    for position, entry in enumerate(entries, start=1):
+        if entry.score != previous:
+            rank = position
+            previous = entry.score
+
+        entry.rank = rank
+
+    return entries
+
+
+def global_rank(score):
+    # Sums the score histogram instead of counting users, the bucket table
+    # holds one row per distinct streak length
+    ahead = LeaderboardBucket.objects.filter(score__gt=score).aggregate(total=Sum("members"))["total"]
+    return (ahead or 0) + 1
+
+
+def partner_rank(user, score):
+    return LeaderboardEntry.objects.filter(partner_scope(user), score__gt=score).count() + 1
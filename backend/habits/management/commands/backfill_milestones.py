@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+from habits import milestones
+
+
+class Command(BaseCommand):
+    help = "Replay completion history and create any streak milestone notifications that are missing"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--action",
+            type=int,
+            action="append",
+            dest="action_ids",
+            help="Only backfill the given action id (repeatable)"
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=milestones.BACKFILL_CHUNK_SIZE
+        )
+
+    def handle(self, *args, **options):
+        found = milestones.backfill_streak_milestones(
+            action_ids=options["action_ids"],
+            chunk_size=options["chunk_size"]
+        )
+
+        self.stdout.write(self.style.SUCCESS(f"Checked {found} milestones from completion history"))
@@ -0,0 +1,230 @@
+import json
+from pathlib import Path
+import statistics
+import tracemalloc
+from time import perf_counter
+from types import SimpleNamespace
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections, connection
+from django.db.models import Count
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+from config.cache import cache_metrics
+from config.database import connection_metrics, reset_connection_metrics
+from activity.urls import router as activity_router
+from habits.urls import router as habits_router
+from profiles.urls import router as profiles_router
+
+ROUTERS = [habits_router, activity_router, profiles_router]
+
+# Collection actions that need query parameters to do any work
+EXTRA_PARAMS = {
+    "profile-search": lambda user: {"email": user.email[:4]},
+}
+
+DEFAULT_BASELINE = settings.BASE_DIR / "benchmarks" / "api_baseline.json"
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, round(fraction * (len(ordered) - 1)))]
+
+
+def endpoints(user):
+    for router in ROUTERS:
+        for _, viewset, basename in router.registry:
+            view = viewset()
+            view.request = SimpleNamespace(user=user, query_params={})
+            view.format_kwarg = None
+            pk = view.get_queryset().values_list("pk", flat=True).first()
+
+            yield f"{basename}-list", reverse(f"{basename}-list"), {}
+
+            if pk is not None and hasattr(viewset, "retrieve"):
+                yield f"{basename}-detail", reverse(f"{basename}-detail", args=[pk]), {}
+
+            for extra in viewset.get_extra_actions():
+                if "get" not in extra.mapping:
+                    continue
+
+                name = f"{basename}-{extra.url_name}"
+
+                if extra.detail and pk is not None:
+                    yield name, reverse(name, args=[pk]), {}
+                elif not extra.detail:
+                    yield name, reverse(name), EXTRA_PARAMS.get(name, lambda _: {})(user)
+
+
+class Command(BaseCommand):
+    help = "Drive every router endpoint with the DRF test client and report latency, query counts and allocations"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--user", help="Username to authenticate as (defaults to the user with the most completions)")
+        parser.add_argument("--iterations", type=int, default=50)
+        parser.add_argument("--warmup", type=int, default=3)
+        parser.add_argument("--baseline", default=str(DEFAULT_BASELINE), help="Path of the baseline JSON file")
+        parser.add_argument("--save-baseline", action="store_true", help="Store this run as the new baseline")
+        parser.add_argument(
+            "--tolerance",
+            type=float,
+            default=0.25,
+            help="Allowed relative growth in p95 latency and allocations before flagging a regression"
+        )
+        parser.add_argument("--fail-on-regression", action="store_true")
+
+    def handle(self, *args, **options):
+        user = self.pick_user(options["user"])
+
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f"Bearer {RefreshToken.for_user(user).access_token}")
+
+        reset_connection_metrics()
+
+        with override_settings(ALLOWED_HOSTS=["testserver"]):
+            results = {
+                name: self.measure(client, url, params, options["iterations"], options["warmup"])
+                for name, url, params in endpoints(user)
+            }
+
+        failed = [name for name, result in results.items() if result["status"] != 200]
+
+        if failed:
+            raise CommandError(f"Non-200 responses from {', '.join(failed)}")
+
+        baseline = self.load_baseline(options["baseline"])
+        regressions = self.report(results, baseline, options["tolerance"])
+        self.report_cache()
+        self.report_connections(len(results) * (options["iterations"] + options["warmup"] + 1))
+
+        if options["save_baseline"]:
+            self.save_baseline(options["baseline"], results)
+
+        if regressions and options["fail_on_regression"]:
+            raise CommandError(f"Regressions in {', '.join(regressions)}")
+
+    def pick_user(self, username):
+        if username:
+            try:
+                return User.objects.get(username=username)
+            except User.DoesNotExist:
+                raise CommandError(f"No user named {username}")
+
+        user = User.objects.annotate(
+            completion_count=Count("habit_completions")
+        ).order_by("-completion_count").first()
+
+        if user is None:
+            raise CommandError("No users to benchmark, run seed_synthetic_data first")
+
+        return user
+
+    def request(self, client, url, params):
+        response = client.get(url, params)
+
+        # The test client leaves connections open between requests, a server
+        # closes them here unless DB_CONNECTION_MODE keeps them
+        close_old_connections()
+
+        return response
+
+    def measure(self, client, url, params, iterations, warmup):
+        for _ in range(warmup):
+            self.request(client, url, params)
+
+        latencies = []
+        query_counts = []
+
+        for _ in range(iterations):
+            with CaptureQueriesContext(connection) as queries:
+                started = perf_counter()
+                response = self.request(client, url, params)
+                latencies.append((perf_counter() - started) * 1000)
+
+            query_counts.append(len(queries))
+
+        tracemalloc.start()
+        self.request(client, url, params)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        return {
+            "status": response.status_code,
+            "p50_ms": round(statistics.median(latencies), 3),
+            "p95_ms": round(percentile(latencies, 0.95), 3),
+            "queries": max(query_counts),
+            "peak_kib": round(peak / 1024, 1),
+        }
+
+    def report(self, results, baseline, tolerance):
+        regressions = []
+
+        self.stdout.write(f"{'endpoint':<32}{'p50 ms':>10}{'p95 ms':>10}{'queries':>9}{'peak KiB':>11}")
+
+        for name, result in results.items():
+            previous = baseline.get(name)
+            flags = []
+
+            if previous:
+                if result["p95_ms"] > previous["p95_ms"] * (1 + tolerance):
+                    flags.append(f"p95 was {previous['p95_ms']}")
+                if result["queries"] > previous["queries"]:
+                    flags.append(f"queries was {previous['queries']}")
+                if result["peak_kib"] > previous["peak_kib"] * (1 + tolerance):
+                    flags.append(f"peak was {previous['peak_kib']}")
+
+            line = (
+                f"{name:<32}{result['p50_ms']:>10}{result['p95_ms']:>10}"
+                f"{result['queries']:>9}{result['peak_kib']:>11}"
+            )
+
+            if flags:
+                regressions.append(name)
+                self.stdout.write(self.style.ERROR(f"{line}  REGRESSION ({', '.join(flags)})"))
+            else:
+                self.stdout.write(line)
+
+        return regressions
+
+    def report_cache(self):
+        metrics = cache_metrics()
+
+        if not metrics:
+            return
+
+        names = ["local_hits", "shared_hits", "misses", "evictions", "expirations", "computed", "coalesced"]
+
+        self.stdout.write(f"{'cache namespace':<20}" + "".join(f"{name:>13}" for name in names))
+
+        for space, counts in metrics.items():
+            self.stdout.write(f"{space:<20}" + "".join(f"{counts.get(name, 0):>13}" for name in names))
+
+    def report_connections(self, requests):
+        metrics = connection_metrics()
+
+        self.stdout.write(
+            f"database connections ({metrics['vendor']}, {metrics['mode']}): "
+            f"{metrics['opened']} opened over {requests} requests"
+        )
+
+        for name in ["pool_size", "pool_available", "requests_waiting", "requests_num", "connections_num", "usage_ms"]:
+            if name in metrics:
+                self.stdout.write(f"  {name:<20}{metrics[name]:>10}")
+
+    def load_baseline(self, path):
+        try:
+            with open(path) as baseline:
+                return json.load(baseline)
+        except FileNotFoundError:
+            return {}
+
+    def save_baseline(self, path, results):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+
+        with open(path, "w") as baseline:
+            json.dump(results, baseline, indent=2, sort_keys=True)
+
+        self.stdout.write(self.style.SUCCESS(f"Saved baseline to {path}"))
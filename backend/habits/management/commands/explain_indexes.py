@@ -0,0 +1,146 @@
+from datetime import date
+from time import perf_counter
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Q
+from activity.models import Notification
+from habits.models import Routine, Action, HabitCompletion
+from profiles.models import AccountabilityPartnership
+from habits import synthetic
+
+ACCESS_PATH_INDEXES = [
+    (Routine, "routine_owner_created_idx"),
+    (Routine, "routine_active_owner_idx"),
+    (HabitCompletion, "completion_user_created_idx"),
+    (Notification, "notification_recipient_idx"),
+    (Notification, "notification_unread_idx"),
+    (AccountabilityPartnership, "partnership_active_partner_idx"),
+    (AccountabilityPartnership, "partnership_user_status_idx"),
+]
+
+ACTIVE_PARTNERSHIP = ["pending", "accepted"]
+
+
+def access_paths(user):
+    action = Action.objects.filter(routine__owner=user).first()
+
+    return {
+        "routine list": Routine.objects.filter(owner=user).order_by("-created_at"),
+        "active routines": Routine.objects.filter(owner=user, status="active"),
+        "actions by owner and routine": Action.objects.filter(
+            routine__owner=user, routine_id=action.routine_id if action else None
+        ),
+        "completion page": HabitCompletion.objects.filter(user=user).order_by("-created_at", "-id")[:50],
+        "completion for action and day": HabitCompletion.objects.filter(
+            action=action, completion_date=date.today()
+        ),
+        "unread notifications": Notification.objects.filter(
+            recipient=user, read_status=False
+        ).order_by("-created_at")[:50],
+        "partnerships": AccountabilityPartnership.objects.filter(
+            Q(user=user) | Q(partner=user), status__in=ACTIVE_PARTNERSHIP
+        ),
+        "incoming requests": AccountabilityPartnership.objects.filter(partner=user, status="pending"),
+    }
+
+
+class Command(BaseCommand):
+    help = "Print query plans and timings for the ViewSet access paths with and without the access path indexes"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--seed-users",
+            type=int,
+            default=0,
+            help="Seed this many throwaway users (rolled back afterwards) before explaining"
+        )
+        parser.add_argument(
+            "--days",
+            type=int,
+            default=365,
+            help="Days of completion history per seeded action"
+        )
+        parser.add_argument(
+            "--repeat",
+            type=int,
+            default=20,
+            help="Executions per query when timing"
+        )
+        parser.add_argument(
+            "--user",
+            help="Username to explain the access paths for (defaults to the user with the latest completion)"
+        )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            if options["seed_users"]:
+                synthetic.generate(users=options["seed_users"], days=options["days"], prefix="explain")
+
+            if connection.vendor == "postgresql":
+                with connection.cursor() as cursor:
+                    cursor.execute("ANALYZE")
+
+            user = self.pick_user(options["user"])
+            after = self.measure(user, options["repeat"], "after")
+
+            sid = transaction.savepoint()
+
+            with connection.cursor() as cursor:
+                for _, name in ACCESS_PATH_INDEXES:
+                    cursor.execute(f"DROP INDEX {connection.ops.quote_name(name)}")
+
+            before = self.measure(user, options["repeat"], "before")
+            transaction.savepoint_rollback(sid)
+
+            for label in after:
+                self.stdout.write(self.style.MIGRATE_HEADING(label))
+                self.stdout.write(f"  before: {before[label][0]:.3f} ms")
+                self.stdout.write(self.indent(before[label][1]))
+                self.stdout.write(f"  after:  {after[label][0]:.3f} ms")
+                self.stdout.write(self.indent(after[label][1]))
+
+            if options["seed_users"]:
+                transaction.set_rollback(True)
+
+    def pick_user(self, username):
+        if username:
+            try:
+                return User.objects.get(username=username)
+            except User.DoesNotExist:
+                raise CommandError(f"No user named {username}")
+
+        user = User.objects.filter(
+            habit_completions__isnull=False
+        ).order_by("-habit_completions__created_at").first()
+
+        if user is None:
+            raise CommandError("No completion history to explain, pass --seed-users")
+
+        return user
+
+    def measure(self, user, repeat, phase):
+        results = {}
+
+        for label, query_set in access_paths(user).items():
+            sql, params = query_set.query.sql_with_params()
+            # The phase comment keeps cached statements from reusing a plan built
+            # before the indexes were dropped
+            sql = f"{sql} /* {phase} */"
+
+            with connection.cursor() as cursor:
+                cursor.execute(f"{connection.ops.explain_query_prefix()} {sql}", params)
+                plan = "\n".join(" ".join(str(column) for column in row) for row in cursor.fetchall())
+
+                started = perf_counter()
+
+                for _ in range(repeat):
+                    cursor.execute(sql, params)
+                    cursor.fetchall()
+
+            results[label] = ((perf_counter() - started) * 1000 / repeat, plan)
+
+        return results
+
+    def indent(self, plan):
+        return "\n".join(f"    {line}" for line in plan.splitlines())
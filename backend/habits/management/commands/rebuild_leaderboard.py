@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+from habits import leaderboard
+
+
+class Command(BaseCommand):
+    help = "Recompute every leaderboard standing and the score histogram from current streaks"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=leaderboard.REBUILD_CHUNK_SIZE
+        )
+
+    def handle(self, *args, **options):
+        ranked = leaderboard.rebuild_leaderboard(chunk_size=options["chunk_size"])
+
+        self.stdout.write(self.style.SUCCESS(f"Ranked {ranked} users"))
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+from habits import rollups
+
+
+class Command(BaseCommand):
+    help = "Rebuild the day, week and month completion rollups from completion history"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--action",
+            type=int,
+            action="append",
+            dest="action_ids",
+            help="Only rebuild the given action id (repeatable)"
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=rollups.BACKFILL_CHUNK_SIZE,
+            help="Number of actions aggregated per pass"
+        )
+
+    def handle(self, *args, **options):
+        created = rollups.rebuild_rollups(
+            action_ids=options["action_ids"],
+            chunk_size=options["chunk_size"]
+        )
+
+        self.stdout.write(self.style.SUCCESS(f"Wrote {created} rollup buckets"))
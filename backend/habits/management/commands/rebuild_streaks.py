@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+from habits import streaks
+
+
+class Command(BaseCommand):
+    help = "Recompute current and longest streaks for every action from its completion history"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--action",
+            type=int,
+            action="append",
+            dest="action_ids",
+            help="Only rebuild the given action id (repeatable)"
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=streaks.REBUILD_CHUNK_SIZE
+        )
+
+    def handle(self, *args, **options):
+        updated = streaks.rebuild_streaks(
+            action_ids=options["action_ids"],
+            chunk_size=options["chunk_size"]
+        )
+
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt streaks for {updated} actions"))
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+from habits import progress
+
+
+class Command(BaseCommand):
+    help = "Recount routine completion counters and complete every routine that has reached its target"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=progress.RECONCILE_CHUNK_SIZE
+        )
+
+    def handle(self, *args, **options):
+        refreshed, completed = progress.reconcile_routines(chunk_size=options["chunk_size"])
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Recounted {refreshed} routines and completed {completed} that reached their target"
+        ))
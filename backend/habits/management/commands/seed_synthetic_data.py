@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+from habits import synthetic
+
+
+class Command(BaseCommand):
+    help = "Bulk insert a synthetic population of users, routines, completion history, partnerships and notifications"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=100)
+        parser.add_argument("--routines-per-user", type=int, default=3)
+        parser.add_argument("--actions-per-routine", type=int, default=3)
+        parser.add_argument("--days", type=int, default=365, help="Days of completion history")
+        parser.add_argument("--completion-rate", type=float, default=0.8)
+        parser.add_argument("--partner-rate", type=float, default=0.5)
+        parser.add_argument("--notifications-per-user", type=int, default=50)
+        parser.add_argument("--prefix", default="load", help="Username prefix for the generated users")
+        parser.add_argument("--seed", type=int, help="Random seed for a reproducible dataset")
+        parser.add_argument("--batch-size", type=int, default=synthetic.BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        counts = synthetic.generate(
+            users=options["users"],
+            routines_per_user=options["routines_per_user"],
+            actions_per_routine=options["actions_per_routine"],
+            days=options["days"],
+            completion_rate=options["completion_rate"],
+            partner_rate=options["partner_rate"],
+            notifications_per_user=options["notifications_per_user"],
+            prefix=options["prefix"],
+            seed=options["seed"],
+            batch_size=options["batch_size"]
+        )
+
+        summary = ", ".join(f"{count} {name}" for name, count in counts.items())
+        self.stdout.write(self.style.SUCCESS(f"Created {summary}"))
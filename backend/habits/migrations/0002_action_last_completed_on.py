@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('habits', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='action',
+            name='last_completed_on',
+            field=models.DateField(blank=True, null=True, verbose_name='Last Completed On'),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:25
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('habits', '0002_action_last_completed_on'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CompletionRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.CharField(choices=[('day', 'Day'), ('week', 'Week'), ('month', 'Month')], max_length=10, verbose_name='Period')),
+                ('period_start', models.DateField(verbose_name='Period Start')),
+                ('completions', models.PositiveIntegerField(default=0, verbose_name='Completions')),
+                ('difficulty_total', models.PositiveIntegerField(default=0, verbose_name='Difficulty Total')),
+                ('confidence_total', models.PositiveIntegerField(default=0, verbose_name='Confidence Total')),
+                ('feeling_great', models.PositiveIntegerField(default=0)),
+                ('feeling_good', models.PositiveIntegerField(default=0)),
+                ('feeling_okay', models.PositiveIntegerField(default=0)),
+                ('feeling_struggled', models.PositiveIntegerField(default=0)),
+                ('feeling_forced', models.PositiveIntegerField(default=0)),
+                ('action', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='completion_rollups', to='habits.action')),
+            ],
+            options={
+                'verbose_name': 'Completion Rollup',
+                'verbose_name_plural': 'Completion Rollups',
+                'ordering': ['period_start'],
+                'constraints': [models.UniqueConstraint(fields=('action', 'period', 'period_start'), name='one_rollup_per_action_period')],
+            },
+        ),
+    ]
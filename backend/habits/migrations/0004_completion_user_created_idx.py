@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:26
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('habits', '0003_completionrollup'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='habitcompletion',
+            index=models.Index(fields=['user', '-created_at', '-id'], name='completion_user_created_idx'),
+        ),
+    ]
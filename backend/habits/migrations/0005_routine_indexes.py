@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:28
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('habits', '0004_completion_user_created_idx'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='routine',
+            index=models.Index(fields=['owner', '-created_at'], name='routine_owner_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='routine',
+            index=models.Index(condition=models.Q(('status', 'active')), fields=['owner'], name='routine_active_owner_idx'),
+        ),
+    ]
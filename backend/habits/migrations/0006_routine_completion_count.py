@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:48
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def seed_completion_counts(apps, schema_editor):
+    # Seeds the counter only, no routine is completed and no owner notified
+    Routine = apps.get_model("habits", "Routine")
+    HabitCompletion = apps.get_model("habits", "HabitCompletion")
+
+    completions = HabitCompletion.objects.filter(
+        action__routine=OuterRef("pk")
+    ).order_by().values("action__routine").annotate(total=Count("pk")).values("total")
+
+    Routine.objects.update(completion_count=Coalesce(Subquery(completions), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('habits', '0005_routine_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='routine',
+            name='completion_count',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text="Completions logged against the routine's actions", verbose_name='Completion Count'),
+        ),
+        migrations.RunPython(seed_completion_counts, migrations.RunPython.noop),
+    ]
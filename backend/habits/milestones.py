@@ -0,0 +1,130 @@
+from datetime import timedelta
+from django.conf import settings
+from django.db import transaction
+from activity.models import Notification
+from activity.counters import notifications_created, refresh_unread_counts
+from .models import HabitCompletion
+from .streaks import _StreakState, lock_actions
+
+BACKFILL_CHUNK_SIZE = 5000
+
+STREAK_MILESTONE = Notification.NotificationCategoryChoice.STREAK_MILESTONE
+
+
+def milestones():
+    return sorted(set(getattr(settings, "STREAK_MILESTONES", (7, 14, 30, 60, 90))))
+
+
+def milestone_message(streak, action_name):
+    return f"{streak} day streak on {action_name}!"
+
+
+def emit_streak_milestones(action, previous_streak):
+    # action is the row as read by lock_actions, after the streak update
+    thresholds = milestones()
+
+    if not thresholds or action["last_completed_on"] is None:
+        return []
+
+    # A recount can jump past several thresholds, e.g. a backdated check-in
+    # joining two runs, so every one crossed by this update is emitted
+    crossed = [
+        threshold for threshold in thresholds
+        if previous_streak < threshold <= action["current_streak"]
+    ]
+
+    if not crossed:
+        return []
+
+    owner_id = action["routine__owner_id"]
+
+    # The run is consecutive up to last_completed_on, which dates the day
+    # each threshold was reached
+    notifications = [
+        Notification(
+            recipient_id=owner_id,
+            category=STREAK_MILESTONE,
+            message=milestone_message(threshold, action["name"]),
+            trigger_action_id=action["pk"],
+            event_date=action["last_completed_on"] - timedelta(days=action["current_streak"] - threshold)
+        )
+        for threshold in crossed
+    ]
+
+    # Every writer of milestones holds the action lock, so what is on record
+    # can't change before the insert
+    existing = set(Notification.objects.filter(
+        recipient_id=owner_id,
+        category=STREAK_MILESTONE,
+        trigger_action_id=action["pk"],
+        event_date__in=[notification.event_date for notification in notifications]
+    ).values_list("event_date", flat=True))
+    notifications = [notification for notification in notifications if notification.event_date not in existing]
+
+    if not notifications:
+        return []
+
+    Notification.objects.bulk_create(notifications)
+    notifications_created(notifications)
+
+    return notifications
+
+
+def backfill_streak_milestones(action_ids=None, chunk_size=BACKFILL_CHUNK_SIZE):
+    thresholds = set(milestones())
+
+    completions = HabitCompletion.objects.all()
+
+    if action_ids is not None:
+        completions = completions.filter(action_id__in=action_ids)
+
+    completions = completions.order_by("action_id", "completion_date").values_list(
+        "action_id", "completion_date", "action__name", "action__routine__owner_id"
+    )
+
+    pending = []
+    recipients = set()
+    found = 0
+    action_id = None
+    state = None
+
+    def flush():
+        nonlocal found
+
+        with transaction.atomic():
+            # Check-ins record milestones under the action lock
+            lock_actions({notification.trigger_action_id for notification in pending})
+
+            # Milestones already on record conflict and are skipped
+            Notification.objects.bulk_create(pending, batch_size=chunk_size, ignore_conflicts=True)
+            refresh_unread_counts(recipients)
+
+        found += len(pending)
+        pending.clear()
+        recipients.clear()
+
+    # Replays every run from history, the same fold rebuild_streaks uses
+    for row_action_id, completed_on, action_name, owner_id in completions.iterator(chunk_size=chunk_size):
+        if row_action_id != action_id:
+            action_id = row_action_id
+            state = _StreakState()
+
+        previous = state.current
+        state.push(completed_on)
+
+        if state.current != previous and state.current in thresholds:
+            pending.append(Notification(
+                recipient_id=owner_id,
+                category=STREAK_MILESTONE,
+                message=milestone_message(state.current, action_name),
+                trigger_action_id=action_id,
+                event_date=completed_on
+            ))
+            recipients.add(owner_id)
+
+            if len(pending) >= chunk_size:
+                flush()
+
+    flush()
+
+    return found
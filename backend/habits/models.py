@@ -2,7 +2,33 @@ from django.db import models
 from django.contrib.auth.models import User
 from django.utils import timezone
 from django.core.validators import MinValueValidator, MaxValueValidator
-from datetime import date
+from django.db.models.functions import Cast, Greatest, Least, Round
+from datetime import date, time
+from .signals import routine_status_changed
+
+DEADLINE_MINUTES = 30
+
+
+def add_minutes(value, minutes):
+    # Wraps around midnight like a wall clock, without building a datetime
+    total = (value.hour * 60 + value.minute + minutes) % (24 * 60)
+    return time(total // 60, total % 60, value.second, value.microsecond)
+
+
+class RoutineQuerySet(models.QuerySet):
+    def with_completion_percentage(self):
+        completed = Cast(models.F("completion_count"), models.FloatField())
+
+        return self.annotate(
+            completion_percentage=models.Case(
+                models.When(target_completions=0, then=models.Value(100.0)),
+                default=Least(
+                    models.Value(100.0),
+                    Round(completed * 100 / models.F("target_completions"), 1)
+                ),
+                output_field=models.FloatField()
+            )
+        )
 
 class Routine(models.Model):
     class RoutineStatusChoice(models.TextChoices):
@@ -53,6 +79,13 @@ class Routine(models.Model):
         default=30
     )
 
+    completion_count = models.PositiveIntegerField(
+        verbose_name="Completion Count",
+        help_text="Completions logged against the routine's actions",
+        default=0,
+        editable=False
+    )
+
     created_at = models.DateTimeField(
         verbose_name="Created At",
         auto_now_add=True
@@ -68,6 +101,18 @@ class Routine(models.Model):
         verbose_name_plural = "Routines"
         ordering = ["-created_at"]
 
+        indexes = [
+            models.Index(
+                fields=["owner", "-created_at"],
+                name="routine_owner_created_idx"
+            ),
+            models.Index(
+                fields=["owner"],
+                condition=models.Q(status="active"),
+                name="routine_active_owner_idx"
+            )
+        ]
+
         constraints = [
             models.CheckConstraint(
                 check=models.Q(end_date__isnull=True) | models.Q(end_date__gte=models.F('start_date')),
@@ -75,19 +120,36 @@ class Routine(models.Model):
             )
         ]
 
+    objects = RoutineQuerySet.as_manager()
+
     @property
     def get_completion_percentage(self):
-        pass
+        if hasattr(self, "completion_percentage"):
+            return self.completion_percentage
+
+        if not self.target_completions:
+            return 100.0
+
+        return min(100.0, round(self.completion_count * 100 / self.target_completions, 1))
 
     @property
     def is_active(self):
         return self.status == self.RoutineStatusChoice.ACTIVE
     
     def mark_complete(self):
-        now = timezone.now().date()
-        self.end_date = now
-        self.status = self.RoutineStatusChoice.COMPLETED
-        self.save()
+        completed = Routine.objects.filter(pk=self.pk).exclude(
+            status=self.RoutineStatusChoice.COMPLETED
+        ).update(
+            status=self.RoutineStatusChoice.COMPLETED,
+            end_date=max(timezone.now().date(), self.start_date),
+            updated_at=timezone.now()
+        )
+
+        if completed:
+            self.refresh_from_db(fields=["status", "end_date", "updated_at"])
+            routine_status_changed.send(sender=Routine, routine_ids=[self.pk], owner_ids=[self.owner_id])
+
+        return bool(completed)
     
     def __str__(self):
         return f"{self.name} ({self.owner.username})"
@@ -129,6 +191,12 @@ class Action(models.Model):
         default=0
     )
 
+    last_completed_on = models.DateField(
+        verbose_name="Last Completed On",
+        null=True,
+        blank=True
+    )
+
     created_at = models.DateTimeField(
         verbose_name="Created At",
         auto_now_add=True
@@ -140,25 +208,22 @@ class Action(models.Model):
     )
 
     def increase_streak(self):
-        self.current_streak = self.current_streak + 1
-        self.longest_streak = max(self.current_streak, self.longest_streak)
-        self.save()
+        Action.objects.filter(pk=self.pk).update(
+            current_streak=models.F("current_streak") + 1,
+            longest_streak=Greatest(models.F("longest_streak"), models.F("current_streak") + 1)
+        )
+        self.refresh_from_db(fields=["current_streak", "longest_streak"])
     
     def reset_streak(self):
+        Action.objects.filter(pk=self.pk).update(current_streak=0)
         self.current_streak = 0
-        self.save()
     
     @property
     def deadline(self):
         if not self.start_time:
             return None
 
-        from datetime import datetime, timedelta
-
-        start_dt = datetime.combine(datetime.today(), self.start_time)
-        deadline_dt = start_dt + timedelta(minutes=30)
-
-        return deadline_dt.time()
+        return add_minutes(self.start_time, DEADLINE_MINUTES)
 
 
     class Meta:
@@ -233,9 +298,144 @@ class HabitCompletion(models.Model):
         verbose_name_plural = "Habit Completions"
         ordering = ['-created_at']
 
+        indexes = [
+            models.Index(
+                fields=["user", "-created_at", "-id"],
+                name="completion_user_created_idx"
+            )
+        ]
+
         constraints = [
             models.UniqueConstraint(
                 fields=['action', 'completion_date'],
                 name='one_completion_per_action_per_day'
             )
-        ]
\ No newline at end of file
+        ]
+
+class CompletionRollup(models.Model):
+    class PeriodChoice(models.TextChoices):
+        DAY = "day", "Day"
+        WEEK = "week", "Week"
+        MONTH = "month", "Month"
+
+    action = models.ForeignKey(
+        Action,
+        on_delete=models.CASCADE,
+        related_name="completion_rollups"
+    )
+
+    period = models.CharField(
+        verbose_name="Period",
+        choices=PeriodChoice.choices,
+        max_length=10
+    )
+
+    period_start = models.DateField(
+        verbose_name="Period Start"
+    )
+
+    completions = models.PositiveIntegerField(
+        verbose_name="Completions",
+        default=0
+    )
+
+    difficulty_total = models.PositiveIntegerField(
+        verbose_name="Difficulty Total",
+        default=0
+    )
+
+    confidence_total = models.PositiveIntegerField(
+        verbose_name="Confidence Total",
+        default=0
+    )
+
+    feeling_great = models.PositiveIntegerField(default=0)
+    feeling_good = models.PositiveIntegerField(default=0)
+    feeling_okay = models.PositiveIntegerField(default=0)
+    feeling_struggled = models.PositiveIntegerField(default=0)
+    feeling_forced = models.PositiveIntegerField(default=0)
+
+    @property
+    def average_difficulty(self):
+        if not self.completions:
+            return None
+        return round(self.difficulty_total / self.completions, 2)
+
+    @property
+    def average_confidence(self):
+        if not self.completions:
+            return None
+        return round(self.confidence_total / self.completions, 2)
+
+    @property
+    def feelings(self):
+        return {
+            choice: getattr(self, f"feeling_{choice}")
+            for choice in HabitCompletion.FeelingChoice.values
+        }
+
+    class Meta:
+        verbose_name = "Completion Rollup"
+        verbose_name_plural = "Completion Rollups"
+        ordering = ["period_start"]
+
+        constraints = [
+            models.UniqueConstraint(
+                fields=["action", "period", "period_start"],
+                name="one_rollup_per_action_period"
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.action.name} {self.period} from {self.period_start}"
+
+
+class LeaderboardEntry(models.Model):
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        related_name="leaderboard_entry"
+    )
+
+    score = models.PositiveIntegerField(
+        verbose_name="Score",
+        help_text="Best current streak across the user's actions"
+    )
+
+    updated_at = models.DateTimeField(
+        verbose_name="Updated At",
+        auto_now=True
+    )
+
+    class Meta:
+        verbose_name = "Leaderboard Entry"
+        verbose_name_plural = "Leaderboard Entries"
+
+        indexes = [
+            models.Index(
+                fields=["-score", "user"],
+                name="leaderboard_score_idx"
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.user.username}: {self.score}"
+
+
+class LeaderboardBucket(models.Model):
+    score = models.PositiveIntegerField(
+        verbose_name="Score",
+        unique=True
+    )
+
+    members = models.PositiveIntegerField(
+        verbose_name="Members",
+        default=0
+    )
+
+    class Meta:
+        verbose_name = "Leaderboard Bucket"
+        verbose_name_plural = "Leaderboard Buckets"
+
+    def __str__(self):
+        return f"{self.members} users at {self.score}"
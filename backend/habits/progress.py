@@ -0,0 +1,120 @@
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
+from activity.models import Notification
+from activity.counters import notifications_created, refresh_unread_counts
+from config.cache_versions import bump_all_versions
+from .models import Routine, Action, HabitCompletion
+from .signals import routine_status_changed
+
+RECONCILE_CHUNK_SIZE = 2000
+
+COMPLETABLE = [Routine.RoutineStatusChoice.PENDING, Routine.RoutineStatusChoice.ACTIVE]
+
+
+def routine_of(action_id):
+    return Subquery(Action.objects.filter(pk=action_id).values("routine_id"))
+
+
+def completion_added(action_id):
+    Routine.objects.filter(pk=routine_of(action_id)).update(
+        completion_count=F("completion_count") + 1
+    )
+
+    # The transition only matches while the routine is still open, so
+    # concurrent check-ins complete it exactly once
+    completed = _complete(Routine.objects.filter(pk=routine_of(action_id)))
+
+    if completed:
+        notifications_created(Notification.objects.bulk_create(_notifications(completed)))
+
+
+def completion_removed(action_id):
+    Routine.objects.filter(pk=routine_of(action_id)).update(
+        completion_count=Greatest(F("completion_count") - 1, Value(0))
+    )
+
+
+def refresh_completion_counts(routine_ids):
+    completions = HabitCompletion.objects.filter(
+        action__routine=OuterRef("pk")
+    ).order_by().values("action__routine").annotate(total=Count("pk")).values("total")
+
+    return Routine.objects.filter(pk__in=routine_ids).update(
+        completion_count=Coalesce(Subquery(completions), 0)
+    )
+
+
+def reconcile_routines(chunk_size=RECONCILE_CHUNK_SIZE):
+    refreshed = 0
+    chunk = []
+
+    for routine_id in Routine.objects.order_by("pk").values_list("pk", flat=True).iterator(chunk_size=chunk_size):
+        chunk.append(routine_id)
+
+        if len(chunk) >= chunk_size:
+            refreshed += refresh_completion_counts(chunk)
+            chunk = []
+
+    if chunk:
+        refreshed += refresh_completion_counts(chunk)
+
+    completed = 0
+
+    while True:
+        with transaction.atomic():
+            due = list(
+                Routine.objects.filter(
+                    status__in=COMPLETABLE,
+                    completion_count__gte=F("target_completions")
+                ).select_for_update(skip_locked=True).order_by("pk").values_list("pk", flat=True)[:chunk_size]
+            )
+
+            if not due:
+                break
+
+            routines = _complete(Routine.objects.filter(pk__in=due))
+            Notification.objects.bulk_create(_notifications(routines), batch_size=chunk_size)
+            refresh_unread_counts({routine.owner_id for routine in routines})
+
+        completed += len(routines)
+
+        if len(due) < chunk_size:
+            break
+
+    bump_all_versions()
+
+    return refreshed, completed
+
+
+def _complete(query_set):
+    today = timezone.now().date()
+    due = query_set.filter(status__in=COMPLETABLE, completion_count__gte=F("target_completions"))
+
+    if not due.update(
+        status=Routine.RoutineStatusChoice.COMPLETED,
+        end_date=Greatest(F("start_date"), Value(today)),
+        updated_at=timezone.now()
+    ):
+        return []
+
+    completed = list(query_set.filter(status=Routine.RoutineStatusChoice.COMPLETED).only("pk", "name", "owner_id"))
+    routine_status_changed.send(
+        sender=Routine,
+        routine_ids=[routine.pk for routine in completed],
+        owner_ids={routine.owner_id for routine in completed}
+    )
+
+    return completed
+
+
+def _notifications(routines):
+    return [
+        Notification(
+            recipient_id=routine.owner_id,
+            category=Notification.NotificationCategoryChoice.ROUTINE_COMPLETED,
+            message=f"You completed {routine.name}!"
+        )
+        for routine in routines
+    ]
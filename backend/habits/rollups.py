@@ -0,0 +1,126 @@
+from datetime import timedelta
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import TruncMonth, TruncWeek
+from .models import Action, HabitCompletion, CompletionRollup
+
+Period = CompletionRollup.PeriodChoice
+
+BACKFILL_CHUNK_SIZE = 1000
+
+
+def period_start(period, day):
+    if period == Period.WEEK:
+        return day - timedelta(days=day.weekday())
+    if period == Period.MONTH:
+        return day.replace(day=1)
+    return day
+
+
+def apply_completion(completion):
+    _adjust(completion, 1)
+
+
+def revert_completion(completion):
+    _adjust(completion, -1)
+
+
+def _adjust(completion, sign):
+    changes = {
+        "completions": F("completions") + sign,
+        "difficulty_total": F("difficulty_total") + sign * completion.difficulty,
+        "confidence_total": F("confidence_total") + sign * completion.confidence,
+        f"feeling_{completion.feeling}": F(f"feeling_{completion.feeling}") + sign,
+    }
+
+    for period in Period.values:
+        bucket = CompletionRollup.objects.filter(
+            action_id=completion.action_id,
+            period=period,
+            period_start=period_start(period, completion.completion_date)
+        )
+
+        if bucket.update(**changes) or sign < 0:
+            continue
+
+        try:
+            # A concurrent writer may create the bucket first, fall back to the increment
+            with transaction.atomic():
+                CompletionRollup.objects.create(
+                    action_id=completion.action_id,
+                    period=period,
+                    period_start=period_start(period, completion.completion_date),
+                    completions=1,
+                    difficulty_total=completion.difficulty,
+                    confidence_total=completion.confidence,
+                    **{f"feeling_{completion.feeling}": 1}
+                )
+        except IntegrityError:
+            bucket.update(**changes)
+
+    if sign < 0:
+        CompletionRollup.objects.filter(
+            action_id=completion.action_id,
+            completions=0
+        ).delete()
+
+
+def _bucket_aggregates():
+    aggregates = {
+        "completions": Count("pk"),
+        "difficulty_total": Sum("difficulty"),
+        "confidence_total": Sum("confidence"),
+    }
+
+    for choice in HabitCompletion.FeelingChoice.values:
+        aggregates[f"feeling_{choice}"] = Count("pk", filter=Q(feeling=choice))
+
+    return aggregates
+
+
+def rebuild_rollups(action_ids=None, chunk_size=BACKFILL_CHUNK_SIZE):
+    actions = Action.objects.order_by("pk").values_list("pk", flat=True)
+
+    if action_ids is not None:
+        actions = actions.filter(pk__in=action_ids)
+
+    truncations = {
+        Period.DAY: F("completion_date"),
+        Period.WEEK: TruncWeek("completion_date"),
+        Period.MONTH: TruncMonth("completion_date"),
+    }
+
+    created = 0
+    last_pk = 0
+
+    # Walk actions in primary key chunks so each pass aggregates a bounded slice
+    while True:
+        chunk = list(actions.filter(pk__gt=last_pk)[:chunk_size])
+
+        if not chunk:
+            break
+
+        last_pk = chunk[-1]
+        rollups = []
+
+        for period, truncation in truncations.items():
+            buckets = HabitCompletion.objects.filter(
+                action_id__in=chunk
+            ).annotate(
+                bucket=truncation
+            ).order_by().values("action_id", "bucket").annotate(**_bucket_aggregates())
+
+            for bucket in buckets:
+                rollups.append(CompletionRollup(
+                    period=period,
+                    period_start=bucket.pop("bucket"),
+                    **bucket
+                ))
+
+        with transaction.atomic():
+            CompletionRollup.objects.filter(action_id__in=chunk).delete()
+            CompletionRollup.objects.bulk_create(rollups, batch_size=chunk_size)
+
+        created += len(rollups)
+
+    return created
@@ -1,4 +1,5 @@
-from .models import Routine, Action, HabitCompletion
+from datetime import date
+from .models import Routine, Action, HabitCompletion, CompletionRollup, LeaderboardEntry
 from rest_framework import serializers
 
 class ActionSerializer(serializers.ModelSerializer):
@@ -27,7 +28,8 @@ class RoutineSerializer(serializers.ModelSerializer):
         fields = [
             "id", "name", "reason",
             'status', 'owner', "actions",
-            "start_date", "end_date", "completion_percentage", "target_completions"
+            "start_date", "end_date", "completion_percentage", "target_completions",
+            "is_active"
         ]
         read_only_fields = ["id", "owner"]
     
@@ -46,4 +48,70 @@ class HabitCompletionSerializer(serializers.ModelSerializer):
         ]
         read_only_fields=[
             "id", "user"
-        ]
\ No newline at end of file
+        ]
+
+class BulkCompletionItemSerializer(serializers.Serializer):
+    action = serializers.IntegerField()
+    completion_date = serializers.DateField(default=date.today)
+    difficulty = serializers.IntegerField(min_value=1, max_value=10, default=5)
+    confidence = serializers.IntegerField(min_value=1, max_value=10, default=5)
+    feeling = serializers.ChoiceField(
+        choices=HabitCompletion.FeelingChoice.choices,
+        default=HabitCompletion.FeelingChoice.OKAY
+    )
+
+class CompletionTrendSerializer(serializers.ModelSerializer):
+    average_difficulty = serializers.FloatField(read_only=True)
+    average_confidence = serializers.FloatField(read_only=True)
+    feelings = serializers.DictField(child=serializers.IntegerField(), read_only=True)
+
+    class Meta:
+        model = CompletionRollup
+        fields = [
+            "period_start", "completions", "average_difficulty",
+            "average_confidence", "feelings"
+        ]
+        read_only_fields = fields
+
+class LeaderboardEntrySerializer(serializers.ModelSerializer):
+    rank = serializers.IntegerField(read_only=True)
+    username = serializers.CharField(source="user.username", read_only=True)
+
+    class Meta:
+        model = LeaderboardEntry
+        fields = ["rank", "user", "username", "score"]
+        read_only_fields = ["rank", "user", "username", "score"]
+
+class DashboardActionSerializer(serializers.ModelSerializer):
+    deadline = serializers.SerializerMethodField()
+    completed_today = serializers.BooleanField(read_only=True)
+
+    class Meta:
+        model = Action
+        fields = [
+            "id", "name", "start_time", "deadline",
+            "current_streak", "longest_streak", "last_completed_on",
+            "completed_today"
+        ]
+        read_only_fields = fields
+
+    def get_deadline(self, obj):
+        return obj.deadline
+
+class DashboardRoutineSerializer(serializers.ModelSerializer):
+    actions = DashboardActionSerializer(read_only=True, many=True)
+    completion_percentage = serializers.FloatField(read_only=True)
+
+    class Meta:
+        model = Routine
+        fields = [
+            "id", "name", "status", "target_completions",
+            "completion_percentage", "actions"
+        ]
+        read_only_fields = fields
+
+class DashboardSerializer(serializers.Serializer):
+    date = serializers.DateField(read_only=True)
+    timezone = serializers.CharField(read_only=True)
+    unread_count = serializers.IntegerField(read_only=True)
+    routines = DashboardRoutineSerializer(read_only=True, many=True)
@@ -0,0 +1,5 @@
+from django.dispatch import Signal
+
+# Sent with routine_ids and their owner_ids after a queryset update moves
+# routines to another status, which post_save never sees
+routine_status_changed = Signal()
@@ -0,0 +1,200 @@
+from datetime import timedelta
+from django.db import transaction
+from django.utils import timezone
+from activity.delivery import get_zone
+from config.cache_versions import bump_all_versions
+from .models import Action, HabitCompletion
+
+REBUILD_CHUNK_SIZE = 5000
+
+OWNER_ZONE = "routine__owner__profile__preferences__timezone"
+
+
+def local_yesterday(zone_name, now=None):
+    # Owners without preferences are swept as UTC
+    return (now or timezone.now()).astimezone(get_zone(zone_name or "UTC")).date() - timedelta(days=1)
+
+
+def lock_actions(action_ids):
+    """
+    Locks the actions for the rest of the transaction and returns their
+    streak state by pk. Writers of an action's completions queue on the row,
+    which also covers (action, date) pairs that have no completion row yet.
+    """
+
+    return {
+        action["pk"]: action
+        for action in Action.objects.select_for_update(of=("self",)).filter(
+            pk__in=action_ids
+        ).order_by("pk").values(
+            "pk", "name", "current_streak", "longest_streak", "last_completed_on", "routine__owner_id", OWNER_ZONE
+        )
+    }
+
+
+def apply_completion(completion, action, now=None):
+    # action is the row as read by lock_actions, kept current for the caller
+    completed_on = completion.completion_date
+    last_completed_on = action["last_completed_on"]
+    day_before = completed_on - timedelta(days=1)
+    yesterday = local_yesterday(action[OWNER_ZONE], now)
+
+    if completed_on < yesterday:
+        # A run ending before yesterday is already broken, its current streak
+        # is 0 and says nothing about how long it was
+        current = None
+    elif last_completed_on == day_before and last_completed_on >= yesterday:
+        # Consecutive day on a run that is still going
+        current = action["current_streak"] + 1
+    elif last_completed_on is None or last_completed_on < day_before:
+        # First completion, or a gap since the last one: start a new run
+        current = 1
+    else:
+        # Backdated completion inside the known history
+        current = None
+
+    if current is None:
+        action.update(recalculate_action(action["pk"], now))
+        return
+
+    action.update(
+        current_streak=current,
+        longest_streak=max(action["longest_streak"], current),
+        last_completed_on=completed_on
+    )
+
+    Action.objects.filter(pk=action["pk"]).update(
+        current_streak=action["current_streak"],
+        longest_streak=action["longest_streak"],
+        last_completed_on=action["last_completed_on"]
+    )
+
+
+def revert_completion(completion):
+    recalculate_action(completion.action_id)
+
+
+def recalculate_action(action_id, now=None):
+    with transaction.atomic():
+        # Lock the row so concurrent increments queue behind the recount
+        zone_name = Action.objects.select_for_update(of=("self",)).filter(pk=action_id).values_list(OWNER_ZONE, flat=True).first()
+
+        dates = HabitCompletion.objects.filter(
+            action_id=action_id
+        ).order_by("completion_date").values_list("completion_date", flat=True)
+
+        state = _StreakState()
+
+        for completed_on in dates.iterator(chunk_size=REBUILD_CHUNK_SIZE):
+            state.push(completed_on)
+
+        streak = {
+            "current_streak": state.current_on(local_yesterday(zone_name, now)),
+            "longest_streak": state.longest,
+            "last_completed_on": state.last
+        }
+
+        Action.objects.filter(pk=action_id).update(**streak)
+
+    return streak
+
+
+def rebuild_streaks(action_ids=None, chunk_size=REBUILD_CHUNK_SIZE, now=None):
+    completions = HabitCompletion.objects.all()
+
+    if action_ids is not None:
+        completions = completions.filter(action_id__in=action_ids)
+
+    completions = completions.order_by(
+        "action_id", "completion_date"
+    ).values_list("action_id", "completion_date", f"action__{OWNER_ZONE}")
+
+    yesterdays = {}
+    pending = []
+    action_id = None
+    zone_name = None
+    state = None
+    updated = 0
+
+    def finish():
+        if zone_name not in yesterdays:
+            yesterdays[zone_name] = local_yesterday(zone_name, now)
+
+        pending.append(state.to_action(action_id, yesterdays[zone_name]))
+
+    def flush():
+        nonlocal updated
+        Action.objects.bulk_update(
+            pending,
+            ["current_streak", "longest_streak", "last_completed_on"],
+            batch_size=chunk_size
+        )
+        updated += len(pending)
+        pending.clear()
+
+    # Completions arrive grouped by action and sorted by date, so each action
+    # is folded in a single pass and only one run is held in memory at a time
+    for row_action_id, completed_on, row_zone_name in completions.iterator(chunk_size=chunk_size):
+        if row_action_id != action_id:
+            if state is not None:
+                finish()
+
+                if len(pending) >= chunk_size:
+                    flush()
+
+            action_id = row_action_id
+            zone_name = row_zone_name
+            state = _StreakState()
+
+        state.push(completed_on)
+
+    if state is not None:
+        finish()
+
+    flush()
+
+    # Actions without any history fall back to an empty streak
+    untouched = Action.objects.exclude(
+        pk__in=HabitCompletion.objects.values("action_id")
+    )
+
+    if action_ids is not None:
+        untouched = untouched.filter(pk__in=action_ids)
+
+    updated += untouched.update(
+        current_streak=0,
+        longest_streak=0,
+        last_completed_on=None
+    )
+
+    bump_all_versions()
+
+    return updated
+
+
+class _StreakState:
+    def __init__(self):
+        self.current = 0
+        self.longest = 0
+        self.last = None
+
+    def push(self, completed_on):
+        if self.last is not None and completed_on == self.last + timedelta(days=1):
+            self.current += 1
+        elif completed_on != self.last:
+            self.current = 1
+
+        self.longest = max(self.longest, self.current)
+        self.last = completed_on
+
+    def current_on(self, yesterday):
+        # A run that ended before yesterday was already broken by a missed day
+        return self.current if self.last is not None and self.last >= yesterday else 0
+
+    def to_action(self, action_id, yesterday):
+        return Action(
+            pk=action_id,
+            current_streak=self.current_on(yesterday),
+            longest_streak=self.longest,
+            last_completed_on=self.last
+        )
@@ -0,0 +1,157 @@
+import random
+from datetime import date, time, timedelta
+from itertools import islice
+from django.contrib.auth.models import User
+from django.db import transaction
+from activity.models import Notification
+from activity.counters import refresh_unread_counts
+from profiles.models import UserProfile, Preferences, AccountabilityPartnership
+from .models import Routine, Action, HabitCompletion
+from . import leaderboard, progress, rollups, streaks
+
+BATCH_SIZE = 5000
+
+TIMEZONES = [
+    "UTC", "Europe/London", "Europe/Dublin", "Europe/Berlin", "America/New_York",
+    "America/Chicago", "America/Los_Angeles", "Asia/Tokyo", "Asia/Kolkata", "Australia/Sydney",
+]
+
+
+def insert_in_batches(model, objects, batch_size=BATCH_SIZE, keep=True):
+    objects = iter(objects)
+    inserted = []
+    count = 0
+
+    # Drain the generator a batch at a time so large histories never sit in memory
+    while batch := list(islice(objects, batch_size)):
+        model.objects.bulk_create(batch, batch_size=batch_size)
+        count += len(batch)
+
+        if keep:
+            inserted += batch
+
+    return inserted if keep else count
+
+
+def generate(
+    users=100,
+    routines_per_user=3,
+    actions_per_routine=3,
+    days=365,
+    completion_rate=0.8,
+    partner_rate=0.5,
+    notifications_per_user=50,
+    prefix="load",
+    seed=None,
+    batch_size=BATCH_SIZE
+):
+    rng = random.Random(seed)
+    today = date.today()
+    start = today - timedelta(days=days)
+    run = User.objects.filter(username__startswith=f"{prefix}_").count()
+
+    with transaction.atomic():
+        people = insert_in_batches(User, (
+            User(
+                username=f"{prefix}_{run + index}",
+                email=f"{prefix}_{run + index}@example.com",
+                password="!"
+            )
+            for index in range(users)
+        ), batch_size)
+
+        profiles = insert_in_batches(UserProfile, (
+            UserProfile(user=person, bio="Synthetic user")
+            for person in people
+        ), batch_size)
+
+        insert_in_batches(Preferences, (
+            Preferences(user_profile=profile, timezone=rng.choice(TIMEZONES))
+            for profile in profiles
+        ), batch_size)
+
+        routines = insert_in_batches(Routine, (
+            Routine(
+                name=f"Routine {index}",
+                reason="Synthetic routine",
+                owner=person,
+                status=rng.choice(Routine.RoutineStatusChoice.values),
+                start_date=start
+            )
+            for person in people for index in range(routines_per_user)
+        ), batch_size)
+
+        actions = insert_in_batches(Action, (
+            Action(
+                name=f"Action {index}",
+                routine=routine,
+                start_time=time(rng.randrange(5, 22), rng.choice((0, 15, 30, 45)))
+            )
+            for routine in routines for index in range(actions_per_routine)
+        ), batch_size)
+
+        feelings = HabitCompletion.FeelingChoice.values
+
+        completions = insert_in_batches(HabitCompletion, (
+            HabitCompletion(
+                action=action,
+                user_id=action.routine.owner_id,
+                completion_date=start + timedelta(days=day),
+                difficulty=rng.randint(1, 10),
+                confidence=rng.randint(1, 10),
+                feeling=rng.choice(feelings)
+            )
+            for action in actions for day in range(days)
+            if rng.random() < completion_rate
+        ), batch_size, keep=False)
+
+        partnerships = insert_in_batches(AccountabilityPartnership, (
+            AccountabilityPartnership(
+                user=person,
+                partner=people[(index + 1) % len(people)],
+                status=rng.choice(AccountabilityPartnership.AccountabilityStatus.values)
+            )
+            for index, person in enumerate(people)
+            if len(people) > 1 and rng.random() < partner_rate
+        ), batch_size)
+
+        actions_by_owner = {}
+
+        for action in actions:
+            actions_by_owner.setdefault(action.routine.owner_id, []).append(action)
+
+        notifications = insert_in_batches(Notification, (
+            Notification(
+                recipient=person,
+                category=Notification.NotificationCategoryChoice.USER_MISSED_HABIT,
+                message="Synthetic missed habit",
+                trigger_action=rng.choice(actions_by_owner[person.pk]),
+                read_status=rng.random() < 0.7
+            )
+            for person in people if person.pk in actions_by_owner
+            for _ in range(notifications_per_user)
+        ), batch_size, keep=False)
+
+        for offset in range(0, len(people), batch_size):
+            refresh_unread_counts([person.pk for person in people[offset:offset + batch_size]])
+
+        # Derived state is rebuilt per chunk to keep the IN lists bounded
+        for offset in range(0, len(actions), batch_size):
+            action_ids = [action.pk for action in actions[offset:offset + batch_size]]
+            streaks.rebuild_streaks(action_ids=action_ids, chunk_size=batch_size)
+            rollups.rebuild_rollups(action_ids=action_ids)
+
+        for offset in range(0, len(routines), batch_size):
+            progress.refresh_completion_counts([routine.pk for routine in routines[offset:offset + batch_size]])
+
+        for offset in range(0, len(people), batch_size):
+            leaderboard.refresh_standings([person.pk for person in people[offset:offset + batch_size]])
+
+    return {
+        "users": len(people),
+        "routines": len(routines),
+        "actions": len(actions),
+        "completions": completions,
+        "partnerships": len(partnerships),
+        "notifications": notifications,
+    }
@@ -1,3 +1,916 @@
+import json
+import tempfile
+import threading
+from datetime import date, time, timedelta
+from io import StringIO
+from pathlib import Path
+from time import monotonic
+from unittest import mock
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+from config.cache import TieredCache, single_flight
+from config.testing import QueryBudgetMixin
+from activity.models import Notification, UnreadNotificationCounter
+from activity.counters import adjust_unread_count
+from profiles.models import UserProfile, Preferences, AccountabilityPartnership
+from .models import Routine, Action, HabitCompletion, CompletionRollup, LeaderboardEntry, LeaderboardBucket
+from .urls import router
+from . import completions, dashboard, milestones, progress, rollups, streaks, synthetic
 
-# Create your tests here.
+
+def make_user(username="alice"):
+    return User.objects.create_user(username=username, email=f"{username}@example.com", password="pw")
+
+
+def make_routine(owner, name="Morning", **kwargs):
+    return Routine.objects.create(name=name, reason="Energy", owner=owner, **kwargs)
+
+
+def make_action(routine, name="Meditate", start_time=time(7, 0), **kwargs):
+    return Action.objects.create(name=name, routine=routine, start_time=start_time, **kwargs)
+
+
+def make_client(user):
+    client = APIClient()
+    client.force_authenticate(user)
+    return client
+
+
+class StreakEngineTests(TestCase):
+    def setUp(self):
+        self.user = make_user()
+        self.routine = make_routine(self.user)
+        self.action = make_action(self.routine)
+        # Recounts only keep a run that reaches the owner's yesterday
+        self.today = timezone.now().date()
+
+    def complete(self, days_ago):
+        completion = HabitCompletion.objects.create(
+            action=self.action,
+            user=self.user,
+            completion_date=self.today - timedelta(days=days_ago)
+        )
+        streaks.apply_completion(completion, streaks.lock_actions([self.action.pk])[self.action.pk])
+        self.action.refresh_from_db()
+        return completion
+
+    def test_consecutive_days_extend_streak(self):
+        for days_ago in (2, 1, 0):
+            self.complete(days_ago)
+
+        self.assertEqual(self.action.current_streak, 3)
+        self.assertEqual(self.action.longest_streak, 3)
+        self.assertEqual(self.action.last_completed_on, self.today)
+
+    def test_gap_restarts_streak_and_keeps_longest(self):
+        for days_ago in (5, 4, 3, 0):
+            self.complete(days_ago)
+
+        self.assertEqual(self.action.current_streak, 1)
+        self.assertEqual(self.action.longest_streak, 3)
+
+    def test_backdated_completion_recounts(self):
+        self.complete(2)
+        self.complete(0)
+        self.complete(1)
+
+        self.assertEqual(self.action.current_streak, 3)
+        self.assertEqual(self.action.longest_streak, 3)
+
+    def test_old_completions_match_rebuild(self):
+        for days_ago in (10, 9, 8):
+            self.complete(days_ago)
+
+        incremental = (self.action.current_streak, self.action.longest_streak)
+
+        streaks.rebuild_streaks(action_ids=[self.action.pk])
+        self.action.refresh_from_db()
+
+        self.assertEqual(incremental, (0, 3))
+        self.assertEqual((self.action.current_streak, self.action.longest_streak), incremental)
+
+    def test_delete_recounts(self):
+        self.complete(2)
+        middle = self.complete(1)
+        self.complete(0)
+
+        middle.delete()
+        streaks.revert_completion(middle)
+        self.action.refresh_from_db()
+
+        self.assertEqual(self.action.current_streak, 1)
+        self.assertEqual(self.action.longest_streak, 1)
+
+    def test_rebuild_matches_incremental(self):
+        other = make_action(self.routine, "Read", time(8, 0))
+        empty = make_action(self.routine, "Run", time(9, 0), current_streak=4)
+
+        HabitCompletion.objects.bulk_create([
+            HabitCompletion(action=self.action, user=self.user, completion_date=self.today - timedelta(days=d))
+            for d in (6, 5, 4, 1, 0)
+        ] + [
+            HabitCompletion(action=other, user=self.user, completion_date=self.today - timedelta(days=d))
+            for d in (3, 2)
+        ])
+
+        streaks.rebuild_streaks(chunk_size=2)
+
+        self.action.refresh_from_db()
+        other.refresh_from_db()
+        empty.refresh_from_db()
+
+        self.assertEqual((self.action.current_streak, self.action.longest_streak), (2, 3))
+        # Ended two days ago, a missed day already broke it
+        self.assertEqual((other.current_streak, other.longest_streak), (0, 2))
+        self.assertEqual((empty.current_streak, empty.longest_streak), (0, 0))
+
+    def test_rebuild_keeps_swept_streaks_broken(self):
+        for days_ago in (5, 4, 3):
+            self.complete(days_ago)
+
+        # The sweeper reset the run after the missed day
+        Action.objects.filter(pk=self.action.pk).update(current_streak=0)
+
+        streaks.rebuild_streaks(action_ids=[self.action.pk])
+        self.action.refresh_from_db()
+
+        self.assertEqual((self.action.current_streak, self.action.longest_streak), (0, 3))
+
+        streaks.recalculate_action(self.action.pk)
+        self.action.refresh_from_db()
+
+        self.assertEqual(self.action.current_streak, 0)
+        self.assertEqual(self.action.last_completed_on, self.today - timedelta(days=3))
+
+    def test_completion_endpoint_updates_streak(self):
+        client = make_client(self.user)
+
+        response = client.post("/api/habits/completions/", {
+            "action": self.action.id,
+            "completion_date": self.today.isoformat()
+        })
+
+        self.assertEqual(response.status_code, 201)
+        self.action.refresh_from_db()
+        self.assertEqual(self.action.current_streak, 1)
+
+        response = client.delete(f"/api/habits/completions/{response.data['id']}/")
+
+        self.assertEqual(response.status_code, 204)
+        self.action.refresh_from_db()
+        self.assertEqual(self.action.current_streak, 0)
+
+
+class CompletionPercentageTests(TestCase):
+    def setUp(self):
+        self.user = make_user()
+        self.half = make_routine(self.user, "Half", target_completions=4)
+        self.over = make_routine(self.user, "Over", target_completions=1)
+        self.empty = make_routine(self.user, "Empty", target_completions=3)
+
+        for routine, days in ((self.half, 2), (self.over, 3)):
+            action = make_action(routine, "Act")
+            HabitCompletion.objects.bulk_create([
+                HabitCompletion(action=action, user=self.user, completion_date=date(2025, 1, day + 1))
+                for day in range(days)
+            ])
+
+        progress.refresh_completion_counts([self.half.pk, self.over.pk, self.empty.pk])
+
+    def test_annotation_counts_completions_against_target(self):
+        percentages = dict(
+            Routine.objects.with_completion_percentage().values_list("name", "completion_percentage")
+        )
+
+        self.assertEqual(percentages, {"Half": 50.0, "Over": 100.0, "Empty": 0.0})
+
+    def test_property_reads_the_counter(self):
+        self.half.refresh_from_db()
+
+        with self.assertNumQueries(0):
+            self.assertEqual(self.half.get_completion_percentage, 50.0)
+
+    def test_list_orders_and_filters_by_completion(self):
+        client = make_client(self.user)
+
+        response = client.get("/api/habits/routines/", {"ordering": "-completion_percentage", "completion_min": 10})
+
+        self.assertEqual([routine["name"] for routine in response.data], ["Over", "Half"])
+        self.assertEqual(response.data[1]["completion_percentage"], 50.0)
+
+
+class CompletionRollupTests(TestCase):
+    def setUp(self):
+        self.user = make_user()
+        routine = make_routine(self.user)
+        self.action = make_action(routine)
+        self.client = make_client(self.user)
+
+    def check_in(self, day, difficulty, feeling):
+        return self.client.post("/api/habits/completions/", {
+            "action": self.action.id,
+            "completion_date": day.isoformat(),
+            "difficulty": difficulty,
+            "feeling": feeling
+        })
+
+    def test_writes_maintain_day_week_and_month_buckets(self):
+        self.check_in(date(2025, 1, 6), 4, "great")
+        self.check_in(date(2025, 1, 7), 8, "forced")
+        response = self.check_in(date(2025, 1, 13), 6, "great")
+
+        week = CompletionRollup.objects.get(period="week", period_start=date(2025, 1, 6))
+        self.assertEqual((week.completions, week.average_difficulty), (2, 6.0))
+        self.assertEqual(week.feelings["forced"], 1)
+
+        month = CompletionRollup.objects.get(period="month", period_start=date(2025, 1, 1))
+        self.assertEqual((month.completions, month.feeling_great), (3, 2))
+
+        self.client.delete(f"/api/habits/completions/{response.data['id']}/")
+
+        self.assertFalse(CompletionRollup.objects.filter(period_start=date(2025, 1, 13)).exists())
+        month.refresh_from_db()
+        self.assertEqual(month.completions, 2)
+
+    def test_rebuild_matches_incremental(self):
+        for day, difficulty, feeling in ((6, 4, "great"), (7, 8, "forced"), (13, 6, "okay"), (31, 1, "good")):
+            self.check_in(date(2025, 1, day), difficulty, feeling)
+
+        def snapshot():
+            return sorted(CompletionRollup.objects.values_list(
+                "period", "period_start", "completions", "difficulty_total", "feeling_great", "feeling_okay"
+            ))
+
+        incremental = snapshot()
+        rollups.rebuild_rollups(chunk_size=1)
+
+        self.assertEqual(snapshot(), incremental)
+
+    def test_trend_endpoints(self):
+        self.check_in(date(2025, 1, 6), 4, "great")
+        self.check_in(date(2025, 2, 3), 8, "okay")
+
+        response = self.client.get(f"/api/habits/actions/{self.action.id}/trends/", {"period": "month"})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([bucket["period_start"] for bucket in response.data], ["2025-01-01", "2025-02-01"])
+
+        response = self.client.get(
+            f"/api/habits/routines/{self.action.routine_id}/trends/",
+            {"period": "week", "start": "2025-02-01"}
+        )
+
+        self.assertEqual(len(response.data), 1)
+        self.assertEqual(response.data[0]["average_difficulty"], 8.0)
+        self.assertEqual(response.data[0]["feelings"]["okay"], 1)
+
+
+class CompletionPaginationTests(TestCase):
+    def test_cursor_pages_cover_history_without_overlap(self):
+        user = make_user()
+        routine = make_routine(user)
+        action = make_action(routine)
+        HabitCompletion.objects.bulk_create([
+            HabitCompletion(action=action, user=user, completion_date=date(2025, 1, 1) + timedelta(days=day))
+            for day in range(5)
+        ])
+
+        client = make_client(user)
+
+        seen = []
+        url = "/api/habits/completions/?page_size=2"
+
+        while url:
+            # The validator aggregate, then the page itself
+            with self.assertNumQueries(2):
+                response = client.get(url)
+
+            seen += [completion["id"] for completion in response.data["results"]]
+            url = response.data["next"]
+
+        self.assertEqual(seen, sorted(HabitCompletion.objects.values_list("pk", flat=True), reverse=True))
+
+    def test_tied_timestamps_page_by_id_both_ways(self):
+        user = make_user()
+        routine = make_routine(user)
+        action = make_action(routine)
+        HabitCompletion.objects.bulk_create([
+            HabitCompletion(action=action, user=user, completion_date=date(2025, 1, 1) + timedelta(days=day))
+            for day in range(5)
+        ])
+        # One bulk write, one timestamp
+        HabitCompletion.objects.update(created_at=timezone.now())
+        expected = sorted(HabitCompletion.objects.values_list("pk", flat=True), reverse=True)
+
+        client = make_client(user)
+
+        pages = []
+        url = "/api/habits/completions/?page_size=2"
+
+        while url:
+            response = client.get(url)
+            pages.append([completion["id"] for completion in response.data["results"]])
+            url = response.data["next"]
+
+        self.assertEqual(pages, [expected[0:2], expected[2:4], expected[4:]])
+
+        response = client.get(response.data["previous"])
+        self.assertEqual([completion["id"] for completion in response.data["results"]], expected[2:4])
+
+        response = client.get(response.data["previous"])
+        self.assertEqual([completion["id"] for completion in response.data["results"]], expected[0:2])
+        self.assertIsNone(response.data["previous"])
+
+
+    def test_page_validators_aggregate_only_the_page_window(self):
+        user = make_user()
+        routine = make_routine(user)
+        action = make_action(routine)
+        HabitCompletion.objects.bulk_create([
+            HabitCompletion(action=action, user=user, completion_date=date(2025, 1, 1) + timedelta(days=day))
+            for day in range(5)
+        ])
+
+        client = make_client(user)
+        url = "/api/habits/completions/?page_size=2"
+        etag = client.get(url)["ETag"]
+
+        # Rows past the window don't reach the first page's validators
+        HabitCompletion.objects.order_by("pk").first().delete()
+
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        self.assertIn("LIMIT 3", queries[0]["sql"])
+
+class BulkCheckInTests(TestCase):
+    def setUp(self):
+        self.user = make_user()
+        routine = make_routine(self.user)
+        self.meditate = make_action(routine)
+        self.read = make_action(routine, "Read", time(8, 0))
+
+        stranger = make_user("bob")
+        other_routine = make_routine(stranger, "Other")
+        self.foreign = make_action(other_routine, "Run", time(6, 0))
+
+        self.client = make_client(self.user)
+
+    def test_bulk_upsert_reports_per_item(self):
+        HabitCompletion.objects.create(
+            action=self.read, user=self.user, completion_date=date(2025, 1, 1), difficulty=2
+        )
+
+        response = self.client.post("/api/habits/completions/bulk/", [
+            {"action": self.meditate.id, "completion_date": "2025-01-01", "feeling": "great"},
+            {"action": self.read.id, "completion_date": "2025-01-01", "difficulty": 9},
+            {"action": self.foreign.id, "completion_date": "2025-01-01"},
+            {"action": self.meditate.id, "completion_date": "2025-01-01"},
+            {"action": self.meditate.id, "difficulty": 11},
+        ], format="json")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [item["status"] for item in response.data],
+            ["created", "updated", "invalid", "invalid", "invalid"]
+        )
+        self.assertIn("difficulty", response.data[4]["errors"])
+
+        self.assertEqual(HabitCompletion.objects.count(), 2)
+        self.assertEqual(HabitCompletion.objects.get(action=self.read).difficulty, 9)
+        self.assertEqual(response.data[1]["completion"]["difficulty"], 9)
+
+        self.meditate.refresh_from_db()
+        self.assertEqual(self.meditate.longest_streak, 1)
+        self.assertEqual(
+            CompletionRollup.objects.get(action=self.read, period="day").difficulty_total,
+            9
+        )
+
+    def test_rejects_non_list_payload(self):
+        response = self.client.post("/api/habits/completions/bulk/", {"action": self.meditate.id}, format="json")
+
+        self.assertEqual(response.status_code, 400)
+
+
+class StreakMilestoneTests(TestCase):
+    def setUp(self):
+        self.user = make_user()
+        routine = make_routine(self.user)
+        self.action = make_action(routine)
+        self.client = make_client(self.user)
+
+    def milestones(self):
+        return Notification.objects.filter(category=Notification.NotificationCategoryChoice.STREAK_MILESTONE)
+
+    def check_in(self, day):
+        return self.client.post("/api/habits/completions/", {
+            "action": self.action.id,
+            "completion_date": day.isoformat()
+        })
+
+    def test_milestone_is_emitted_when_streak_crosses_threshold(self):
+        # Recounts only keep runs that reach yesterday
+        start = timezone.now().date() - timedelta(days=7)
+
+        for day in range(6):
+            self.check_in(start + timedelta(days=day))
+
+        self.assertFalse(self.milestones().exists())
+
+        self.check_in(start + timedelta(days=6))
+
+        milestone = self.milestones().get()
+        self.assertEqual(milestone.message, "7 day streak on Meditate!")
+        self.assertEqual(milestone.event_date, start + timedelta(days=6))
+        self.assertEqual(milestone.recipient, self.user)
+        self.assertEqual(self.client.get("/api/activity/notifications/unread-count/").data["unread_count"], 1)
+
+        # Moving a completion out of the run and back recounts without a duplicate
+        completion = HabitCompletion.objects.get(completion_date=start + timedelta(days=6))
+        self.client.patch(f"/api/habits/completions/{completion.id}/", {"completion_date": start + timedelta(days=7)})
+        self.client.patch(f"/api/habits/completions/{completion.id}/", {"completion_date": start + timedelta(days=6)})
+        self.assertEqual(self.milestones().count(), 1)
+
+    def test_backdated_check_in_emits_every_threshold_it_skips(self):
+        start = timezone.now().date() - timedelta(days=8)
+
+        for day in (0, 1, 2, 4, 5, 6, 7):
+            self.check_in(start + timedelta(days=day))
+
+        self.action.refresh_from_db()
+        self.assertEqual(self.action.current_streak, 4)
+
+        # Joining the runs moves the recount from 4 straight to 8
+        self.check_in(start + timedelta(days=3))
+
+        self.assertEqual(
+            list(self.milestones().values_list("event_date", "message")),
+            [(start + timedelta(days=6), "7 day streak on Meditate!")]
+        )
+
+    def test_crossing_writes_from_the_locked_row(self):
+        UnreadNotificationCounter.objects.create(recipient=self.user, unread_count=0)
+        action = completions.lock_actions([self.action.pk])[self.action.pk]
+        action.update(current_streak=7, last_completed_on=timezone.now().date())
+
+        # What is on record, the insert, the counter
+        with self.assertNumQueries(3):
+            emitted = milestones.emit_streak_milestones(action, 6)
+
+        self.assertEqual([notification.message for notification in emitted], ["7 day streak on Meditate!"])
+        self.assertEqual(UnreadNotificationCounter.objects.get(recipient=self.user).unread_count, 1)
+
+        with self.assertNumQueries(1):
+            self.assertEqual(milestones.emit_streak_milestones(action, 6), [])
+
+    def test_milestone_goes_to_the_routine_owner(self):
+        partner = make_user("bob")
+        start = timezone.now().date() - timedelta(days=6)
+
+        for day in range(7):
+            completions.completion_created(HabitCompletion.objects.create(
+                action=self.action,
+                user=partner,
+                completion_date=start + timedelta(days=day)
+            ), completions.lock_actions([self.action.pk])[self.action.pk])
+
+        self.assertEqual(self.milestones().get().recipient, self.user)
+
+    def test_backfill_replays_history(self):
+        HabitCompletion.objects.bulk_create([
+            HabitCompletion(action=self.action, user=self.user, completion_date=date(2025, 1, 1) + timedelta(days=day))
+            for day in list(range(14)) + list(range(20, 27))
+        ])
+
+        call_command("backfill_milestones", stdout=StringIO())
+        call_command("backfill_milestones", chunk_size=1, stdout=StringIO())
+
+        self.assertEqual(
+            sorted(self.milestones().values_list("event_date", "message")),
+            [
+                (date(2025, 1, 7), "7 day streak on Meditate!"),
+                (date(2025, 1, 14), "14 day streak on Meditate!"),
+                (date(2025, 1, 27), "7 day streak on Meditate!"),
+            ]
+        )
+        self.assertEqual(UnreadNotificationCounter.objects.get(recipient=self.user).unread_count, 3)
+
+
+class RoutineCompletionTests(TestCase):
+    def setUp(self):
+        self.user = make_user()
+        self.routine = make_routine(
+            self.user,
+            status=Routine.RoutineStatusChoice.ACTIVE,
+            start_date=date(2025, 1, 1),
+            target_completions=3
+        )
+        self.action = make_action(self.routine)
+        self.client = make_client(self.user)
+
+    def check_in(self, day):
+        return self.client.post("/api/habits/completions/", {
+            "action": self.action.id,
+            "completion_date": date(2025, 1, day).isoformat()
+        })
+
+    def completed_notifications(self):
+        return Notification.objects.filter(category=Notification.NotificationCategoryChoice.ROUTINE_COMPLETED)
+
+    def test_reaching_target_completes_routine_once(self):
+        self.check_in(1)
+        completion_id = self.check_in(2).data["id"]
+        self.client.delete(f"/api/habits/completions/{completion_id}/")
+        self.check_in(2)
+
+        self.routine.refresh_from_db()
+        self.assertEqual(self.routine.completion_count, 2)
+        self.assertEqual(self.routine.status, Routine.RoutineStatusChoice.ACTIVE)
+
+        self.check_in(3)
+        self.check_in(4)
+
+        self.routine.refresh_from_db()
+        self.assertEqual(self.routine.completion_count, 4)
+        self.assertEqual(self.routine.status, Routine.RoutineStatusChoice.COMPLETED)
+        self.assertIsNotNone(self.routine.end_date)
+        self.assertEqual(self.completed_notifications().get().message, "You completed Morning!")
+        self.assertEqual(UnreadNotificationCounter.objects.get(recipient=self.user).unread_count, 1)
+
+    def test_reconcile_recounts_and_completes_in_bulk(self):
+        HabitCompletion.objects.bulk_create([
+            HabitCompletion(action=self.action, user=self.user, completion_date=date(2025, 1, day))
+            for day in range(1, 4)
+        ])
+        paused = make_routine(self.user, "Paused", status=Routine.RoutineStatusChoice.PAUSED, target_completions=0)
+
+        call_command("reconcile_routines", chunk_size=1, stdout=StringIO())
+        call_command("reconcile_routines", stdout=StringIO())
+
+        self.routine.refresh_from_db()
+        paused.refresh_from_db()
+        self.assertEqual(self.routine.completion_count, 3)
+        self.assertEqual(self.routine.status, Routine.RoutineStatusChoice.COMPLETED)
+        self.assertEqual(paused.status, Routine.RoutineStatusChoice.PAUSED)
+        self.assertEqual(self.completed_notifications().count(), 1)
+
+    def test_mark_complete_is_conditional(self):
+        self.assertTrue(self.routine.mark_complete())
+        self.assertFalse(self.routine.mark_complete())
+        self.assertEqual(self.routine.status, Routine.RoutineStatusChoice.COMPLETED)
+
+
+class LeaderboardTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.users = {
+            name: make_user(name)
+            for name in ("alice", "bob", "carol", "dave")
+        }
+        self.actions = {}
+
+        for name, user in self.users.items():
+            routine = make_routine(user)
+            self.actions[name] = make_action(routine)
+
+        AccountabilityPartnership.objects.create(
+            user=self.users["alice"],
+            partner=self.users["carol"],
+            status=AccountabilityPartnership.AccountabilityStatus.ACCEPTED
+        )
+
+        # Runs end today, so they are still current
+        self.today = timezone.now().date()
+
+        self.client = make_client(self.users["alice"])
+
+    def streak(self, name, days):
+        self.client.force_authenticate(self.users[name])
+
+        for day in range(days):
+            with self.captureOnCommitCallbacks(execute=True):
+                self.client.post("/api/habits/completions/", {
+                    "action": self.actions[name].id,
+                    "completion_date": (self.today - timedelta(days=days - 1 - day)).isoformat()
+                })
+
+        self.client.force_authenticate(self.users["alice"])
+
+    def board(self, **params):
+        return [(entry["username"], entry["rank"]) for entry in self.client.get("/api/habits/leaderboard/", params).data]
+
+    def test_standings_follow_completion_writes(self):
+        self.streak("alice", 2)
+        self.streak("bob", 5)
+        self.streak("carol", 2)
+
+        self.assertEqual(self.board(), [("bob", 1), ("alice", 2), ("carol", 2)])
+        self.assertEqual(self.board(scope="partners"), [("alice", 1), ("carol", 1)])
+        self.assertEqual(self.board(limit=1), [("bob", 1)])
+
+        # Score, global rank from the buckets, partner ids, partner rank by key
+        with self.assertNumQueries(4):
+            me = self.client.get("/api/habits/leaderboard/me/").data
+
+        self.assertEqual(me, {"score": 2, "rank": 2, "partner_rank": 1})
+
+        completion = HabitCompletion.objects.get(user=self.users["bob"], completion_date=self.today)
+        self.client.force_authenticate(self.users["bob"])
+        self.client.delete(f"/api/habits/completions/{completion.id}/")
+
+        self.assertEqual(LeaderboardEntry.objects.get(user=self.users["bob"]).score, 4)
+        self.assertEqual(
+            dict(LeaderboardBucket.objects.filter(members__gt=0).values_list("score", "members")),
+            {2: 2, 4: 1}
+        )
+
+    def test_rebuild_matches_incremental_state(self):
+        self.streak("alice", 3)
+        self.streak("dave", 1)
+        # Out-of-band writes drift from the standings until the next rebuild
+        Action.objects.filter(pk=self.actions["bob"].pk).update(current_streak=9)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command("rebuild_leaderboard", chunk_size=1, stdout=StringIO())
+
+        self.assertEqual(self.board(), [("bob", 1), ("alice", 2), ("dave", 3)])
+        self.assertEqual(
+            dict(LeaderboardBucket.objects.values_list("score", "members")),
+            {9: 1, 3: 1, 1: 1}
+        )
+        self.assertEqual(self.client.get("/api/habits/leaderboard/me/").data["rank"], 2)
+
+
+class TieredCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        cache.reset_metrics()
+        self.tiered = TieredCache("tiered-tests", {
+            "OPTIONS": {"SHARED": "shared", "LOCAL_MAX_ENTRIES": 2, "LOCAL_TIMEOUT": 60, "LOCAL_BYPASS": ["version"]}
+        })
+        self.tiered.clear()
+        self.tiered.reset_metrics()
+
+    def test_local_tier_evicts_least_recently_used(self):
+        for key in ("ns:a", "ns:b", "ns:c"):
+            self.tiered.set(key, key)
+
+        self.assertEqual(self.tiered.get("ns:c"), "ns:c")
+        # Evicted locally, still served by the shared tier
+        self.assertEqual(self.tiered.get("ns:a"), "ns:a")
+        self.assertIsNone(self.tiered.get("ns:missing"))
+
+        self.assertEqual(self.tiered.metrics()["ns"], {
+            "sets": 4, "evictions": 2, "local_hits": 1, "shared_hits": 1, "misses": 1
+        })
+
+    def test_local_copies_expire_and_bypassed_keys_stay_shared(self):
+        self.tiered.set("ns:a", 1)
+        self.tiered.set("version:user:1", "token")
+
+        self.assertNotIn("version", self.tiered.metrics())
+
+        with mock.patch("config.cache.monotonic", return_value=10 ** 9):
+            self.assertEqual(self.tiered.get("ns:a"), 1)
+
+        self.assertEqual(self.tiered.metrics()["ns"]["expirations"], 1)
+        self.assertEqual(self.tiered.metrics()["ns"]["shared_hits"], 1)
+
+    def test_single_flight_computes_once_under_concurrency(self):
+        calls = []
+        started = threading.Barrier(5)
+
+        def compute():
+            calls.append(1)
+            threading.Event().wait(0.1)
+            return "built"
+
+        def read():
+            started.wait()
+            results.append(single_flight("expensive:key", compute))
+
+        results = []
+        threads = [threading.Thread(target=read) for _ in range(5)]
+
+        for thread in threads:
+            thread.start()
+
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(results, ["built"] * 5)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(cache.metrics()["expensive"]["coalesced"], 4)
+
+    def test_single_flight_does_not_queue_unrelated_keys(self):
+        release = threading.Event()
+        slow = threading.Thread(target=single_flight, args=("slow:key", lambda: release.wait(5)))
+        slow.start()
+
+        try:
+            started = monotonic()
+
+            # Enough keys that some would share a lock with the slow build
+            # if keys were striped
+            for index in range(100):
+                self.assertEqual(single_flight(f"fast:{index}", lambda: "built"), "built")
+
+            self.assertLess(monotonic() - started, 1)
+        finally:
+            release.set()
+            slow.join()
+
+    def test_single_flight_builds_when_the_lock_holder_stalls(self):
+        cache.add("lock:expensive:key", 1)
+
+        self.assertEqual(single_flight("expensive:key", lambda: "built", wait=0.1), "built")
+        self.assertEqual(cache.metrics()["expensive"]["lock_timeouts"], 1)
+
+
+class TodayDashboardTests(TestCase):
+    url = "/api/habits/today/"
+
+    def setUp(self):
+        cache.clear()
+        self.user = make_user()
+        self.routine = make_routine(self.user, status=Routine.RoutineStatusChoice.ACTIVE)
+        self.action = make_action(self.routine)
+        make_routine(self.user, "Later")
+        self.client = make_client(self.user)
+
+    def test_repeated_loads_skip_the_database(self):
+        response = self.client.get(self.url)
+
+        self.assertEqual([routine["name"] for routine in response.data["routines"]], ["Morning"])
+        self.assertEqual(response.data["routines"][0]["actions"][0]["deadline"], time(7, 30))
+        self.assertFalse(response.data["routines"][0]["actions"][0]["completed_today"])
+
+        with self.assertNumQueries(0):
+            cached = self.client.get(self.url)
+
+        self.assertEqual(cached.data, response.data)
+
+    def test_check_in_bumps_the_version(self):
+        self.client.get(self.url)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post("/api/habits/completions/", {
+                "action": self.action.id,
+                "completion_date": timezone.now().date().isoformat()
+            })
+
+        action = self.client.get(self.url).data["routines"][0]["actions"][0]
+
+        self.assertTrue(action["completed_today"])
+        self.assertEqual(action["current_streak"], 1)
+
+    def test_unread_count_change_bumps_the_version(self):
+        self.client.get(self.url)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Notification.objects.create(recipient=self.user, message="Hello")
+            adjust_unread_count(self.user.id, 1)
+
+        self.assertEqual(self.client.get(self.url).data["unread_count"], 1)
+
+    def test_changes_outside_the_routine_views_bump_the_version(self):
+        self.client.get(self.url)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.routine.mark_complete()
+
+        self.assertEqual(self.client.get(self.url).data["routines"], [])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.routine.status = Routine.RoutineStatusChoice.ACTIVE
+            self.routine.save()
+
+        self.assertEqual(len(self.client.get(self.url).data["routines"]), 1)
+
+        profile = UserProfile.objects.create(user=self.user)
+        preferences = Preferences.objects.create(user_profile=profile, timezone="Pacific/Kiritimati")
+        cache.clear()
+        self.assertEqual(self.client.get(self.url).data["timezone"], "Pacific/Kiritimati")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.delete(f"/api/profiles/preferences/{preferences.id}/")
+
+        self.assertEqual(self.client.get(self.url).data["timezone"], "UTC")
+
+    def test_entry_expires_at_local_midnight(self):
+        now = timezone.now()
+        dashboard.get_dashboard(self.user, now)
+
+        with self.assertNumQueries(0):
+            dashboard.get_dashboard(self.user, now)
+
+        tomorrow = dashboard.get_dashboard(self.user, now + timedelta(days=1))
+
+        self.assertEqual(tomorrow["date"], (now + timedelta(days=1)).date().isoformat())
+
+
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = make_user()
+        self.routine = make_routine(self.user, status=Routine.RoutineStatusChoice.ACTIVE)
+        self.action = make_action(self.routine)
+        self.client = make_client(self.user)
+
+    def test_unchanged_list_answers_304_from_one_aggregate(self):
+        response = self.client.get("/api/habits/actions/")
+
+        with self.assertNumQueries(1):
+            revalidated = self.client.get("/api/habits/actions/", HTTP_IF_NONE_MATCH=response["ETag"])
+
+        self.assertEqual(revalidated.status_code, 304)
+        self.assertEqual(revalidated.content, b"")
+
+        modified_since = self.client.get("/api/habits/actions/", HTTP_IF_MODIFIED_SINCE=response["Last-Modified"])
+
+        self.assertEqual(modified_since.status_code, 304)
+
+    def test_streak_change_invalidates_without_touching_updated_at(self):
+        url = f"/api/habits/actions/{self.action.id}/"
+        etag = self.client.get(url)["ETag"]
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post("/api/habits/completions/", {
+                "action": self.action.id,
+                "completion_date": timezone.now().date().isoformat()
+            })
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["current_streak"], 1)
+
+    def test_query_string_and_deletes_change_the_etag(self):
+        other = make_action(self.routine, "Stretch", time(8, 0))
+        etag = self.client.get("/api/habits/actions/")["ETag"]
+
+        self.assertNotEqual(self.client.get("/api/habits/actions/", {"routine": self.routine.id})["ETag"], etag)
+
+        other.delete()
+
+        self.assertEqual(self.client.get("/api/habits/actions/", HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+    def test_malformed_lookup_is_not_found(self):
+        for url in ("/api/habits/routines/abc/", "/api/habits/actions/abc/", "/api/activity/notifications/abc/"):
+            with self.subTest(url=url):
+                self.assertEqual(self.client.get(url).status_code, 404)
+
+class SyntheticLoadTests(TestCase):
+    def test_generate_and_benchmark(self):
+        counts = synthetic.generate(
+            users=3, routines_per_user=2, actions_per_routine=2, days=10,
+            notifications_per_user=2, seed=7, batch_size=7
+        )
+
+        self.assertEqual(counts["actions"], 12)
+        self.assertEqual(HabitCompletion.objects.count(), counts["completions"])
+        self.assertTrue(Action.objects.filter(longest_streak__gt=0).exists())
+
+        with tempfile.TemporaryDirectory() as directory:
+            baseline = Path(directory) / "baseline.json"
+            call_command(
+                "benchmark_api", iterations=2, warmup=0,
+                baseline=str(baseline), save_baseline=True, stdout=StringIO()
+            )
+
+            results = json.loads(baseline.read_text())
+
+        self.assertIn("routine-list", results)
+        self.assertIn("profile-search", results)
+        self.assertTrue(all(result["status"] == 200 for result in results.values()))
+
+
+class HabitsQueryBudgetTests(QueryBudgetMixin, TestCase):
+    router = router
+    query_budgets = {
+        "routine": 3,
+        "action": 2,
+        "completion": 2,
+        "leaderboard": 2,
+    }
+
+    def setUp(self):
+        self.user = make_user()
+        self.seeded = 0
+
+    def seed(self, user, count):
+        for _ in range(count):
+            self.seeded += 1
+            routine = make_routine(user, f"Routine {self.seeded}")
+
+            for hour in (7, 8):
+                action = make_action(routine, f"Action {hour}", time(hour, 0))
+                HabitCompletion.objects.create(action=action, user=user, completion_date=date(2025, 1, 1))
@@ -7,7 +7,9 @@ router = DefaultRouter()
 router.register(r'routines', views.RoutineViewSet, basename='routine')
 router.register(r'actions', views.ActionViewSet, basename='action')
 router.register(r'completions', views.HabitCompletionViewSet, basename='completion')
+router.register(r'leaderboard', views.LeaderboardViewSet, basename='leaderboard')
 
 urlpatterns = [
+    path('today/', views.TodayView.as_view(), name='today'),
     path('', include(router.urls))
 ]
\ No newline at end of file
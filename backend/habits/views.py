@@ -1,27 +1,119 @@
+from copy import copy
+from datetime import date
 from django.shortcuts import render
-from django.db.models import Q
+from django.db.models import Q, Sum
 from django.contrib.auth.models import User
+from django.db import transaction
 from rest_framework import viewsets
+from rest_framework.filters import OrderingFilter
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.exceptions import ValidationError
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from .models import Routine, Action, HabitCompletion
+from rest_framework.mixins import ListModelMixin
+from rest_framework.viewsets import GenericViewSet
+from rest_framework.views import APIView
+from config.cache import single_flight
+from config.cache_versions import bump_versions
+from config.conditional import ConditionalGetMixin, ConditionalResponseMixin
+from config.pagination import CreatedAtCursorPagination
+from activity.reminders import schedule_actions
+from .models import Routine, Action, HabitCompletion, CompletionRollup, LeaderboardEntry
 from .serializers import (
-    RoutineSerializer, ActionSerializer, HabitCompletionSerializer
+    RoutineSerializer, ActionSerializer, HabitCompletionSerializer,
+    CompletionTrendSerializer, BulkCompletionItemSerializer, LeaderboardEntrySerializer
 )
+from .completions import (
+    completion_created, completion_updated, completion_deleted,
+    bulk_upsert, lock_actions, BULK_LIMIT
+)
+from .rollups import Period
+from . import dashboard, leaderboard
+
+def trend_rollups(request, **filters):
+    period = request.query_params.get('period', Period.DAY)
+
+    if period not in Period.values:
+        raise ValidationError(f"Period must be one of {', '.join(Period.values)}")
+
+    query_set = CompletionRollup.objects.filter(period=period, **filters)
+
+    try:
+        if request.query_params.get('start'):
+            query_set = query_set.filter(period_start__gte=date.fromisoformat(request.query_params['start']))
+
+        if request.query_params.get('end'):
+            query_set = query_set.filter(period_start__lte=date.fromisoformat(request.query_params['end']))
+    except ValueError:
+        raise ValidationError("Start and end must be ISO dates")
+
+    return query_set
 
-class RoutineViewSet(viewsets.ModelViewSet):
+class RoutineViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     serializer_class = RoutineSerializer
     permission_classes = [IsAuthenticated]
+    filter_backends = [OrderingFilter]
+    ordering_fields = ["completion_percentage", "name", "start_date", "created_at"]
 
     def get_queryset(self):
-        return Routine.objects.filter(owner=self.request.user)
+        query_set = Routine.objects.filter(
+            owner=self.request.user
+        ).with_completion_percentage().prefetch_related("actions")
+
+        completion_min = self.request.query_params.get('completion_min')
+        completion_max = self.request.query_params.get('completion_max')
+
+        try:
+            if completion_min:
+                query_set = query_set.filter(completion_percentage__gte=float(completion_min))
+
+            if completion_max:
+                query_set = query_set.filter(completion_percentage__lte=float(completion_max))
+        except ValueError:
+            raise ValidationError("Completion filters must be numbers")
+
+        return query_set
     
     def perform_create(self, serializer):
-        serializer.save(owner=self.request.user)
+        with transaction.atomic():
+            serializer.save(owner=self.request.user)
+            bump_versions([self.request.user.id])
+
+    def perform_update(self, serializer):
+        with transaction.atomic():
+            # Saving reschedules the routine's reminders, see activity.reminders.routine_saved
+            serializer.save()
+            bump_versions([self.request.user.id])
+
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            instance.delete()
+            bump_versions([self.request.user.id])
+
+    @action(detail=True, methods=["get"])
+    def trends(self, request, pk=None):
+        routine = self.get_object()
+        fields = ["completions", "difficulty_total", "confidence_total"] + [
+            f"feeling_{choice}" for choice in HabitCompletion.FeelingChoice.values
+        ]
+
+        buckets = trend_rollups(
+            request, action__routine=routine
+        ).order_by("period_start").values("period_start").annotate(
+            **{f"sum_{field}": Sum(field) for field in fields}
+        )
+
+        rollups = [
+            CompletionRollup(
+                period_start=bucket["period_start"],
+                **{field: bucket[f"sum_{field}"] for field in fields}
+            )
+            for bucket in buckets
+        ]
+
+        return Response(CompletionTrendSerializer(rollups, many=True).data)
     
-class ActionViewSet(viewsets.ModelViewSet):
+class ActionViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     serializer_class = ActionSerializer
     permission_classes = [IsAuthenticated]
 
@@ -36,11 +128,33 @@ class ActionViewSet(viewsets.ModelViewSet):
         return query_set
     
     def perform_create(self, serializer):
-        serializer.save()
+        with transaction.atomic():
+            habit_action = serializer.save()
+            schedule_actions([habit_action.pk])
+            bump_versions([self.request.user.id])
+
+    def perform_update(self, serializer):
+        with transaction.atomic():
+            habit_action = serializer.save()
+            schedule_actions([habit_action.pk])
+            bump_versions([self.request.user.id])
+
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            instance.delete()
+            bump_versions([self.request.user.id])
 
-class HabitCompletionViewSet(viewsets.ModelViewSet):
+    @action(detail=True, methods=["get"])
+    def trends(self, request, pk=None):
+        habit_action = self.get_object()
+        rollups = trend_rollups(request, action=habit_action)
+
+        return Response(CompletionTrendSerializer(rollups, many=True).data)
+
+class HabitCompletionViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     serializer_class = HabitCompletionSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = CreatedAtCursorPagination
 
     def get_queryset(self):
         return HabitCompletion.objects.filter(
@@ -48,4 +162,134 @@ class HabitCompletionViewSet(viewsets.ModelViewSet):
         )
     
     def perform_create(self, serializer):
-        serializer.save(user=self.request.user)
+        with transaction.atomic():
+            # Queues behind a bulk upsert that may be writing the same day
+            action_id = serializer.validated_data["action"].pk
+            actions = lock_actions([action_id])
+            completion = serializer.save(user=self.request.user)
+            completion_created(completion, actions[action_id])
+            bump_versions([self.request.user.id])
+    
+    def perform_update(self, serializer):
+        previous = copy(serializer.instance)
+        # A completion moved to another action recounts both
+        action_id = getattr(serializer.validated_data.get("action"), "pk", previous.action_id)
+
+        with transaction.atomic():
+            actions = lock_actions({previous.action_id, action_id})
+            completion = serializer.save()
+            completion_updated(previous, completion, actions[action_id])
+            bump_versions([self.request.user.id])
+    
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            instance.delete()
+            completion_deleted(instance)
+            bump_versions([self.request.user.id])
+
+    @action(detail=False, methods=["post"])
+    def bulk(self, request):
+        if not isinstance(request.data, list):
+            raise ValidationError("Expected a list of completions")
+
+        if len(request.data) > BULK_LIMIT:
+            raise ValidationError(f"At most {BULK_LIMIT} completions can be submitted at once")
+
+        results = [None] * len(request.data)
+        valid = {}
+
+        for index, item in enumerate(request.data):
+            item_serializer = BulkCompletionItemSerializer(data=item)
+
+            if item_serializer.is_valid():
+                valid[index] = item_serializer.validated_data
+            else:
+                results[index] = {"index": index, "status": "invalid", "errors": item_serializer.errors}
+
+        owned = set(Action.objects.filter(
+            pk__in={item["action"] for item in valid.values()},
+            routine__owner=request.user
+        ).values_list("pk", flat=True))
+
+        accepted = {}
+
+        for index, item in valid.items():
+            key = (item["action"], item["completion_date"])
+
+            if item["action"] not in owned:
+                results[index] = {"index": index, "status": "invalid", "errors": {"action": ["Action not found"]}}
+            elif key in accepted:
+                results[index] = {"index": index, "status": "invalid", "errors": {
+                    "non_field_errors": [f"Duplicate of item {accepted[key]}"]
+                }}
+            else:
+                accepted[key] = index
+
+        upserted = bulk_upsert(request.user, [valid[index] for index in accepted.values()])
+        bump_versions([request.user.id])
+
+        for index, (completion, created) in zip(accepted.values(), upserted):
+            results[index] = {
+                "index": index,
+                "status": "created" if created else "updated",
+                "completion": HabitCompletionSerializer(completion).data
+            }
+
+        return Response(results)
+
+class LeaderboardViewSet(ConditionalResponseMixin, ListModelMixin, GenericViewSet):
+    serializer_class = LeaderboardEntrySerializer
+    permission_classes = [IsAuthenticated]
+
+    def partners_only(self):
+        return self.request.query_params.get('scope') == "partners"
+
+    def limit(self):
+        try:
+            limit = int(self.request.query_params.get('limit', leaderboard.DEFAULT_LIMIT))
+        except ValueError:
+            raise ValidationError("Limit must be a number")
+
+        return max(1, min(limit, leaderboard.MAX_LIMIT))
+
+    def get_queryset(self):
+        query_set = LeaderboardEntry.objects.select_related("user").order_by("-score", "user_id")
+
+        if self.partners_only():
+            query_set = query_set.filter(leaderboard.partner_scope(self.request.user))
+
+        return query_set[:self.limit()]
+
+    def list(self, request, *args, **kwargs):
+        query_set = self.get_queryset()
+
+        # Every check-in can move the standings, so concurrent readers share
+        # one rebuild instead of each ranking the table
+        return self.conditional_response(
+            query_set,
+            lambda: Response(single_flight(
+                leaderboard.standings_key(request.user, self.partners_only(), self.limit()),
+                lambda: self.get_serializer(leaderboard.with_ranks(list(query_set)), many=True).data
+            ))
+        )
+
+    @action(detail=False, methods=["get"])
+    def me(self, request):
+        score = LeaderboardEntry.objects.filter(
+            user=request.user
+        ).values_list("score", flat=True).first()
+
+        if score is None:
+            return Response({"score": 0, "rank": None, "partner_rank": None})
+
+        return Response({
+            "score": score,
+            "rank": leaderboard.global_rank(score),
+            "partner_rank": leaderboard.partner_rank(request.user, score),
+        })
+
+class TodayView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        return Response(dashboard.get_dashboard(request.user))
@@ -4,3 +4,17 @@ from django.apps import AppConfig
 class ProfilesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'profiles'
+
+    def ready(self):
+        from django.contrib.auth import get_user_model
+        from django.db.backends.signals import connection_created
+        from django.db.models.signals import post_delete, post_save
+        from config.authentication import user_changed
+        from config.database import connection_opened
+
+        # Users are written by auth, admin and management commands rather
+        # than by this project's views, so the cache listens for them here
+        post_save.connect(user_changed, sender=get_user_model(), dispatch_uid="auth_user_cache_save")
+        post_delete.connect(user_changed, sender=get_user_model(), dispatch_uid="auth_user_cache_delete")
+
+        connection_created.connect(connection_opened, dispatch_uid="database_connection_metrics")
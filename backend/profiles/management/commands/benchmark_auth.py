@@ -0,0 +1,55 @@
+import statistics
+from time import perf_counter
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.tokens import RefreshToken
+from config.authentication import CachedJWTAuthentication, invalidate_users
+from habits.management.commands.benchmark_api import percentile
+
+
+class Command(BaseCommand):
+    help = "Time request authentication with the stock and the cached JWT authenticators"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--user", help="Username to authenticate as (defaults to the first user)")
+        parser.add_argument("--iterations", type=int, default=2000)
+
+    def handle(self, *args, **options):
+        user = User.objects.filter(username=options["user"]).first() if options["user"] else User.objects.order_by("pk").first()
+
+        if user is None:
+            raise CommandError("No user to authenticate as, run seed_synthetic_data first")
+
+        request = RequestFactory().get(
+            "/", HTTP_AUTHORIZATION=f"Bearer {RefreshToken.for_user(user).access_token}"
+        )
+
+        invalidate_users([user.pk])
+
+        self.stdout.write(f"{'authenticator':<24}{'p50 us':>10}{'p95 us':>10}{'queries':>9}")
+
+        for name, authenticator in [
+            ("JWTAuthentication", JWTAuthentication()),
+            ("CachedJWTAuthentication", CachedJWTAuthentication()),
+        ]:
+            latencies, queries = self.measure(authenticator, request, options["iterations"])
+
+            self.stdout.write(
+                f"{name:<24}{statistics.median(latencies):>10.1f}{percentile(latencies, 0.95):>10.1f}"
+                f"{queries / options['iterations']:>9.2f}"
+            )
+
+    def measure(self, authenticator, request, iterations):
+        latencies = []
+
+        with CaptureQueriesContext(connection) as queries:
+            for _ in range(iterations):
+                started = perf_counter()
+                authenticator.authenticate(request)
+                latencies.append((perf_counter() - started) * 1_000_000)
+
+        return latencies, len(queries)
@@ -0,0 +1,92 @@
+import random
+import statistics
+from time import perf_counter
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from habits import synthetic
+from habits.management.commands.benchmark_api import percentile
+from profiles import search
+
+
+class Command(BaseCommand):
+    help = "Time profile search for sampled terms and print the query plan it runs with"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--seed-users",
+            type=int,
+            default=0,
+            help="Seed this many throwaway users (rolled back afterwards) before searching"
+        )
+        parser.add_argument("--iterations", type=int, default=200)
+        parser.add_argument("--term", action="append", dest="terms", help="Search term to time (repeatable)")
+        parser.add_argument("--seed", type=int, help="Random seed for the sampled terms")
+        parser.add_argument("--max-p95-ms", type=float, help="Fail when the p95 latency exceeds this budget")
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            if options["seed_users"]:
+                synthetic.generate(
+                    users=options["seed_users"],
+                    routines_per_user=0,
+                    days=0,
+                    partner_rate=0,
+                    notifications_per_user=0,
+                    prefix="search"
+                )
+
+            if connection.vendor == "postgresql":
+                with connection.cursor() as cursor:
+                    cursor.execute("ANALYZE")
+
+            user = User.objects.order_by("pk").first()
+
+            if user is None:
+                raise CommandError("No users to search, pass --seed-users")
+
+            terms = options["terms"] or self.sample_terms(options["iterations"], random.Random(options["seed"]))
+            latencies, query_counts = self.measure(user, terms, options["iterations"])
+
+            self.stdout.write(self.style.MIGRATE_HEADING(
+                f"{'trigram' if search.search_uses_trigrams() else 'prefix'} search over {User.objects.count()} users"
+            ))
+            self.stdout.write(search.search_profiles(terms[0], user).explain())
+
+            p95 = percentile(latencies, 0.95)
+
+            self.stdout.write(
+                f"p50 {statistics.median(latencies):.3f} ms, p95 {p95:.3f} ms, "
+                f"max {max(latencies):.3f} ms, queries per search {max(query_counts)}"
+            )
+
+            if options["seed_users"]:
+                transaction.set_rollback(True)
+
+        if options["max_p95_ms"] is not None and p95 > options["max_p95_ms"]:
+            raise CommandError(f"p95 of {p95:.3f} ms is over the {options['max_p95_ms']} ms budget")
+
+    def sample_terms(self, count, rng):
+        usernames = list(User.objects.order_by("?").values_list("username", flat=True)[:count])
+
+        # Prefixes of real names, as typed keystroke by keystroke
+        return [
+            username[:rng.randint(search.MIN_TERM_LENGTH, max(search.MIN_TERM_LENGTH, len(username)))]
+            for username in usernames
+            if len(username) >= search.MIN_TERM_LENGTH
+        ] or ["user"]
+
+    def measure(self, user, terms, iterations):
+        latencies = []
+        query_counts = []
+
+        for index in range(iterations):
+            with CaptureQueriesContext(connection) as queries:
+                started = perf_counter()
+                list(search.search_profiles(terms[index % len(terms)], user))
+                latencies.append((perf_counter() - started) * 1000)
+
+            query_counts.append(len(queries))
+
+        return latencies, query_counts
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:28
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('profiles', '0003_accountabilitypartnership'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='accountabilitypartnership',
+            index=models.Index(condition=models.Q(('status__in', ['pending', 'accepted'])), fields=['partner', 'status'], name='partnership_active_partner_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='accountabilitypartnership',
+            index=models.Index(fields=['user', 'status'], name='partnership_user_status_idx'),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:40
+
+import datetime
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('profiles', '0004_partnership_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='preferences',
+            name='notification_window_end',
+            field=models.TimeField(default=datetime.time(22, 0), help_text='Local time after which notifications are held until the next window', verbose_name='Notification Window End'),
+        ),
+        migrations.AddField(
+            model_name='preferences',
+            name='notification_window_start',
+            field=models.TimeField(default=datetime.time(8, 0), help_text='Local time from which notifications are delivered', verbose_name='Notification Window Start'),
+        ),
+    ]
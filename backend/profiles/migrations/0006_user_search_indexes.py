@@ -0,0 +1,43 @@
+from django.db import migrations, models
+from django.db.models.functions import Lower
+
+SEARCH_FIELDS = ["email", "username"]
+
+
+def create_search_indexes(apps, schema_editor):
+    User = apps.get_model("auth", "User")
+    quote = schema_editor.quote_name
+
+    if schema_editor.connection.vendor == "postgresql":
+        # Substring search is served by trigram GIN indexes on the expression
+        # Django compiles icontains to
+        schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+
+        for field in SEARCH_FIELDS:
+            schema_editor.execute(
+                f"CREATE INDEX IF NOT EXISTS {quote(f'user_{field}_trgm_idx')} "
+                f"ON {quote(User._meta.db_table)} USING gin (UPPER({quote(field)}::text) gin_trgm_ops)"
+            )
+    else:
+        for field in SEARCH_FIELDS:
+            schema_editor.add_index(User, models.Index(Lower(field), name=f"user_{field}_lower_idx"))
+
+
+def drop_search_indexes(apps, schema_editor):
+    quote = schema_editor.quote_name
+    suffix = "trgm_idx" if schema_editor.connection.vendor == "postgresql" else "lower_idx"
+
+    for field in SEARCH_FIELDS:
+        schema_editor.execute(f"DROP INDEX IF EXISTS {quote(f'user_{field}_{suffix}')}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('profiles', '0005_preferences_notification_window'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+    ]
@@ -0,0 +1,55 @@
+from django.db import migrations
+
+SEARCH_FIELDS = ["email", "username"]
+
+
+def create_bounded_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+
+    User = apps.get_model("auth", "User")
+    quote = schema_editor.quote_name
+    table = quote(User._meta.db_table)
+
+    for field in SEARCH_FIELDS:
+        # Prefix ranges, in byte order like text_pattern_ops, which also
+        # hands them back sorted for the LIMIT
+        schema_editor.execute(
+            f"CREATE INDEX IF NOT EXISTS {quote(f'user_{field}_prefix_idx')} "
+            f"ON {table} ((LOWER({quote(field)}) COLLATE \"C\"))"
+        )
+        # The % filter and the <-> ordering of the nearest trigram matches
+        schema_editor.execute(
+            f"CREATE INDEX IF NOT EXISTS {quote(f'user_{field}_trgm_gist_idx')} "
+            f"ON {table} USING gist (LOWER({quote(field)}) gist_trgm_ops)"
+        )
+        # Search no longer runs icontains, the GIN index has no reader left
+        schema_editor.execute(f"DROP INDEX IF EXISTS {quote(f'user_{field}_trgm_idx')}")
+
+
+def drop_bounded_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+
+    User = apps.get_model("auth", "User")
+    quote = schema_editor.quote_name
+
+    for field in SEARCH_FIELDS:
+        schema_editor.execute(
+            f"CREATE INDEX IF NOT EXISTS {quote(f'user_{field}_trgm_idx')} "
+            f"ON {quote(User._meta.db_table)} USING gin (UPPER({quote(field)}::text) gin_trgm_ops)"
+        )
+
+        for suffix in ("prefix_idx", "trgm_gist_idx"):
+            schema_editor.execute(f"DROP INDEX IF EXISTS {quote(f'user_{field}_{suffix}')}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('profiles', '0006_user_search_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_bounded_indexes, drop_bounded_indexes),
+    ]
@@ -1,3 +1,4 @@
+from datetime import time
 from django.db import models
 from django.contrib.auth.models import User
 
@@ -77,6 +78,18 @@ class Preferences(models.Model):
         help_text='IANA timezone identifier'
     )
 
+    notification_window_start = models.TimeField(
+        verbose_name="Notification Window Start",
+        default=time(8, 0),
+        help_text="Local time from which notifications are delivered"
+    )
+
+    notification_window_end = models.TimeField(
+        verbose_name="Notification Window End",
+        default=time(22, 0),
+        help_text="Local time after which notifications are held until the next window"
+    )
+
     user_profile = models.OneToOneField(
         UserProfile, 
         on_delete=models.CASCADE, 
@@ -143,4 +156,16 @@ class AccountabilityPartnership(models.Model):
                 condition=models.Q(status__in=["pending", 'accepted']),
                 name="unique_active_partnership"
             )
+        ]
+
+        indexes = [
+            models.Index(
+                fields=["partner", "status"],
+                condition=models.Q(status__in=["pending", "accepted"]),
+                name="partnership_active_partner_idx"
+            ),
+            models.Index(
+                fields=["user", "status"],
+                name="partnership_user_status_idx"
+            )
         ]
\ No newline at end of file
@@ -0,0 +1,87 @@
+from django.contrib.auth.models import User
+from django.contrib.postgres.lookups import TrigramSimilar
+from django.contrib.postgres.search import TrigramDistance
+from django.db import connection
+from django.db.models import Case, F, IntegerField, OuterRef, Q, Subquery, Value, When
+from django.db.models.functions import Collate, Lower
+from .models import UserProfile, AccountabilityPartnership
+
+MIN_TERM_LENGTH = 3
+RESULT_LIMIT = 10
+CANDIDATE_LIMIT = 50
+
+SEARCH_FIELDS = ["email", "username"]
+
+# Upper bound for prefix ranges, sorts after any character that can follow the term
+PREFIX_END = "\U0010ffff"
+
+
+def search_uses_trigrams():
+    return connection.vendor == "postgresql"
+
+
+def normalize(term):
+    return term.strip().lower()
+
+
+def candidates(term, field):
+    """
+    Subqueries for the ids of users whose field matches term, each walking
+    one index and bounded before anything is ranked, so a common term costs
+    the same as a rare one.
+    """
+
+    if search_uses_trigrams():
+        # Under the C collation the lower(column) B-tree indexes are in byte
+        # order, which makes a prefix a range scan that is already sorted
+        prefix = User.objects.annotate(key=Collate(Lower(field), "C")).filter(
+            key__gte=term, key__lt=term + PREFIX_END
+        ).order_by("key")
+
+        # % and <-> are both served by the gist_trgm_ops indexes, the scan
+        # returns the closest matches first and stops at the slice
+        similar = User.objects.annotate(key=Lower(field)).filter(
+            TrigramSimilar(F("key"), term)
+        ).order_by(TrigramDistance("key", term))
+
+        return [prefix.values("pk")[:CANDIDATE_LIMIT], similar.values("pk")[:CANDIDATE_LIMIT]]
+
+    # Elsewhere the lower(column) expression indexes serve prefix ranges
+    users = User.objects.annotate(key=Lower(field)).filter(
+        key__gte=term, key__lt=term + PREFIX_END
+    ).order_by("key")
+
+    return [users.values("pk")[:CANDIDATE_LIMIT]]
+
+
+def search_profiles(term, user, limit=RESULT_LIMIT):
+    term = normalize(term)
+
+    active_partnership = AccountabilityPartnership.objects.filter(
+        Q(user=user, partner=OuterRef("user_id")) | Q(user=OuterRef("user_id"), partner=user),
+        status__in=[
+            AccountabilityPartnership.AccountabilityStatus.PENDING,
+            AccountabilityPartnership.AccountabilityStatus.ACCEPTED,
+        ]
+    ).values("status")[:1]
+
+    return UserProfile.objects.annotate(
+        **{f"{field}_key": Lower(f"user__{field}") for field in SEARCH_FIELDS}
+    ).filter(
+        Q(
+            *[Q(user_id__in=ids) for field in SEARCH_FIELDS for ids in candidates(term, field)],
+            _connector=Q.OR
+        )
+    ).exclude(
+        user=user
+    ).annotate(
+        prefix_match=Case(
+            When(Q(email_key__startswith=term) | Q(username_key__startswith=term), then=Value(0)),
+            default=Value(1),
+            output_field=IntegerField()
+        ),
+        partnership_status=Subquery(active_partnership)
+    ).select_related("user").only(
+        "id", "profile_picture",
+        "user__id", "user__username", "user__email", "user__first_name", "user__last_name"
+    ).order_by("prefix_match", "username_key")[:limit]
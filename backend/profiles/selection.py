@@ -0,0 +1,51 @@
+from .models import AccountabilityPartnership
+
+ACTIVE_STATUSES = [
+    AccountabilityPartnership.AccountabilityStatus.PENDING,
+    AccountabilityPartnership.AccountabilityStatus.ACCEPTED,
+]
+
+
+def parse_paths(value):
+    # "id,user.username,user.email" -> {"id": {}, "user": {"username": {}, "email": {}}}
+    tree = {}
+
+    for path in value.split(","):
+        node = tree
+
+        for name in filter(None, (part.strip() for part in path.split("."))):
+            node = node.setdefault(name, {})
+
+    return tree
+
+
+class Selection:
+    """
+    Fields requested through ?fields= and ?expand=, as trees of dotted paths.
+    A field listed without a dotted remainder keeps its whole nested payload.
+    """
+
+    def __init__(self, fields=None, expand=None):
+        self.fields = fields or None
+        self.expand = expand or {}
+
+    @classmethod
+    def from_request(cls, request):
+        params = request.query_params
+
+        return cls(
+            fields=parse_paths(params["fields"]) if params.get("fields") else None,
+            expand=parse_paths(params.get("expand", ""))
+        )
+
+    def includes(self, name):
+        return self.fields is None or name in self.fields or name in self.expand
+
+    def expands(self, name):
+        return name in self.expand
+
+    def nested(self, name):
+        return Selection(
+            fields=self.fields.get(name) if self.fields else None,
+            expand=self.expand.get(name)
+        )
@@ -1,8 +1,44 @@
 from rest_framework import serializers
 from .models import UserProfile, Preferences, AccountabilityPartnership
+from .selection import Selection
 from django.contrib.auth.models import User
 
-class PartnerUserSerializer(serializers.ModelSerializer):
+class SelectableFieldsMixin:
+    """
+    Trims the payload to ?fields= and adds the Meta.expandable_fields named in
+    ?expand=, handing the dotted remainder of both to nested serializers.
+    """
+
+    def __init__(self, *args, selection=None, **kwargs):
+        super().__init__(*args, **kwargs)
+
+        request = self.context.get("request")
+
+        if selection is None and request is not None:
+            selection = Selection.from_request(request)
+
+        if selection is not None:
+            self.select(selection)
+
+    def select(self, selection):
+        expandable = getattr(self.Meta, "expandable_fields", {})
+
+        for name, (serializer_class, options) in expandable.items():
+            if selection.expands(name):
+                self.fields[name] = serializer_class(selection=selection.nested(name), **options)
+
+        for name in list(self.fields):
+            if not selection.includes(name):
+                self.fields.pop(name)
+                continue
+
+            field = self.fields[name]
+            field = getattr(field, "child", field)
+
+            if name not in expandable and isinstance(field, SelectableFieldsMixin):
+                field.select(selection.nested(name))
+
+class PartnerUserSerializer(SelectableFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = User
         fields = [
@@ -10,7 +46,7 @@ class PartnerUserSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ["id", "username", "email"]
 
-class AccountabilityPartnershipSerializer(serializers.ModelSerializer):
+class AccountabilityPartnershipSerializer(SelectableFieldsMixin, serializers.ModelSerializer):
     user = PartnerUserSerializer(read_only=True)
     partner = PartnerUserSerializer(read_only=True)
 
@@ -25,31 +61,29 @@ class AccountabilityPartnershipSerializer(serializers.ModelSerializer):
             "created_at", "updated_at"
         ]
 
-class UserSerializer(serializers.ModelSerializer):
-    as_accountable_user = AccountabilityPartnershipSerializer(read_only=True, many=True)
-    as_accountability_partner = AccountabilityPartnershipSerializer(read_only=True, many=True)
-
+class UserSerializer(SelectableFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = User
         fields = [
             "id", "first_name", "last_name",
-            "username", "email", "as_accountable_user",
-            "as_accountability_partner"
-        ]
-        read_only_fields = [
-            "id", 
-            "as_accountable_user",
-            "as_accountability_partner"
+            "username", "email"
         ]
+        read_only_fields = ["id"]
+        # Active partnerships only, the full history is on the partnerships endpoint
+        expandable_fields = {
+            "as_accountable_user": (AccountabilityPartnershipSerializer, {"read_only": True, "many": True}),
+            "as_accountability_partner": (AccountabilityPartnershipSerializer, {"read_only": True, "many": True}),
+        }
 
-class PreferencesSerializer(serializers.ModelSerializer):
+class PreferencesSerializer(SelectableFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Preferences
         fields = [
-            "theme_mode", "color_scheme_name", "timezone"
+            "theme_mode", "color_scheme_name", "timezone",
+            "notification_window_start", "notification_window_end"
         ]
 
-class UserProfileSerializer(serializers.ModelSerializer):
+class UserProfileSerializer(SelectableFieldsMixin, serializers.ModelSerializer):
     user = UserSerializer(read_only=True)
     preferences = PreferencesSerializer(read_only=True)
     profile_picture = serializers.SerializerMethodField()
@@ -64,3 +98,23 @@ class UserProfileSerializer(serializers.ModelSerializer):
 
     def get_profile_picture(self, obj):
         return obj.get_profile_picture()
+
+class ProfileSearchResultSerializer(SelectableFieldsMixin, serializers.ModelSerializer):
+    user_id = serializers.IntegerField(source="user.id", read_only=True)
+    username = serializers.CharField(source="user.username", read_only=True)
+    email = serializers.EmailField(source="user.email", read_only=True)
+    first_name = serializers.CharField(source="user.first_name", read_only=True)
+    last_name = serializers.CharField(source="user.last_name", read_only=True)
+    profile_picture = serializers.SerializerMethodField()
+    partnership_status = serializers.CharField(read_only=True, allow_null=True)
+
+    class Meta:
+        model = UserProfile
+        fields = [
+            "id", "user_id", "username", "email", "first_name",
+            "last_name", "profile_picture", "partnership_status"
+        ]
+        read_only_fields = fields
+
+    def get_profile_picture(self, obj):
+        return obj.get_profile_picture()
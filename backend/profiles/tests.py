@@ -1,3 +1,226 @@
-from django.test import TestCase
+from unittest import mock
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.db.backends.signals import connection_created
+from django.test import RequestFactory, TestCase
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.tokens import RefreshToken
+from config.authentication import CachedJWTAuthentication
+from config.database import connection_metrics, reset_connection_metrics
+from rest_framework.test import APIClient
+from config.testing import QueryBudgetMixin
+from .models import UserProfile, Preferences, AccountabilityPartnership
+from . import search
+from .urls import router
 
-# Create your tests here.
+
+class ProfileSearchTests(TestCase):
+    url = "/api/profiles/profiles/search/"
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="alice", email="alice@example.com", password="pw")
+        UserProfile.objects.create(user=self.user)
+
+        for username, email in [("Bobby", "robert@example.com"), ("carol", "Bob.Carol@example.com"), ("dave", "dave@example.com")]:
+            UserProfile.objects.create(user=User.objects.create_user(username=username, email=email))
+
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_matches_email_and_username_prefixes_case_insensitively(self):
+        response = self.client.get(self.url, {"email": "BOB"})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([row["username"] for row in response.data], ["Bobby", "carol"])
+
+    def test_excludes_the_searching_user(self):
+        response = self.client.get(self.url, {"email": "alice"})
+
+        self.assertEqual(response.data, [])
+
+    def test_rejects_short_terms(self):
+        response = self.client.get(self.url, {"email": " ab "})
+
+        self.assertEqual(response.status_code, 400)
+
+    def test_single_query_with_slim_payload(self):
+        dave = User.objects.get(username="dave")
+        AccountabilityPartnership.objects.create(user=self.user, partner=dave)
+
+        with self.assertNumQueries(1):
+            results = list(search.search_profiles("dav", self.user))
+
+        self.assertEqual(results[0].partnership_status, AccountabilityPartnership.AccountabilityStatus.PENDING)
+
+        response = self.client.get(self.url, {"email": "dav"})
+
+        self.assertEqual(set(response.data[0]), {
+            "id", "user_id", "username", "email", "first_name", "last_name", "profile_picture", "partnership_status"
+        })
+        self.assertEqual(response.data[0]["partnership_status"], "pending")
+
+
+class FieldSelectionTests(TestCase):
+    url = "/api/profiles/profiles/"
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="alice", email="alice@example.com", password="pw")
+        Preferences.objects.create(user_profile=UserProfile.objects.create(user=self.user))
+
+        bob = User.objects.create_user(username="bob", email="bob@example.com")
+        carol = User.objects.create_user(username="carol", email="carol@example.com")
+        AccountabilityPartnership.objects.create(user=self.user, partner=bob)
+        AccountabilityPartnership.objects.create(
+            user=self.user,
+            partner=carol,
+            status=AccountabilityPartnership.AccountabilityStatus.CLOSED
+        )
+
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_default_payload_leaves_partnerships_out(self):
+        with self.assertNumQueries(2):
+            response = self.client.get(self.url)
+
+        profile = response.data[0]
+
+        self.assertEqual(set(profile["user"]), {"id", "first_name", "last_name", "username", "email"})
+        self.assertIn("preferences", profile)
+
+    def test_fields_trims_payload_and_joins(self):
+        with self.assertNumQueries(2):
+            response = self.client.get(self.url, {"fields": "id,user.username"})
+
+        profile = response.data[0]
+
+        self.assertEqual(profile, {"id": profile["id"], "user": {"username": "alice"}})
+
+    def test_expand_loads_active_partnerships_only(self):
+        with self.assertNumQueries(3):
+            response = self.client.get(self.url, {
+                "fields": "id,user.username",
+                "expand": "user.as_accountable_user.partner"
+            })
+
+        profile = response.data[0]
+        partnerships = profile["user"]["as_accountable_user"]
+
+        self.assertEqual([partnership["partner"]["username"] for partnership in partnerships], ["bob"])
+        self.assertNotIn("as_accountability_partner", profile["user"])
+
+    def test_partnership_endpoint_honours_fields(self):
+        with self.assertNumQueries(2):
+            response = self.client.get("/api/profiles/partnerships/", {"fields": "id,status"})
+
+        self.assertEqual({frozenset(row) for row in response.data}, {frozenset({"id", "status"})})
+
+
+class CachedAuthenticationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username="alice", email="alice@example.com", password="pw")
+        self.request = RequestFactory().get(
+            "/", HTTP_AUTHORIZATION=f"Bearer {RefreshToken.for_user(self.user).access_token}"
+        )
+        self.authenticator = CachedJWTAuthentication()
+
+    def authenticate(self):
+        user, _ = self.authenticator.authenticate(self.request)
+        return user
+
+    def test_warm_requests_skip_the_user_query(self):
+        with self.assertNumQueries(1):
+            self.authenticate()
+
+        with self.assertNumQueries(0):
+            user = self.authenticate()
+
+        self.assertEqual((user.pk, user.username, user.email), (self.user.pk, "alice", "alice@example.com"))
+
+    def test_deactivation_and_password_change_invalidate(self):
+        self.authenticate()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.set_password("new")
+            self.user.save()
+
+        with self.assertNumQueries(1):
+            self.authenticate()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.is_active = False
+            self.user.save(update_fields=["is_active"])
+
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate()
+
+    def test_last_login_stamp_keeps_the_entry(self):
+        self.authenticate()
+
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            self.user.save(update_fields=["last_login"])
+
+        self.assertEqual(callbacks, [])
+
+    def test_deleted_user_is_rejected(self):
+        self.authenticate()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.delete()
+
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate()
+
+
+class ConnectionMetricsTests(TestCase):
+    def setUp(self):
+        reset_connection_metrics()
+
+    def test_counts_new_connections(self):
+        connection_created.send(sender=connection.__class__, connection=connection)
+        connection_created.send(sender=connection.__class__, connection=connection)
+
+        self.assertEqual(connection_metrics()["opened"], 2)
+
+        reset_connection_metrics()
+
+        self.assertEqual(connection_metrics()["opened"], 0)
+
+    def test_reports_the_reuse_mode(self):
+        with mock.patch.dict(connection.settings_dict, CONN_MAX_AGE=60, CONN_HEALTH_CHECKS=True):
+            metrics = connection_metrics()
+
+            self.assertEqual(metrics["mode"], "persistent")
+            self.assertTrue(metrics["health_checks"])
+
+        with mock.patch.dict(connection.settings_dict, CONN_MAX_AGE=0):
+            self.assertEqual(connection_metrics()["mode"], "none")
+
+
+class ProfilesQueryBudgetTests(QueryBudgetMixin, TestCase):
+    router = router
+    query_budgets = {
+        "profile": 2,
+        "preference": 2,
+        "partnership": 2,
+    }
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="alice", email="alice@example.com", password="pw")
+        profile = UserProfile.objects.create(user=self.user)
+        Preferences.objects.create(user_profile=profile)
+        self.seeded = 0
+
+    def seed(self, user, count):
+        for _ in range(count):
+            self.seeded += 1
+            other = User.objects.create_user(username=f"user{self.seeded}", email=f"user{self.seeded}@example.com")
+
+            AccountabilityPartnership.objects.create(user=user, partner=other)
+            AccountabilityPartnership.objects.create(
+                user=other,
+                partner=user,
+                status=AccountabilityPartnership.AccountabilityStatus.ACCEPTED
+            )
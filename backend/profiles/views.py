@@ -1,47 +1,85 @@
 from django.shortcuts import render
-from django.db.models import Q
+from django.db.models import Q, Prefetch
 from django.contrib.auth.models import User
+from django.db import transaction
 from rest_framework import viewsets
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.exceptions import ValidationError
 from rest_framework.decorators import action
 from rest_framework.response import Response
+from activity.reminders import schedule_owner
+from config.cache_versions import bump_versions
+from config.conditional import ConditionalGetMixin
 from .models import UserProfile, Preferences, AccountabilityPartnership
 from .serializers import (
-    UserProfileSerializer, PreferencesSerializer, AccountabilityPartnershipSerializer
+    UserProfileSerializer, PreferencesSerializer, AccountabilityPartnershipSerializer,
+    ProfileSearchResultSerializer
 )
+from .selection import ACTIVE_STATUSES, Selection
+from . import search
 
-class UserProfileViewSet(viewsets.ModelViewSet):
+def profiles_for_selection(queryset, selection):
+    queryset = queryset.select_related(
+        *[name for name in ("user", "preferences") if selection.includes(name)]
+    )
+
+    user = selection.nested("user")
+
+    # Partnership lists are only loaded when expanded, and only the sides
+    # the payload still carries are joined in
+    return queryset.prefetch_related(*[
+        Prefetch(f"user__{name}", queryset=partnerships_for_selection(
+            AccountabilityPartnership.objects.filter(status__in=ACTIVE_STATUSES), user.nested(name)
+        ))
+        for name in ("as_accountable_user", "as_accountability_partner")
+        if user.expands(name)
+    ])
+
+def partnerships_for_selection(queryset, selection):
+    return queryset.select_related(
+        *[name for name in ("user", "partner") if selection.includes(name)]
+    )
+
+class UserProfileViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     serializer_class = UserProfileSerializer
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
-        return UserProfile.objects.filter(user=self.request.user)
+        return profiles_for_selection(
+            UserProfile.objects.filter(user=self.request.user),
+            Selection.from_request(self.request)
+        )
     
     def perform_create(self, serializer):
-        serializer.save(user=self.request.user)
+        with transaction.atomic():
+            serializer.save(user=self.request.user)
+            bump_versions([self.request.user.id])
+
+    def perform_update(self, serializer):
+        with transaction.atomic():
+            serializer.save()
+            bump_versions([self.request.user.id])
+
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            instance.delete()
+            bump_versions([self.request.user.id])
     
     @action(detail=False, methods=["get"])
     def search(self, request):
         email_query = request.query_params.get('email', '')
 
-        if len(email_query) < 3:
+        if len(search.normalize(email_query)) < search.MIN_TERM_LENGTH:
             return Response({
-                "error": "Please enter at least 3 characters"
+                "error": f"Please enter at least {search.MIN_TERM_LENGTH} characters"
             }, status=400)
 
-        users = User.objects.filter(
-            email__icontains=email_query
-        ).exclude(
-            id=request.user.id
-        )[:10]
-
-        profiles = UserProfile.objects.filter(user__in=users)
-        serializer = UserProfileSerializer(profiles, many=True)
+        profiles = search.search_profiles(email_query, request.user)
+        serializer = ProfileSearchResultSerializer(profiles, many=True, context=self.get_serializer_context())
 
         return Response(serializer.data)
 
-class PreferencesViewSet(viewsets.ModelViewSet):
+class PreferencesViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     serializer_class = PreferencesSerializer
     permission_classes = [IsAuthenticated]
 
@@ -50,15 +88,39 @@ class PreferencesViewSet(viewsets.ModelViewSet):
     
     def perform_create(self, serializer):
         user_profile = self.request.user.profile
-        serializer.save(user_profile=user_profile)
 
-class AccountabilityPartnershipViewSet(viewsets.ModelViewSet):
+        with transaction.atomic():
+            serializer.save(user_profile=user_profile)
+            schedule_owner(self.request.user.id)
+            bump_versions([self.request.user.id])
+
+    def perform_update(self, serializer):
+        with transaction.atomic():
+            serializer.save()
+
+            # Reminder times follow the owner's timezone
+            if "timezone" in serializer.validated_data:
+                schedule_owner(self.request.user.id)
+
+            bump_versions([self.request.user.id])
+
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            instance.delete()
+            # Without preferences the owner falls back to UTC
+            schedule_owner(self.request.user.id)
+            bump_versions([self.request.user.id])
+
+class AccountabilityPartnershipViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     serializer_class = AccountabilityPartnershipSerializer
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
-        return AccountabilityPartnership.objects.filter(
-            Q(user=self.request.user) | Q(partner=self.request.user)
+        return partnerships_for_selection(
+            AccountabilityPartnership.objects.filter(
+                Q(user=self.request.user) | Q(partner=self.request.user)
+            ),
+            Selection.from_request(self.request)
         )
 
     def perform_create(self, serializer):
@@ -72,11 +134,24 @@ class AccountabilityPartnershipViewSet(viewsets.ModelViewSet):
         if existing:
             raise ValidationError("Partnership already exists")
         
-        serializer.save(
-            user = self.request.user,
-            created_by=self.request.user,
-            status='pending'
-        )
+        with transaction.atomic():
+            serializer.save(
+                user = self.request.user,
+                created_by=self.request.user,
+                status='pending'
+            )
+            bump_versions([self.request.user.id, partner.id])
+
+    def perform_update(self, serializer):
+        with transaction.atomic():
+            partnership = serializer.save()
+            # Both sides list the partnership
+            bump_versions([partnership.user_id, partnership.partner_id])
+
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            instance.delete()
+            bump_versions([instance.user_id, instance.partner_id])
 
 
 